@@ -0,0 +1,85 @@
+import asyncio
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+class AsyncEmbeddingModel:
+    """Adds non-blocking generate_async/generate_many_async to a sync embedding front end.
+
+    Inference runs in a bounded thread pool (torch and ONNX Runtime release the
+    GIL, and threads share the already-loaded model, unlike a process pool).
+    A semaphore caps how many calls may be in flight at once; callers past the
+    cap wait on the event loop instead of piling work onto the pool. Cancelling
+    the awaiting task drops the job if it hasn't started yet.
+    """
+
+    def __init__(self, model, max_workers: int = 8, max_concurrency: int = 64):
+        self.model = model
+        self.model_name = model.model_name
+        self.max_concurrency = max_concurrency
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="embed")
+        # One semaphore per event loop: asyncio primitives bind to the first loop
+        # that waits on them, and Celery tasks each run in a fresh loop
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._semaphores_lock = threading.Lock()
+        self._in_flight = 0
+        self._cancelled = 0
+
+    @property
+    def tokenizer(self):
+        return self.model.tokenizer
+
+    @property
+    def max_seq_length(self) -> int:
+        return self.model.max_seq_length
+
+    def generate(self, text: str) -> List[float]:
+        return self.model.generate(text)
+
+    def generate_many(self, texts: List[str]) -> List[List[float]]:
+        return self.model.generate_many(texts)
+
+    def _semaphore(self, loop: asyncio.AbstractEventLoop) -> asyncio.Semaphore:
+        with self._semaphores_lock:
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+            return semaphore
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        async with self._semaphore(loop):
+            self._in_flight += 1
+            try:
+                return await loop.run_in_executor(self.executor, fn, *args)
+            except asyncio.CancelledError:
+                self._cancelled += 1
+                raise
+            finally:
+                self._in_flight -= 1
+
+    async def generate_async(self, text: str) -> List[float]:
+        return await self._run(self.model.generate, text)
+
+    async def generate_many_async(self, texts: List[str]) -> List[List[float]]:
+        return await self._run(self.model.generate_many, texts)
+
+    def warmup(self):
+        self.model.warmup()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.model.stats() if hasattr(self.model, "stats") else {}
+        return {
+            **stats,
+            "async": {
+                "in_flight": self._in_flight,
+                "cancelled": self._cancelled,
+                "max_concurrency": self.max_concurrency
+            }
+        }
@@ -0,0 +1,161 @@
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+class MicroBatcher:
+    """Gather concurrent single-item calls and run them through one batched call"""
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        max_queue_depth: int = 1024,
+        name: str = "micro-batcher"
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.name = name
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue_depth)
+        self._thread = None
+        self._lock = threading.Lock()
+
+        # Stats
+        self._batches = 0
+        self._items = 0
+        self._batch_sizes: Counter = Counter()
+
+    def submit(self, item: Any) -> Future:
+        """Queue an item and return a future for its result.
+
+        Blocks when the queue is full, which pushes back on callers instead
+        of letting the backlog grow without bound.
+        """
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _collect_batch(self, first) -> tuple:
+        batch = [first]
+        stop = False
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                entry = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if entry is _STOP:
+                stop = True
+                break
+            batch.append(entry)
+        return batch, stop
+
+    def _run(self):
+        while True:
+            entry = self._queue.get()
+            if entry is _STOP:
+                return
+            batch, stop = self._collect_batch(entry)
+
+            # Skip callers that cancelled while their item was queued
+            batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+            if batch:
+                self._run_batch(batch)
+            if stop:
+                return
+
+    def _run_batch(self, batch: list):
+        try:
+            results = self.batch_fn([item for item, _ in batch])
+        except Exception as e:
+            logger.error(f"{self.name} batch of {len(batch)} failed: {e}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+        self._batches += 1
+        self._items += len(batch)
+        self._batch_sizes[len(batch)] += 1
+
+    def stop(self):
+        """Let queued work finish, then stop the worker thread"""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self._batches,
+            "items": self._items,
+            "avg_batch_size": round(self._items / self._batches, 2) if self._batches else 0.0,
+            "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+            "queue_depth": self._queue.qsize(),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000
+        }
+
+class BatchedEmbeddingModel:
+    """Embedding front end that coalesces concurrent generate() calls"""
+
+    def __init__(
+        self,
+        model,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        max_queue_depth: int = 1024
+    ):
+        self.model = model
+        self.model_name = model.model_name
+        self.batcher = MicroBatcher(
+            model.generate_many,
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+            max_queue_depth=max_queue_depth,
+            name=f"embed-batcher-{model.model_name}"
+        )
+
+    @property
+    def tokenizer(self):
+        return self.model.tokenizer
+
+    @property
+    def max_seq_length(self) -> int:
+        return self.model.max_seq_length
+
+    def generate(self, text: str) -> List[float]:
+        return self.batcher.submit(text).result()
+
+    def generate_many(self, texts: List[str]) -> List[List[float]]:
+        # Already a batch, no need to queue
+        return self.model.generate_many(texts)
+
+    def warmup(self):
+        self.model.warmup()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"batching": self.batcher.stats()}
@@ -0,0 +1,211 @@
+import asyncio
+import hashlib
+import json
+import logging
+import mimetypes
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from config import settings
+from ai.lazy_models import lazy_models, LazyModel
+from ai.batching import MicroBatcher
+
+logger = logging.getLogger(__name__)
+
+def load_caption_pipeline():
+    import torch
+    from transformers import pipeline
+    return pipeline(
+        "image-to-text",
+        model=settings.CAPTION_MODEL,
+        device="cuda" if torch.cuda.is_available() else "cpu"
+    )
+
+caption_model = lazy_models.register("caption", load_caption_pipeline)
+
+def is_image_path(path: str) -> bool:
+    mime, _ = mimetypes.guess_type(path)
+    return bool(mime and mime.startswith("image/"))
+
+def load_image(data: bytes, size: int):
+    """Decode and shrink an image to the captioner's input size, keeping its aspect ratio"""
+    from PIL import Image, ImageOps
+    image = Image.open(BytesIO(data))
+    # JPEGs decode straight at a reduced scale instead of full resolution
+    image.draft("RGB", (size, size))
+    image = ImageOps.exif_transpose(image).convert("RGB")
+    image.thumbnail((size, size), Image.BICUBIC)
+    return image
+
+def perceptual_hash(image) -> int:
+    """64-bit difference hash; re-encoded or resized copies land within a few bits"""
+    from PIL import Image
+    pixels = list(image.convert("L").resize((9, 8), Image.BILINEAR).getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | int(pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return bits
+
+class CaptionCache:
+    """Captions keyed by the sha256 of the file bytes, with a perceptual-hash
+    index so near-duplicate images reuse a caption too.
+
+    With a path, entries are also appended to a JSON-lines file and reloaded
+    on start, so duplicates stay free across restarts.
+    """
+
+    def __init__(self, max_entries: int, max_distance: int = 0, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.path = Path(path) if path else None
+        self._entries: "OrderedDict[str, Tuple[int, str]]" = OrderedDict()
+        self._by_phash: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+        # Stats
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+        if self.path is not None and self.path.exists():
+            with self.path.open() as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # Torn last line after a crash
+                    self._store(entry["sha256"], entry["phash"], entry["caption"])
+
+    def _store(self, digest: str, phash: int, caption: str):
+        self._entries.pop(digest, None)
+        self._entries[digest] = (phash, caption)
+        self._by_phash[phash] = digest
+        while len(self._entries) > self.max_entries:
+            evicted, (evicted_phash, _) = self._entries.popitem(last=False)
+            if self._by_phash.get(evicted_phash) == evicted:
+                del self._by_phash[evicted_phash]
+
+    def get(self, digest: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return entry[1]
+
+    def get_similar(self, phash: int) -> Optional[str]:
+        with self._lock:
+            digest = self._by_phash.get(phash)
+            if digest is None and self.max_distance > 0:
+                digest = next(
+                    (d for p, d in self._by_phash.items() if bin(p ^ phash).count("1") <= self.max_distance),
+                    None
+                )
+            if digest is None:
+                self.misses += 1
+                return None
+            self.similar_hits += 1
+            return self._entries[digest][1]
+
+    def put(self, digest: str, phash: int, caption: str):
+        with self._lock:
+            self._store(digest, phash, caption)
+            if self.path is not None:
+                with self.path.open("a") as f:
+                    f.write(json.dumps({"sha256": digest, "phash": phash, "caption": caption}) + "\n")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.similar_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.similar_hits) / lookups, 4) if lookups else 0.0
+        }
+
+class ImageCaptioner:
+    """Cached, batched BLIP captioning.
+
+    Reading, hashing and resizing run in a small thread pool; images that miss
+    the cache are queued on a micro-batcher so concurrent uploads share one
+    pipeline call. Identical images in flight at the same time are captioned once.
+    """
+
+    def __init__(self, model: Optional[LazyModel] = None, cache: Optional[CaptionCache] = None):
+        self.model_handle = model or caption_model
+        self.cache = cache or CaptionCache(
+            settings.CAPTION_CACHE_SIZE,
+            max_distance=settings.CAPTION_PHASH_DISTANCE,
+            path=settings.CAPTION_CACHE_PATH or None
+        )
+        self._pool = ThreadPoolExecutor(
+            max_workers=settings.CAPTION_PREPROCESS_WORKERS,
+            thread_name_prefix="caption-prep"
+        )
+        self.batcher = MicroBatcher(
+            self.caption_images,
+            max_batch_size=settings.CAPTION_BATCH_SIZE,
+            max_wait_ms=settings.CAPTION_BATCH_WAIT_MS,
+            name="caption-batcher"
+        )
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def caption_images(self, images: list) -> List[str]:
+        """Captions for already-resized images, in one pipeline call"""
+        results = self.model_handle.get()(
+            images,
+            batch_size=len(images),
+            generate_kwargs={"max_new_tokens": settings.CAPTION_MAX_NEW_TOKENS}
+        )
+        return [result[0]["generated_text"].strip() for result in results]
+
+    def describe(self, image_path: str) -> str:
+        data = Path(image_path).read_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+        cached = self.cache.get(digest)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            future = self._inflight.get(digest)
+            owner = future is None
+            if owner:
+                future = self._inflight[digest] = Future()
+        if not owner:
+            return future.result()
+
+        try:
+            image = load_image(data, settings.CAPTION_IMAGE_SIZE)
+            phash = perceptual_hash(image)
+            caption = self.cache.get_similar(phash)
+            if caption is None:
+                caption = self.batcher.submit(image).result()
+            self.cache.put(digest, phash, caption)
+            future.set_result(caption)
+            return caption
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(digest, None)
+
+    def describe_many(self, image_paths: List[str]) -> List[str]:
+        # Pool threads submit concurrently, so cache misses fill the same batches
+        return list(self._pool.map(self.describe, image_paths))
+
+    async def describe_async(self, image_path: str) -> str:
+        return await asyncio.wrap_future(self._pool.submit(self.describe, image_path))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"cache": self.cache.stats(), "batching": self.batcher.stats()}
+
+# Singleton instance
+image_captioner = ImageCaptioner()
@@ -0,0 +1,165 @@
+import asyncio
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+from config import settings
+
+def iter_token_windows(
+    text: str,
+    tokenizer,
+    window_tokens: int = 254,
+    overlap_tokens: int = 32,
+    segment_chars: int = 8000
+) -> Iterator[str]:
+    """Yield overlapping windows of `text`, each at most `window_tokens` word pieces.
+
+    The text is tokenized a segment at a time and windows are yielded as soon as
+    they fill, so a huge document never has to be tokenized in one go. Windows
+    are sliced from the original text using the tokenizer's character offsets.
+    """
+    if overlap_tokens >= window_tokens:
+        raise ValueError("overlap_tokens must be smaller than window_tokens")
+
+    step = window_tokens - overlap_tokens
+    spans: List[Tuple[int, int]] = []  # (start, end) char offsets of pending tokens
+    emitted = False
+    position = 0
+
+    while position < len(text):
+        end = min(position + segment_chars, len(text))
+        # Cut at whitespace so no word is split across segments
+        if end < len(text):
+            cut = text.rfind(" ", position, end)
+            if cut > position:
+                end = cut
+
+        encoded = tokenizer(
+            text[position:end],
+            add_special_tokens=False,
+            return_offsets_mapping=True
+        )
+        spans.extend((position + start, position + stop) for start, stop in encoded["offset_mapping"])
+        position = end
+
+        while len(spans) >= window_tokens:
+            yield text[spans[0][0]:spans[window_tokens - 1][1]]
+            emitted = True
+            del spans[:step]
+
+    # Tail: only if it holds tokens the last window didn't already cover
+    if spans and (not emitted or len(spans) > overlap_tokens):
+        yield text[spans[0][0]:spans[-1][1]]
+
+def chunk_text(text: str, model) -> Iterator[str]:
+    """Split note content into windows that fit the embedding model's input"""
+    window = min(settings.EMBEDDING_CHUNK_TOKENS, model.max_seq_length - 2)  # Room for [CLS]/[SEP]
+    return iter_token_windows(
+        text,
+        model.tokenizer,
+        window_tokens=window,
+        overlap_tokens=min(settings.EMBEDDING_CHUNK_OVERLAP, window // 2)
+    )
+
+def embed_chunks(
+    model,
+    text: str,
+    batch_size: Optional[int] = None
+) -> Iterator[List[Tuple[int, str, List[float]]]]:
+    """Yield batches of (chunk_index, chunk_text, vector), one encode call per batch"""
+    batch_size = batch_size or settings.EMBEDDING_CHUNK_BATCH_SIZE
+    batch: List[Tuple[int, str]] = []
+
+    for index, chunk in enumerate(chunk_text(text, model)):
+        batch.append((index, chunk))
+        if len(batch) >= batch_size:
+            vectors = model.generate_many([chunk for _, chunk in batch])
+            yield [(i, chunk, vector) for (i, chunk), vector in zip(batch, vectors)]
+            batch = []
+
+    if batch:
+        vectors = model.generate_many([chunk for _, chunk in batch])
+        yield [(i, chunk, vector) for (i, chunk), vector in zip(batch, vectors)]
+
+def mean_vector(vectors: List[List[float]]) -> List[float]:
+    """Normalized mean of chunk vectors, used as a note-level embedding"""
+    mean = np.asarray(vectors, dtype=np.float32).mean(axis=0)
+    norm = np.linalg.norm(mean)
+    return (mean / norm if norm > 0 else mean).tolist()
+
+def embed_and_index_note(
+    model,
+    vector_db,
+    note_id: str,
+    user_id: int,
+    content: str,
+    metadata: Optional[Dict[str, Any]] = None
+) -> List[float]:
+    """Embed a note chunk by chunk, store each chunk as its own point,
+    and return the note-level vector"""
+    vectors: List[List[float]] = []
+    for batch in embed_chunks(model, content):
+        vector_db.upsert_note_chunks(note_id, user_id, batch, metadata=metadata)
+        vectors.extend(vector for _, _, vector in batch)
+
+    # Drop chunks left over from a longer previous version of the note
+    vector_db.delete_stale_chunks(note_id, len(vectors))
+
+    if not vectors:
+        return []
+    return mean_vector(vectors)
+
+async def embed_and_index_note_async(
+    model,
+    vector_store,
+    note_id: str,
+    user_id: int,
+    content: str,
+    metadata: Optional[Dict[str, Any]] = None
+) -> List[float]:
+    """Async variant of embed_and_index_note; `vector_store` is an AsyncVectorStore"""
+    chunks = await asyncio.to_thread(lambda: list(chunk_text(content, model)))
+    batch_size = settings.EMBEDDING_CHUNK_BATCH_SIZE
+
+    vectors: List[List[float]] = []
+    for start in range(0, len(chunks), batch_size):
+        texts = chunks[start:start + batch_size]
+        batch_vectors = await model.generate_many_async(texts)
+        batch = [
+            (start + i, text, vector)
+            for i, (text, vector) in enumerate(zip(texts, batch_vectors))
+        ]
+        await vector_store.upsert_note_chunks(note_id, user_id, batch, metadata=metadata)
+        vectors.extend(batch_vectors)
+
+    await vector_store.delete_stale_chunks(note_id, len(vectors))
+
+    if not vectors:
+        return []
+    return mean_vector(vectors)
+
+def index_attachment_pages(
+    model,
+    vector_db,
+    note_id: str,
+    user_id: int,
+    pages: Iterable[Tuple[int, str]],
+    metadata: Optional[Dict[str, Any]] = None
+) -> int:
+    """Embed an attached document's (page_number, text) pairs as they arrive.
+
+    Each page is searchable as soon as it is upserted. Attachment chunks count
+    down from -1, so they never collide with the note's own chunks and aren't
+    pruned when the note text is re-embedded. Returns the number of chunks.
+    """
+    count = 0
+    for page_number, text in pages:
+        page_metadata = {**(metadata or {}), "source": "attachment", "page": page_number}
+        for batch in embed_chunks(model, text):
+            batch = [
+                (-(count + offset + 1), chunk, vector)
+                for offset, (_, chunk, vector) in enumerate(batch)
+            ]
+            vector_db.upsert_note_chunks(note_id, user_id, batch, metadata=page_metadata)
+            count += len(batch)
+
+    vector_db.delete_stale_attachment_chunks(note_id, count)
+    return count
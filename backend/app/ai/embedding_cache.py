@@ -0,0 +1,250 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so trivially different texts share a cache entry"""
+    return " ".join(text.split())
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+class MemoryEmbeddingTier:
+    """In-process LRU of float32 vectors, evicted by total byte size"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, str]) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+            return vector
+
+    def put(self, key: Tuple[str, str], vector: np.ndarray):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old.nbytes
+            self._entries[key] = vector
+            self.current_bytes += vector.nbytes
+
+            while self.current_bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class DiskEmbeddingTier:
+    """Persistent per-model store: a memory-mapped float32 matrix plus an index file.
+
+    The index is an append-only `<sha256> <row>` text file that is only written
+    after the vector row has been flushed, so a crash never leaves an index entry
+    pointing at a half-written row. Assumes a single writer process per directory.
+    """
+
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self, directory: str, model_name: str):
+        self.path = Path(directory) / re.sub(r"[^A-Za-z0-9_.-]", "_", model_name)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.path / "index.txt"
+        self.vectors_path = self.path / "vectors.f32"
+        self.meta_path = self.path / "meta.json"
+
+        self._lock = threading.Lock()
+        self._index: Dict[str, int] = {}
+        self._vectors: Optional[np.memmap] = None
+        self.dim: Optional[int] = None
+        self.capacity = 0
+        self._load()
+
+    def _load(self):
+        if not self.meta_path.exists():
+            return
+        meta = json.loads(self.meta_path.read_text())
+        self.dim = meta["dim"]
+        self.capacity = meta["capacity"]
+        self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(self.capacity, self.dim))
+
+        if self.index_path.exists():
+            with self.index_path.open() as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) == 2:
+                        self._index[parts[0]] = int(parts[1])
+        logger.info(f"Loaded {len(self._index)} cached embeddings from {self.path}")
+
+    def _grow(self, dim: int):
+        new_capacity = max(self.INITIAL_CAPACITY, self.capacity * 2)
+        if self._vectors is not None:
+            self._vectors.flush()
+            del self._vectors
+        with self.vectors_path.open("ab") as f:
+            f.truncate(new_capacity * dim * 4)
+        self.dim = dim
+        self.capacity = new_capacity
+        self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(self.capacity, self.dim))
+        self.meta_path.write_text(json.dumps({"dim": self.dim, "capacity": self.capacity}))
+
+    def get(self, digest: str) -> Optional[np.ndarray]:
+        with self._lock:
+            row = self._index.get(digest)
+            if row is None:
+                return None
+            # Copy out of the mmap so callers never hold a view into the file
+            return np.array(self._vectors[row])
+
+    def put(self, digest: str, vector: np.ndarray):
+        with self._lock:
+            if digest in self._index:
+                return
+            if self.dim is not None and vector.shape[0] != self.dim:
+                logger.warning(f"Skipping disk cache write: dim {vector.shape[0]} != {self.dim}")
+                return
+            row = len(self._index)
+            if row >= self.capacity:
+                self._grow(vector.shape[0])
+
+            self._vectors[row] = vector
+            self._vectors.flush()
+            with self.index_path.open("a") as f:
+                f.write(f"{digest} {row}\n")
+            self._index[digest] = row
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+class EmbeddingCache:
+    """Two-tier embedding cache keyed by (model@backend, sha256 of normalized text)"""
+
+    def __init__(self, max_memory_bytes: int, disk_dir: Optional[str] = None):
+        self.memory = MemoryEmbeddingTier(max_memory_bytes)
+        self.disk_dir = disk_dir
+        self._disk_tiers: Dict[str, DiskEmbeddingTier] = {}
+        self._lock = threading.Lock()
+
+        # Stats
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _disk(self, model_name: str) -> Optional[DiskEmbeddingTier]:
+        if not self.disk_dir:
+            return None
+        tier = self._disk_tiers.get(model_name)
+        if tier is None:
+            with self._lock:
+                tier = self._disk_tiers.get(model_name)
+                if tier is None:
+                    tier = DiskEmbeddingTier(self.disk_dir, model_name)
+                    self._disk_tiers[model_name] = tier
+        return tier
+
+    def get(self, model_name: str, digest: str) -> Optional[np.ndarray]:
+        key = (model_name, digest)
+        vector = self.memory.get(key)
+        if vector is not None:
+            self.memory_hits += 1
+            return vector
+
+        disk = self._disk(model_name)
+        if disk is not None:
+            vector = disk.get(digest)
+            if vector is not None:
+                self.disk_hits += 1
+                self.memory.put(key, vector)
+                return vector
+
+        self.misses += 1
+        return None
+
+    def put(self, model_name: str, digest: str, vector: np.ndarray):
+        self.memory.put((model_name, digest), vector)
+        disk = self._disk(model_name)
+        if disk is not None:
+            disk.put(digest, vector)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self.memory),
+            "memory_bytes": self.memory.current_bytes,
+            "disk_entries": {name: len(tier) for name, tier in self._disk_tiers.items()}
+        }
+
+class CachedEmbeddingModel:
+    """Embedding front end that serves repeated texts from an EmbeddingCache.
+
+    Entries are keyed by model and backend: torch, ONNX and int8-quantized
+    ONNX vectors of the same model differ, and must never be mixed.
+    """
+
+    def __init__(self, model, cache: EmbeddingCache, backend_name: str):
+        self.model = model
+        self.model_name = model.model_name
+        self.cache_name = f"{model.model_name}@{backend_name}"
+        self.cache = cache
+
+    @property
+    def tokenizer(self):
+        return self.model.tokenizer
+
+    @property
+    def max_seq_length(self) -> int:
+        return self.model.max_seq_length
+
+    def generate(self, text: str) -> List[float]:
+        digest = content_hash(text)
+        vector = self.cache.get(self.cache_name, digest)
+        if vector is None:
+            vector = np.asarray(self.model.generate(text), dtype=np.float32)
+            self.cache.put(self.cache_name, digest, vector)
+        return vector.tolist()
+
+    def generate_many(self, texts: List[str]) -> List[List[float]]:
+        digests = [content_hash(text) for text in texts]
+        vectors: Dict[str, np.ndarray] = {}
+        missing: Dict[str, str] = {}
+        for digest, text in zip(digests, texts):
+            if digest in vectors or digest in missing:
+                continue
+            vector = self.cache.get(self.cache_name, digest)
+            if vector is None:
+                missing[digest] = text
+            else:
+                vectors[digest] = vector
+
+        if missing:
+            # Only the misses go to the model, deduplicated
+            encoded = self.model.generate_many(list(missing.values()))
+            for digest, vector in zip(missing, encoded):
+                vector = np.asarray(vector, dtype=np.float32)
+                self.cache.put(self.cache_name, digest, vector)
+                vectors[digest] = vector
+
+        return [vectors[digest].tolist() for digest in digests]
+
+    def warmup(self):
+        self.model.warmup()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.model.stats() if hasattr(self.model, "stats") else {}
+        return {**stats, "cache": self.cache.stats()}
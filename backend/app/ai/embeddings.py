@@ -1,13 +1,213 @@
-from sentence_transformers import SentenceTransformer
-import torch
+import json
+import logging
+import re
+from pathlib import Path
+from typing import List, Optional
+import numpy as np
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+def default_device() -> str:
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+class TorchEmbeddingBackend:
+    """Runs the model through sentence-transformers / PyTorch"""
+
+    def __init__(self, model_name: str, device: str):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device=device)
+        self.tokenizer = self.model.tokenizer
+        self.max_seq_length = self.model.max_seq_length
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(texts, convert_to_numpy=True)
+
+def onnx_model_dir(model_name: str) -> Path:
+    return Path(settings.ONNX_MODEL_DIR) / re.sub(r"[^A-Za-z0-9_.-]", "_", model_name)
+
+def export_onnx_model(model_name: str, quantize: bool = False) -> Path:
+    """Export the transformer to ONNX (once) and optionally int8-quantize it.
+
+    Writes model.onnx, the tokenizer files and a pooling.json describing how
+    token embeddings are pooled, so inference only needs onnxruntime and the
+    tokenizer.
+    """
+    target = onnx_model_dir(model_name)
+    onnx_path = target / "model.onnx"
+    quantized_path = target / "model.int8.onnx"
+
+    if not onnx_path.exists():
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        st_model = SentenceTransformer(model_name, device="cpu")
+        transformer = st_model[0].auto_model.eval()
+        pooling = st_model[1]
+
+        class HiddenStates(torch.nn.Module):
+            def __init__(self, model):
+                super().__init__()
+                self.model = model
+
+            def forward(self, input_ids, attention_mask, token_type_ids):
+                return self.model(
+                    input_ids=input_ids,
+                    attention_mask=attention_mask,
+                    token_type_ids=token_type_ids
+                ).last_hidden_state
+
+        target.mkdir(parents=True, exist_ok=True)
+        st_model.tokenizer.save_pretrained(target)
+        dummy = st_model.tokenizer(["export"], return_tensors="pt", return_token_type_ids=True)
+        sequence_axes = {0: "batch", 1: "sequence"}
+        torch.onnx.export(
+            HiddenStates(transformer),
+            (dummy["input_ids"], dummy["attention_mask"], dummy["token_type_ids"]),
+            str(onnx_path),
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": sequence_axes,
+                "attention_mask": sequence_axes,
+                "token_type_ids": sequence_axes,
+                "last_hidden_state": sequence_axes
+            },
+            opset_version=14
+        )
+        (target / "pooling.json").write_text(json.dumps({
+            "mode": "cls" if pooling.pooling_mode_cls_token else "mean",
+            "normalize": any(type(module).__name__ == "Normalize" for module in st_model),
+            "max_seq_length": st_model.max_seq_length
+        }))
+        logger.info(f"Exported {model_name} to {onnx_path}")
+
+    if quantize and not quantized_path.exists():
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(str(onnx_path), str(quantized_path), weight_type=QuantType.QInt8)
+        logger.info(f"Quantized {model_name} to {quantized_path}")
+
+    return quantized_path if quantize else onnx_path
+
+class OnnxEmbeddingBackend:
+    """Runs the exported model through ONNX Runtime on CPU"""
+
+    def __init__(self, model_name: str, quantize: bool = False):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        model_path = export_onnx_model(model_name, quantize=quantize)
+        pooling = json.loads((model_path.parent / "pooling.json").read_text())
+        self.pooling_mode = pooling["mode"]
+        self.normalize = pooling["normalize"]
+        self.max_seq_length = pooling["max_seq_length"]
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path.parent)
+
+        options = ort.SessionOptions()
+        if settings.ONNX_NUM_THREADS:
+            options.intra_op_num_threads = settings.ONNX_NUM_THREADS
+        self.session = ort.InferenceSession(
+            str(model_path),
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        encoded = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_token_type_ids=True,
+            return_tensors="np"
+        )
+        inputs = {name: encoded[name].astype(np.int64) for name in self.input_names}
+        hidden = self.session.run(None, inputs)[0]
+
+        if self.pooling_mode == "cls":
+            pooled = hidden[:, 0]
+        else:
+            mask = encoded["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+        if self.normalize:
+            pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.astype(np.float32)
+
+def create_backend(model_name: str, device: str, backend: str):
+    if backend == "torch":
+        return TorchEmbeddingBackend(model_name, device)
+    if backend == "onnx":
+        return OnnxEmbeddingBackend(model_name)
+    if backend == "onnx-int8":
+        return OnnxEmbeddingBackend(model_name, quantize=True)
+    raise ValueError(f"Unsupported embedding backend: {backend}")
 
 class LocalEmbeddingModel:
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        self.model = SentenceTransformer(model_name, device=self.device)
-    
+    def __init__(
+        self,
+        model_name: str = "all-MiniLM-L6-v2",
+        device: Optional[str] = None,
+        backend: Optional[str] = None
+    ):
+        self.model_name = model_name
+        self.backend_name = backend or settings.EMBEDDING_BACKEND
+        # ONNX Runtime backends are CPU-only
+        self.device = (device or default_device()) if self.backend_name == "torch" else "cpu"
+        self.backend = create_backend(model_name, self.device, self.backend_name)
+
+    @property
+    def tokenizer(self):
+        return self.backend.tokenizer
+
+    @property
+    def max_seq_length(self) -> int:
+        # Inputs longer than this are silently truncated by the model
+        return self.backend.max_seq_length
+
     def generate(self, text: str) -> list[float]:
-        return self.model.encode(text, convert_to_tensor=False).tolist()
+        return self.backend.encode([text])[0].tolist()
+
+    def generate_many(self, texts: list[str]) -> list[list[float]]:
+        """Encode several texts in a single forward pass"""
+        return self.backend.encode(texts).tolist()
+
+    def warmup(self):
+        """Run a dummy encode so the first real request doesn't pay for lazy init"""
+        self.backend.encode(["warmup"])
+
+PARITY_SAMPLE_TEXTS = [
+    "Meeting notes from the quarterly planning session",
+    "Remember to buy milk, eggs and bread on the way home",
+    "The mitochondria is the powerhouse of the cell",
+    "Ideas for the next blog post about distributed systems",
+    "Reading list: Designing Data-Intensive Applications, SICP",
+]
+
+def check_parity(
+    reference: LocalEmbeddingModel,
+    candidate: LocalEmbeddingModel,
+    texts: Optional[List[str]] = None,
+    threshold: Optional[float] = None
+) -> dict:
+    """Compare two backends' vectors for the same texts by cosine similarity"""
+    texts = texts or PARITY_SAMPLE_TEXTS
+    threshold = threshold if threshold is not None else settings.ONNX_PARITY_THRESHOLD
+    a = reference.backend.encode(texts)
+    b = candidate.backend.encode(texts)
+    similarities = (a * b).sum(axis=1) / (
+        np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1) + 1e-12
+    )
+    return {
+        "reference": reference.backend_name,
+        "candidate": candidate.backend_name,
+        "min_cosine": float(similarities.min()),
+        "mean_cosine": float(similarities.mean()),
+        "threshold": threshold,
+        "passed": bool(similarities.min() >= threshold)
+    }
 
 def generate_title(content: str) -> str:
     """Generate title from note content"""
@@ -16,4 +216,4 @@ def generate_title(content: str) -> str:
     for sentence in sentences:
         if len(sentence.split()) > 3:  # More than 3 words
             return sentence.strip()[:50] + ('...' if len(sentence) > 50 else '')
-    return content[:30] + ('...' if len(content) > 30 else '')
\ No newline at end of file
+    return content[:30] + ('...' if len(content) > 30 else '')
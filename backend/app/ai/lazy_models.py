@@ -0,0 +1,158 @@
+import gc
+import logging
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+def parameter_bytes(model: Any) -> int:
+    """Weight size of a transformers pipeline (or bare torch module), 0 if unknown"""
+    module = getattr(model, "model", model)
+    try:
+        return sum(p.numel() * p.element_size() for p in module.parameters())
+    except Exception:
+        return 0
+
+class LazyModel:
+    """Handle that builds a model on first use and can drop it again.
+
+    Callers hold the handle, never the model, and call get() each time they
+    need it, so an unloaded model is transparently reloaded.
+    """
+
+    def __init__(self, name: str, loader: Callable[[], Any], manager: "LazyModelManager"):
+        self.name = name
+        self._loader = loader
+        self._manager = manager
+        self._model: Any = None
+        self._lock = threading.Lock()
+        self.last_used = 0.0
+        self.load_seconds: Optional[float] = None
+        self.memory_bytes = 0
+        self.loads = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def get(self) -> Any:
+        self.last_used = time.monotonic()
+        model = self._model
+        if model is not None:
+            return model
+        with self._lock:
+            if self._model is None:
+                start = time.perf_counter()
+                self._model = self._loader()
+                self.load_seconds = time.perf_counter() - start
+                self.memory_bytes = parameter_bytes(self._model)
+                self.loads += 1
+                logger.info(
+                    f"Loaded {self.name} in {self.load_seconds:.2f}s "
+                    f"({self.memory_bytes / 2**20:.0f} MiB of weights)"
+                )
+            model = self._model
+        self._manager.on_load(self)
+        return model
+
+    def unload(self):
+        with self._lock:
+            if self._model is None:
+                return
+            self._model = None
+            self.memory_bytes = 0
+        gc.collect()
+        if "torch" in sys.modules:
+            torch = sys.modules["torch"]
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        logger.info(f"Unloaded {self.name}")
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "loaded": self.loaded,
+            "loads": self.loads,
+            "load_seconds": round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            "memory_mb": round(self.memory_bytes / 2**20, 1),
+            "idle_seconds": round(time.monotonic() - self.last_used, 1) if self.loaded else None
+        }
+
+class LazyModelManager:
+    """Registry of lazy model handles with an idle timeout and a memory budget.
+
+    Models idle for longer than `idle_seconds` are unloaded by a background
+    reaper; when loading a model pushes the total over `budget_bytes`, the
+    least recently used other models are unloaded first.
+    """
+
+    def __init__(self, idle_seconds: float, budget_bytes: int):
+        self.idle_seconds = idle_seconds
+        self.budget_bytes = budget_bytes
+        self._handles: Dict[str, LazyModel] = {}
+        self._lock = threading.Lock()
+        self._reaper: Optional[threading.Thread] = None
+
+    def register(self, name: str, loader: Callable[[], Any]) -> LazyModel:
+        with self._lock:
+            if name not in self._handles:
+                self._handles[name] = LazyModel(name, loader, self)
+            return self._handles[name]
+
+    def get(self, name: str) -> LazyModel:
+        return self._handles[name]
+
+    def warmup(self, names: List[str]):
+        for name in names:
+            if name in self._handles:
+                self._handles[name].get()
+            else:
+                logger.warning(f"Cannot warm up unknown model {name}")
+
+    def on_load(self, handle: LazyModel):
+        self._enforce_budget(keep=handle)
+        if self.idle_seconds > 0 and self._reaper is None:
+            with self._lock:
+                if self._reaper is None:
+                    self._reaper = threading.Thread(target=self._reap, name="model-reaper", daemon=True)
+                    self._reaper.start()
+
+    def _enforce_budget(self, keep: LazyModel):
+        if self.budget_bytes <= 0:
+            return
+        loaded = sorted(
+            (handle for handle in self._handles.values() if handle.loaded and handle is not keep),
+            key=lambda handle: handle.last_used
+        )
+        total = keep.memory_bytes + sum(handle.memory_bytes for handle in loaded)
+        for handle in loaded:
+            if total <= self.budget_bytes:
+                break
+            total -= handle.memory_bytes
+            handle.unload()
+
+    def unload_idle(self):
+        now = time.monotonic()
+        for handle in list(self._handles.values()):
+            if handle.loaded and now - handle.last_used > self.idle_seconds:
+                handle.unload()
+
+    def _reap(self):
+        while True:
+            time.sleep(max(1.0, min(self.idle_seconds / 4, 60.0)))
+            try:
+                self.unload_idle()
+            except Exception as e:
+                logger.error(f"Idle model unload failed: {e}")
+
+    def report(self) -> List[Dict[str, Any]]:
+        return [handle.report() for handle in self._handles.values()]
+
+# Singleton instance
+lazy_models = LazyModelManager(
+    idle_seconds=settings.MODEL_IDLE_UNLOAD_SECONDS,
+    budget_bytes=settings.MODEL_MEMORY_BUDGET_MB * 2**20
+)
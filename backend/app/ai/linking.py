@@ -1,55 +1,123 @@
-from db.qdrant import VectorDB
+from db.vector_store import vector_db, async_vector_store
 from config import settings
-from typing import List
+from typing import Dict, List, Optional, Tuple
+import numpy as np
 
-vector_db = VectorDB()
 def find_related_notes(embedding: List[float], user_id: str, threshold: float = 0.7) -> list:
     """Find semantically related notes"""
     results = vector_db.semantic_search(
         embedding, 
         user_id,
-        threshold=threshold
+        score_threshold=threshold
     )
     
     return [
         {
-            "note_id": hit.id,
-            "similarity": hit.score,
-            "snippet": hit.payload.get('snippet', '')
+            "note_id": hit["note_id"],
+            "similarity": hit["score"],
+            "snippet": hit["payload"].get('snippet', '')
         }
         for hit in results
     ]
 
-def generate_knowledge_graph(user_id: str) -> dict:
-    """Generate knowledge graph of user's concepts"""
-    # Get all note embeddings for user
-    # This is a simplified implementation
-    # Production would use graph algorithms
-    results = vector_db.get_all_vectors(user_id)
+async def find_related_notes_async(
+    embedding: List[float],
+    user_id: str,
+    threshold: float = 0.7,
+    exclude_note_ids: Optional[List[str]] = None
+) -> list:
+    """Find semantically related notes without blocking the event loop"""
+    results = await async_vector_store.semantic_search(
+        embedding,
+        user_id,
+        score_threshold=threshold,
+        exclude_note_ids=exclude_note_ids
+    )
     
-    nodes = []
+    return [
+        {
+            "note_id": hit["note_id"],
+            "similarity": hit["score"],
+            "snippet": hit["payload"].get('snippet', '')
+        }
+        for hit in results
+    ]
+
+def top_k_neighbors(
+    matrix: np.ndarray,
+    k: int,
+    block_bytes: Optional[int] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Top-k most similar rows for every row of a normalized matrix, excluding itself.
+
+    Similarities are computed one block of rows at a time so the block x N
+    score matrix stays under `block_bytes`; argpartition picks each row's k
+    best in linear time before only those k are sorted.
+    Returns (indices, scores), both of shape (N, k).
+    """
+    n = matrix.shape[0]
+    k = min(k, n - 1)
+    if k <= 0:
+        return np.zeros((n, 0), dtype=np.int64), np.zeros((n, 0), dtype=np.float32)
+
+    block_bytes = block_bytes or settings.KNOWLEDGE_GRAPH_BLOCK_MB * 2**20
+    block = max(1, min(n, block_bytes // (n * 4)))
+    indices = np.empty((n, k), dtype=np.int64)
+    scores = np.empty((n, k), dtype=np.float32)
+
+    for start in range(0, n, block):
+        stop = min(start + block, n)
+        sims = matrix[start:stop] @ matrix.T
+        sims[np.arange(stop - start), np.arange(start, stop)] = -np.inf  # No self-links
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(sims, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        indices[start:stop] = np.take_along_axis(top, order, axis=1)
+        scores[start:stop] = np.take_along_axis(top_scores, order, axis=1)
+
+    return indices, scores
+
+def generate_knowledge_graph(
+    user_id: str,
+    note_info: Optional[Dict[str, Tuple[str, str]]] = None,
+    k: Optional[int] = None,
+    threshold: Optional[float] = None
+) -> dict:
+    """Knowledge graph linking each note to its k nearest neighbours.
+
+    `note_info` maps note IDs to (label, group). When given, vectors of notes
+    missing from it (e.g. deleted notes) are left out of the graph.
+    """
+    k = k or settings.KNOWLEDGE_GRAPH_NEIGHBORS
+    threshold = settings.KNOWLEDGE_GRAPH_MIN_SIMILARITY if threshold is None else threshold
+
+    note_ids, matrix = vector_db.get_user_vectors(user_id)
+    if note_info is not None:
+        keep = [row for row, note_id in enumerate(note_ids) if note_id in note_info]
+        note_ids, matrix = [note_ids[row] for row in keep], matrix[keep]
+    note_info = note_info or {}
+    nodes = [
+        {
+            "id": note_id,
+            "label": note_info.get(note_id, ("Note", "general"))[0],
+            "group": note_info.get(note_id, ("Note", "general"))[1]
+        }
+        for note_id in note_ids
+    ]
+
     links = []
-    
-    for i, note in enumerate(results):
-        nodes.append({
-            "id": note.id,
-            "label": note.payload.get('title', 'Note'),
-            "group": note.payload.get('domain', 'general')
-        })
-        
-        # Connect to nearest neighbors
-        neighbors = vector_db.semantic_search(
-            note.embedding, 
-            user_id,
-            limit=3,
-            exclude_ids=[note.id]
-        )
-        
-        for neighbor in neighbors:
+    seen = set()
+    indices, scores = top_k_neighbors(matrix, k)
+    for source, (neighbors, similarities) in enumerate(zip(indices, scores)):
+        for target, similarity in zip(neighbors, similarities):
+            pair = (min(source, target), max(source, target))
+            if similarity < threshold or pair in seen:
+                continue
+            seen.add(pair)
             links.append({
-                "source": note.id,
-                "target": neighbor.id,
-                "value": neighbor.score
+                "source": note_ids[source],
+                "target": note_ids[target],
+                "value": float(similarity)
             })
-    
-    return {"nodes": nodes, "links": links}
\ No newline at end of file
+
+    return {"nodes": nodes, "links": links}
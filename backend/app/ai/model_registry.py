@@ -0,0 +1,112 @@
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from config import settings
+from ai.embeddings import LocalEmbeddingModel, default_device, check_parity
+from ai.batching import BatchedEmbeddingModel
+from ai.embedding_cache import EmbeddingCache, CachedEmbeddingModel
+from ai.async_embeddings import AsyncEmbeddingModel
+
+logger = logging.getLogger(__name__)
+
+class ModelRegistry:
+    """Process-wide registry that loads each embedding model once and shares it"""
+
+    def __init__(self):
+        self._models: Dict[Tuple[str, str], Any] = {}
+        self._key_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.cache = EmbeddingCache(
+            settings.EMBEDDING_CACHE_MAX_BYTES,
+            disk_dir=settings.EMBEDDING_CACHE_DIR or None
+        )
+
+    def _lock_for(self, key: Tuple[str, str]) -> threading.Lock:
+        with self._lock:
+            if key not in self._key_locks:
+                self._key_locks[key] = threading.Lock()
+            return self._key_locks[key]
+
+    def get_embedding_model(
+        self,
+        model_name: Optional[str] = None,
+        device: Optional[str] = None
+    ):
+        """Return the shared model for (model_name, device), loading it on first use"""
+        model_name = model_name or settings.EMBEDDING_MODEL
+        if settings.EMBEDDING_BACKEND != "torch":
+            device = "cpu"  # ONNX Runtime backends are CPU-only
+        device = device or settings.EMBEDDING_DEVICE or default_device()
+        key = (model_name, device)
+
+        model = self._models.get(key)
+        if model is not None:
+            return model
+
+        # Per-key lock so loading one model doesn't block lookups of another
+        with self._lock_for(key):
+            model = self._models.get(key)
+            if model is None:
+                start = time.perf_counter()
+                model = self._build(model_name, device)
+                self._models[key] = model
+                logger.info(
+                    f"Loaded embedding model {model_name} on {device} "
+                    f"in {time.perf_counter() - start:.2f}s"
+                )
+        return model
+
+    def _build(self, model_name: str, device: str):
+        model = LocalEmbeddingModel(model_name, device=device)
+        if model.backend_name != "torch" and settings.ONNX_VERIFY_PARITY:
+            reference = LocalEmbeddingModel(model_name, device=device, backend="torch")
+            parity = check_parity(reference, model)
+            if not parity["passed"]:
+                logger.error(f"ONNX parity check failed for {model_name}, using torch: {parity}")
+                model = reference
+        backend_name = model.backend_name
+        if settings.EMBEDDING_BATCHING_ENABLED:
+            model = BatchedEmbeddingModel(
+                model,
+                max_batch_size=settings.EMBEDDING_BATCH_SIZE,
+                max_wait_ms=settings.EMBEDDING_BATCH_WAIT_MS,
+                max_queue_depth=settings.EMBEDDING_QUEUE_DEPTH
+            )
+        if settings.EMBEDDING_CACHE_ENABLED:
+            # The backend actually in use, after any parity fallback to torch
+            model = CachedEmbeddingModel(model, self.cache, backend_name)
+        return AsyncEmbeddingModel(
+            model,
+            max_workers=settings.EMBEDDING_ASYNC_WORKERS,
+            max_concurrency=settings.EMBEDDING_ASYNC_MAX_CONCURRENCY
+        )
+
+    def warmup(self, model_names: Optional[List[str]] = None):
+        """Load and run a dummy encode through each model"""
+        for model_name in model_names or [settings.EMBEDDING_MODEL]:
+            start = time.perf_counter()
+            self.get_embedding_model(model_name).warmup()
+            logger.info(f"Warmed up {model_name} in {time.perf_counter() - start:.2f}s")
+
+    def loaded_models(self) -> List[Dict[str, str]]:
+        return [
+            {"model_name": model_name, "device": device}
+            for model_name, device in self._models
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        """Runtime counters reported by each loaded model front end"""
+        return {
+            f"{model_name}@{device}": model.stats() if hasattr(model, "stats") else {}
+            for (model_name, device), model in self._models.items()
+        }
+
+# Singleton instance
+model_registry = ModelRegistry()
+
+def get_embedding_model(
+    model_name: Optional[str] = None,
+    device: Optional[str] = None
+):
+    return model_registry.get_embedding_model(model_name, device)
@@ -1,25 +1,32 @@
-from transformers import pipeline
-from PIL import Image
-import requests
-from io import BytesIO
-import torch
+import logging
+from typing import Optional
+from ai.captioning import ImageCaptioner, image_captioner
+from utils.web_fetch import web_fetcher
+
+logger = logging.getLogger(__name__)
 
 class MultimodalProcessor:
-    def __init__(self):
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        self.model = pipeline(
-            "image-to-text",
-            model="Salesforce/blip-image-captioning-base",
-            device=self.device
-        )
+    def __init__(self, captioner: Optional[ImageCaptioner] = None):
+        # BLIP loads on the first caption, not when the processor is created
+        self.captioner = captioner or image_captioner
+
+    @property
+    def model(self):
+        return self.captioner.model_handle.get()
     
     def describe_image(self, image_path: str) -> str:
         """Generate description for an image"""
         try:
-            result = self.model(image_path)
-            return result[0]['generated_text']
+            return self.captioner.describe(image_path)
+        except Exception as e:
+            logger.error(f"Image description error: {e}")
+            return "An image"
+
+    async def describe_image_async(self, image_path: str) -> str:
+        try:
+            return await self.captioner.describe_async(image_path)
         except Exception as e:
-            print(f"Image description error: {e}")
+            logger.error(f"Image description error: {e}")
             return "An image"
     
     def extract_text_from_image(self, image_path: str) -> str:
@@ -28,13 +35,6 @@ class MultimodalProcessor:
         # Simplified implementation
         return "Extracted text would appear here"
 
-def get_web_content(url: str) -> str:
-    """Get and process web content"""
-    try:
-        response = requests.get(url, timeout=5)
-        if response.status_code == 200:
-            return response.text[:5000]  # Limit content size
-        return ""
-    except Exception as e:
-        print(f"Web content error: {e}")
-        return ""
\ No newline at end of file
+async def get_web_content(url: str) -> str:
+    """Get and process web content, reading at most WEB_FETCH_MAX_BYTES"""
+    return await web_fetcher.fetch(url)
@@ -0,0 +1,195 @@
+import asyncio
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from config import settings
+from ai import titling
+
+TIERS = ("lexical", "embedding", "generative")
+
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have
+having he her here hers him his how i if in into is it its itself just me more most my no nor not
+now of off on once only or other our ours out over own same she should so some such than that the
+their theirs them then there these they this those through to too under until up very was we were
+what when where which while who whom why will with would you your yours also get got like one two
+new note notes today yesterday tomorrow
+""".split())
+
+_WORD = re.compile(r"[A-Za-z0-9][A-Za-z0-9'\-]*")
+_HEADING = re.compile(r"^\s{0,3}#{1,6}\s+(.+?)\s*#*\s*$")
+
+def heading_title(content: str) -> Optional[str]:
+    """Title the author already wrote: a markdown heading or a short first line"""
+    first_line = content.lstrip().split("\n", 1)[0].strip()
+    match = _HEADING.match(first_line)
+    if match:
+        return match.group(1)
+    if "\n" in content.strip() and 1 < len(first_line.split()) <= 10 and first_line[-1:] not in ".!?,;:":
+        return first_line
+    return None
+
+def key_phrases(content: str, max_chars: int = 2000, top_n: int = 8) -> List[Tuple[str, float]]:
+    """RAKE-style key phrases: runs of non-stopwords, scored by word degree / frequency"""
+    phrases: List[List[str]] = []
+    for fragment in re.split(r"[.!?,;:\n()\[\]{}\"]+", content[:max_chars]):
+        current: List[str] = []
+        for word in _WORD.findall(fragment):
+            if word.lower() in STOPWORDS:
+                if current:
+                    phrases.append(current)
+                current = []
+            else:
+                current.append(word)
+        if current:
+            phrases.append(current)
+
+    frequency: Dict[str, int] = defaultdict(int)
+    degree: Dict[str, int] = defaultdict(int)
+    for phrase in phrases:
+        for word in phrase:
+            frequency[word.lower()] += 1
+            degree[word.lower()] += len(phrase)
+
+    scored: Dict[str, float] = {}
+    for phrase in phrases:
+        if len(phrase) > 6 or all(word.isdigit() for word in phrase):
+            continue
+        text = " ".join(phrase)
+        scored[text] = sum(degree[word.lower()] / frequency[word.lower()] for word in phrase)
+    return sorted(scored.items(), key=lambda item: item[1], reverse=True)[:top_n]
+
+def format_title(phrase: str) -> str:
+    phrase = phrase.strip()
+    return (phrase[:1].upper() + phrase[1:])[:100]
+
+class TierStats:
+    def __init__(self):
+        self.attempts = 0
+        self.hits = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, elapsed_ms: float, hit: bool):
+        self.attempts += 1
+        self.hits += int(hit)
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "attempts": self.attempts,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.attempts, 3) if self.attempts else 0.0,
+            "avg_ms": round(self.total_ms / self.attempts, 3) if self.attempts else 0.0,
+            "max_ms": round(self.max_ms, 3)
+        }
+
+class TitleEngine:
+    """Cheapest-first titling.
+
+    lexical:    an author-written heading, accepted outright
+    embedding:  key phrases scored by cosine similarity to the note's own
+                embedding (already computed at indexing time). The phrases
+                themselves are embedded here, one batched forward pass over
+                up to 8 short strings: far cheaper than GPT-2, but a model
+                call, not a sub-millisecond dot product
+    generative: GPT-2, only when the best phrase scores below
+                TITLE_MIN_CONFIDENCE or the caller forces it
+    Each tier records latency and how often its answer was accepted.
+    """
+
+    def __init__(self, embedding_model=None):
+        self._embedding_model = embedding_model
+        self._stats = {tier: TierStats() for tier in TIERS}
+        self._lock = threading.Lock()
+
+    @property
+    def embedding_model(self):
+        if self._embedding_model is None:
+            from ai.model_registry import get_embedding_model
+            self._embedding_model = get_embedding_model()
+        return self._embedding_model
+
+    def _record(self, tier: str, start: float, hit: bool):
+        with self._lock:
+            self._stats[tier].record((time.perf_counter() - start) * 1000, hit)
+
+    def _cheap_tiers(self, content: str, embedding: Optional[List[float]]) -> Tuple[Optional[str], str, float]:
+        """(title, tier, confidence) from the non-generative tiers"""
+        if len(content) < 50:
+            return content[:30] + ('...' if len(content) > 30 else ''), "lexical", 1.0
+
+        start = time.perf_counter()
+        heading = heading_title(content)
+        phrases = key_phrases(content) if heading is None else []
+        self._record("lexical", start, heading is not None)
+        if heading is not None:
+            return format_title(heading), "lexical", 1.0
+
+        if not phrases:
+            return None, "lexical", 0.0
+        if embedding is None:
+            return format_title(phrases[0][0]), "lexical", 0.0
+
+        start = time.perf_counter()
+        candidates = [phrase for phrase, _ in phrases]
+        vectors = np.asarray(self.embedding_model.generate_many(candidates), dtype=np.float32)
+        note_vector = np.asarray(embedding, dtype=np.float32)
+        scores = vectors @ note_vector / (
+            np.linalg.norm(vectors, axis=1) * np.linalg.norm(note_vector) + 1e-12
+        )
+        best = int(np.argmax(scores))
+        confidence = float(scores[best])
+        self._record("embedding", start, confidence >= settings.TITLE_MIN_CONFIDENCE)
+        return format_title(candidates[best]), "embedding", confidence
+
+    def _needs_generation(self, title: Optional[str], confidence: float, force: bool, allow: bool) -> bool:
+        if not allow:
+            return False
+        return force or title is None or confidence < settings.TITLE_MIN_CONFIDENCE
+
+    def title(
+        self,
+        content: str,
+        embedding: Optional[List[float]] = None,
+        force_generative: bool = False,
+        allow_generative: bool = True
+    ) -> Tuple[str, str]:
+        """(title, tier that produced it); allow_generative=False keeps the LLM off hot paths"""
+        title, tier, confidence = (None, "lexical", 0.0) if force_generative else self._cheap_tiers(content, embedding)
+        if not self._needs_generation(title, confidence, force_generative, allow_generative):
+            return title or titling.fallback_title(content), tier
+
+        start = time.perf_counter()
+        generated = titling.generate_title(content)
+        self._record("generative", start, True)
+        return generated, "generative"
+
+    async def title_async(
+        self,
+        content: str,
+        embedding: Optional[List[float]] = None,
+        force_generative: bool = False
+    ) -> Tuple[str, str]:
+        title, tier, confidence = (None, "lexical", 0.0) if force_generative else await asyncio.to_thread(
+            self._cheap_tiers, content, embedding
+        )
+        if not self._needs_generation(title, confidence, force_generative, True):
+            return title or titling.fallback_title(content), tier
+
+        start = time.perf_counter()
+        generated = await titling.generate_title_async(content)
+        self._record("generative", start, True)
+        return generated, "generative"
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {tier: stats.report() for tier, stats in self._stats.items()}
+
+# Singleton instance
+title_engine = TitleEngine()
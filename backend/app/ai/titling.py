@@ -1,47 +1,102 @@
-from transformers import pipeline
 from config import settings
-import torch
-from typing import Optional
+from ai.lazy_models import lazy_models, LazyModel
+from ai.batching import MicroBatcher
+from typing import List, Optional
+import asyncio
+
+def load_title_pipeline():
+    # Heavy imports stay inside the loader so importing this module is cheap
+    import torch
+    from transformers import pipeline
+    generator = pipeline(
+        "text-generation",
+        model=settings.TITLE_GENERATION_MODEL,
+        device=0 if torch.cuda.is_available() else -1
+    )
+    # Decoder-only models continue from the last token, so batches pad on the left
+    generator.tokenizer.padding_side = "left"
+    if generator.tokenizer.pad_token is None:
+        generator.tokenizer.pad_token = generator.tokenizer.eos_token
+    return generator
+
+title_model = lazy_models.register("title", load_title_pipeline)
+
+def title_prompt(content: str) -> str:
+    # Generate title using the first 200 characters
+    return f"Generate a concise title for the following text:\n{content[:200]}\nTitle:"
+
+def fallback_title(content: str) -> str:
+    """First meaningful sentence, or the start of the text"""
+    sentences = content.split('.')
+    for sentence in sentences:
+        if len(sentence.split()) > 3:  # More than 3 words
+            return sentence.strip()[:50] + ('...' if len(sentence) > 50 else '')
+    return content[:30] + ('...' if len(content) > 30 else '')
+
+def clean_title(generated: str) -> str:
+    # Clean up any extra text
+    title = generated.strip().split('\n')[0].split('.')[0]
+    return title[:100]  # Limit title length
 
 class TitleGenerator:
-    def __init__(self):
-        self.device = 0 if torch.cuda.is_available() else -1
-        self.model = pipeline(
-            "text-generation", 
-            model=settings.TITLE_GENERATION_MODEL,
-            device=self.device
-        )
-    
+    def __init__(self, model: Optional[LazyModel] = None):
+        self.model_handle = model or title_model
+
+    @property
+    def model(self):
+        return self.model_handle.get()
+
+    def generate_titles(self, contents: List[str]) -> List[str]:
+        """Titles for many notes with one padded, greedy generate call per batch"""
+        titles: List[Optional[str]] = [None] * len(contents)
+        pending = []
+        for i, content in enumerate(contents):
+            if len(content) < 50:
+                titles[i] = content[:30] + ('...' if len(content) > 30 else '')
+            else:
+                pending.append(i)
+
+        if pending:
+            try:
+                model = self.model
+                results = model(
+                    [title_prompt(contents[i]) for i in pending],
+                    max_new_tokens=settings.TITLE_MAX_NEW_TOKENS,  # Prompt length no longer eats the budget
+                    do_sample=False,
+                    num_beams=1,
+                    return_full_text=False,  # Don't echo the prompt back
+                    batch_size=settings.TITLE_BATCH_SIZE,
+                    pad_token_id=model.tokenizer.pad_token_id,
+                    truncation=True
+                )
+                for i, result in zip(pending, results):
+                    titles[i] = clean_title(result[0]['generated_text']) or fallback_title(contents[i])
+            except Exception as e:
+                print(f"Title generation error: {e}")
+                for i in pending:
+                    titles[i] = fallback_title(contents[i])
+
+        return titles
+
     def generate_title(self, content: str) -> str:
-        if len(content) < 50:
-            return content[:30] + ('...' if len(content) > 30 else '')
-        
-        # Generate title using the first 200 characters
-        prompt = f"Generate a concise title for the following text:\n{content[:200]}\nTitle:"
-        
-        try:
-            result = self.model(
-                prompt,
-                max_length=30,
-                num_return_sequences=1,
-                truncation=True
-            )
-            title = result[0]['generated_text'].replace(prompt, '').strip()
-            
-            # Clean up any extra text
-            title = title.split('\n')[0].split('.')[0]
-            return title[:100]  # Limit title length
-        except Exception as e:
-            print(f"Title generation error: {e}")
-            # Fallback to first meaningful sentence
-            sentences = content.split('.')
-            for sentence in sentences:
-                if len(sentence.split()) > 3:  # More than 3 words
-                    return sentence.strip()[:50] + ('...' if len(sentence) > 50 else '')
-            return content[:30] + ('...' if len(content) > 30 else '')
-
-# Global instance for reuse
+        return self.generate_titles([content])[0]
+
+# Global instance for reuse; GPT-2 itself loads on the first title
 title_generator = TitleGenerator()
 
+# Concurrent single-note callers share generate calls
+title_batcher = MicroBatcher(
+    title_generator.generate_titles,
+    max_batch_size=settings.TITLE_BATCH_SIZE,
+    max_wait_ms=settings.TITLE_BATCH_WAIT_MS,
+    name="title-batcher"
+)
+
 def generate_title(content: str) -> str:
-    return title_generator.generate_title(content)
\ No newline at end of file
+    return title_batcher.submit(content).result()
+
+async def generate_title_async(content: str) -> str:
+    return await asyncio.wrap_future(title_batcher.submit(content))
+
+def generate_titles(contents: List[str]) -> List[str]:
+    return title_generator.generate_titles(contents)
@@ -0,0 +1,196 @@
+# db/async_qdrant.py
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+import httpx
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http import models as rest
+from qdrant_client.models import Filter, FieldCondition, MatchValue, PointStruct
+from config import settings
+from db.qdrant import (
+    collapse_chunk_hits, build_chunk_points, collection_params, payload_index_schemas,
+    layout_shard_keys, tenant_shard_key, group_by_shard_key, search_params
+)
+
+logger = logging.getLogger(__name__)
+
+class AsyncVectorStore:
+    """Process-wide async facade over AsyncQdrantClient.
+
+    One client (and so one HTTP or gRPC connection pool) is shared by every
+    async endpoint, instead of each request borrowing a threadpool worker to
+    drive the blocking client. Every call takes an optional timeout in seconds.
+    """
+
+    def __init__(self, collection_name: Optional[str] = None):
+        self.collection_name = collection_name or settings.VECTOR_COLLECTION
+        self._client: Optional[AsyncQdrantClient] = None
+        self._collection_ready = False
+
+    @property
+    def client(self) -> AsyncQdrantClient:
+        # Created lazily so importing this module doesn't open connections
+        if self._client is None:
+            self._client = AsyncQdrantClient(
+                url=settings.QDRANT_URL,
+                api_key=settings.QDRANT_API_KEY,
+                prefer_grpc=settings.QDRANT_PREFER_GRPC,
+                grpc_port=settings.QDRANT_GRPC_PORT,
+                timeout=settings.QDRANT_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=settings.QDRANT_POOL_SIZE,
+                    max_keepalive_connections=settings.QDRANT_POOL_SIZE
+                )
+            )
+        return self._client
+
+    async def ensure_collection(self, vector_size: int = 384):
+        """Create the collection if needed; cached after the first successful check"""
+        if self._collection_ready:
+            return
+        if not await self.client.collection_exists(self.collection_name):
+            aliases = await self.client.get_aliases()
+            if not any(alias.alias_name == self.collection_name for alias in aliases.aliases):
+                await self.client.create_collection(
+                    collection_name=self.collection_name,
+                    **collection_params(vector_size)
+                )
+                if settings.VECTOR_TENANT_LAYOUT == "partitioned":
+                    for shard_key in layout_shard_keys():
+                        await self.client.create_shard_key(self.collection_name, shard_key)
+                for field, schema in payload_index_schemas().items():
+                    await self.client.create_payload_index(
+                        collection_name=self.collection_name,
+                        field_name=field,
+                        field_schema=schema,
+                        wait=True
+                    )
+                logger.info(f"Created Qdrant collection: {self.collection_name}")
+        self._collection_ready = True
+
+    async def semantic_search(
+        self,
+        query_vector: List[float],
+        user_id: int,
+        limit: int = 5,
+        score_threshold: float = 0.5,
+        additional_filters: Optional[Dict[str, Any]] = None,
+        exclude_note_ids: Optional[List[str]] = None,
+        timeout: Optional[int] = None,
+        hnsw_ef: Optional[int] = None,
+        oversampling: Optional[float] = None,
+        rescore: Optional[bool] = None,
+        exact: bool = False
+    ) -> List[Dict[str, Any]]:
+        """Perform semantic search for similar notes"""
+        try:
+            filter_conditions = [
+                FieldCondition(key="user_id", match=MatchValue(value=int(user_id)))
+            ]
+            for key, value in (additional_filters or {}).items():
+                filter_conditions.append(FieldCondition(key=key, match=MatchValue(value=value)))
+            exclusions = [
+                FieldCondition(key="note_id", match=MatchValue(value=note_id))
+                for note_id in exclude_note_ids or []
+            ]
+
+            response = await self.client.query_points(
+                collection_name=self.collection_name,
+                query=query_vector,
+                query_filter=Filter(must=filter_conditions, must_not=exclusions or None),
+                limit=limit * settings.CHUNK_SEARCH_OVERSAMPLE,
+                score_threshold=score_threshold,
+                with_payload=True,
+                with_vectors=False,
+                search_params=search_params(hnsw_ef, oversampling, rescore, exact),
+                timeout=timeout or settings.QDRANT_SEARCH_TIMEOUT,
+                shard_key_selector=tenant_shard_key(user_id)
+            )
+
+            results = collapse_chunk_hits(
+                [(point.id, point.score, point.payload) for point in response.points],
+                limit
+            )
+            logger.debug(f"Found {len(results)} similar notes for user {user_id}")
+            return results
+
+        except Exception as e:
+            logger.error(f"Semantic search failed for user {user_id}: {e}")
+            raise
+
+    async def get_note_vector(self, note_id: str, timeout: Optional[int] = None) -> Optional[List[float]]:
+        """Vector of a note's first chunk, or None if it hasn't been indexed"""
+        points = await self.client.retrieve(
+            collection_name=self.collection_name,
+            ids=[note_id],
+            with_vectors=True,
+            with_payload=False,
+            timeout=timeout or settings.QDRANT_SEARCH_TIMEOUT
+        )
+        return points[0].vector if points else None
+
+    async def upsert_note_chunks(
+        self,
+        note_id: str,
+        user_id: int,
+        chunks: List[Tuple[int, str, List[float]]],
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> List[str]:
+        """Upsert one point per (chunk_index, chunk_text, vector), linked to the note"""
+        points = build_chunk_points(note_id, user_id, chunks, metadata)
+        await self.upsert_points(points)
+        return [point.id for point in points]
+
+    async def delete_stale_chunks(self, note_id: str, chunk_count: int, timeout: Optional[int] = None) -> bool:
+        """Delete chunks at index >= chunk_count, left over from a longer version of the note"""
+        try:
+            await self.client.delete(
+                collection_name=self.collection_name,
+                points_selector=Filter(
+                    must=[
+                        FieldCondition(key="note_id", match=MatchValue(value=note_id)),
+                        FieldCondition(key="chunk_index", range=rest.Range(gte=chunk_count))
+                    ]
+                ),
+                timeout=timeout
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Failed to delete stale chunks for note {note_id}: {e}")
+            return False
+
+    async def upsert_points(self, points: List[PointStruct], timeout: Optional[int] = None):
+        """Upsert prebuilt points, one request per shard key"""
+        if not points:
+            return
+        try:
+            await self.ensure_collection(len(points[0].vector))
+            for shard_key, group in group_by_shard_key(points).items():
+                await self.client.upsert(
+                    collection_name=self.collection_name,
+                    points=group,
+                    timeout=timeout,
+                    shard_key_selector=shard_key
+                )
+        except Exception as e:
+            logger.error(f"Failed to upsert {len(points)} points: {e}")
+            raise
+
+    async def delete_note_vector(self, note_id: str, timeout: Optional[int] = None) -> bool:
+        """Delete all of a note's chunk vectors from the collection"""
+        try:
+            await self.client.delete(
+                collection_name=self.collection_name,
+                points_selector=Filter(
+                    must=[FieldCondition(key="note_id", match=MatchValue(value=note_id))]
+                ),
+                timeout=timeout
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Failed to delete vector for note {note_id}: {e}")
+            return False
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
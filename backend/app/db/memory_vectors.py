@@ -0,0 +1,414 @@
+# db/memory_vectors.py
+import asyncio
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+import numpy as np
+from config import settings
+from db.qdrant import collapse_chunk_hits, build_chunk_points, mean_vectors_by_note
+
+logger = logging.getLogger(__name__)
+
+class _UserIndex:
+    """Vectors of one user: a contiguous float32 matrix plus an ID-to-row index.
+
+    Rows are L2-normalized on insert so cosine similarity is a plain dot
+    product. Deletes swap the last row into the hole, keeping the matrix dense.
+    """
+
+    def __init__(self, matrix: Optional[np.ndarray] = None, ids: Optional[List[str]] = None,
+                 payloads: Optional[List[Dict[str, Any]]] = None):
+        self.matrix = matrix  # May be a read-only memmap until the first write
+        self.ids: List[str] = ids or []
+        self.payloads: List[Dict[str, Any]] = payloads or []
+        self.rows: Dict[str, int] = {point_id: row for row, point_id in enumerate(self.ids)}
+        self.notes: Dict[str, Set[str]] = {}
+        for point_id, payload in zip(self.ids, self.payloads):
+            self.notes.setdefault(payload.get("note_id", point_id), set()).add(point_id)
+        self.dirty = False
+
+    @property
+    def count(self) -> int:
+        return len(self.ids)
+
+    def _writable(self, dim: int):
+        """Make sure the matrix is an in-memory array with room for one more row"""
+        if self.matrix is None:
+            self.matrix = np.zeros((64, dim), dtype=np.float32)
+        elif isinstance(self.matrix, np.memmap) or self.count >= self.matrix.shape[0]:
+            capacity = max(64, self.matrix.shape[0] * (2 if self.count >= self.matrix.shape[0] else 1))
+            grown = np.zeros((capacity, self.matrix.shape[1]), dtype=np.float32)
+            grown[:self.count] = self.matrix[:self.count]
+            self.matrix = grown
+
+    def upsert(self, point_id: str, vector: List[float], payload: Dict[str, Any]):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector = vector / norm
+
+        self._writable(vector.shape[0])
+        row = self.rows.get(point_id)
+        if row is None:
+            row = self.count
+            self.ids.append(point_id)
+            self.payloads.append(payload)
+            self.rows[point_id] = row
+        else:
+            old_note = self.payloads[row].get("note_id", point_id)
+            self.notes.get(old_note, set()).discard(point_id)
+            self.payloads[row] = payload
+        self.matrix[row] = vector
+        self.notes.setdefault(payload.get("note_id", point_id), set()).add(point_id)
+        self.dirty = True
+
+    def delete(self, point_id: str):
+        row = self.rows.pop(point_id, None)
+        if row is None:
+            return
+        if isinstance(self.matrix, np.memmap):
+            self._writable(self.matrix.shape[1])
+        note_id = self.payloads[row].get("note_id", point_id)
+        self.notes.get(note_id, set()).discard(point_id)
+        if not self.notes.get(note_id):
+            self.notes.pop(note_id, None)
+
+        last = self.count - 1
+        if row != last:
+            # Swap-remove keeps rows contiguous
+            self.matrix[row] = self.matrix[last]
+            self.ids[row] = self.ids[last]
+            self.payloads[row] = self.payloads[last]
+            self.rows[self.ids[row]] = row
+        self.ids.pop()
+        self.payloads.pop()
+        self.dirty = True
+
+    def search(
+        self,
+        query_vector: List[float],
+        limit: int,
+        score_threshold: float,
+        filters: Optional[Dict[str, Any]] = None,
+        exclude_note_ids: Optional[List[str]] = None
+    ) -> List[Tuple[str, float, Dict[str, Any]]]:
+        if self.count == 0:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+
+        scores = self.matrix[:self.count] @ query
+        mask = scores >= score_threshold
+        if filters or exclude_note_ids:
+            excluded = set(exclude_note_ids or [])
+            for row, payload in enumerate(self.payloads):
+                if not mask[row]:
+                    continue
+                if payload.get("note_id") in excluded or any(
+                    payload.get(key) != value for key, value in (filters or {}).items()
+                ):
+                    mask[row] = False
+
+        candidates = np.flatnonzero(mask)
+        if candidates.size > limit:
+            top = np.argpartition(-scores[candidates], limit - 1)[:limit]
+            candidates = candidates[top]
+        candidates = candidates[np.argsort(-scores[candidates])]
+        return [(self.ids[row], float(scores[row]), self.payloads[row]) for row in candidates]
+
+class InMemoryVectorDB:
+    """In-process implementation of the VectorDB interface.
+
+    Keeps each user's vectors in its own matrix and does exact top-k search
+    with a vectorized dot product, so small deployments skip the Qdrant round
+    trip and tests need no outside service. Indexes are persisted per user as
+    an .npy file (loaded lazily as a read-only memmap) plus a JSON sidecar with
+    point IDs and payloads; dirty users are flushed in the background.
+
+    Single process only: every process builds its own copy of the index and
+    would overwrite the others' files, so vectors written elsewhere are never
+    seen. Celery workers refuse to start with this backend; use it where the
+    API process does all indexing itself (small deployments, tests).
+    """
+
+    def __init__(self, directory: Optional[str] = None, flush_interval: Optional[float] = None):
+        self.directory = Path(directory or settings.MEMORY_VECTOR_DIR)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.collection_name = "memory"
+        self._users: Dict[str, _UserIndex] = {}
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        # Note -> owning user for every persisted user, not just loaded ones, so
+        # deletes and lookups by note ID work before the owner's index is loaded
+        self._note_owners: Dict[str, str] = self._load_owners()
+        self._owners_dirty = False
+
+        interval = flush_interval if flush_interval is not None else settings.MEMORY_VECTOR_FLUSH_INTERVAL
+        if interval > 0:
+            self._flusher = threading.Thread(target=self._flush_loop, args=(interval,), name="vector-flush", daemon=True)
+            self._flusher.start()
+
+    # Persistence
+
+    def _user(self, user_id: Any) -> _UserIndex:
+        key = str(user_id)
+        index = self._users.get(key)
+        if index is None:
+            index = self._load_user(key)
+            self._users[key] = index
+            for note_id in index.notes:
+                self._set_owner(note_id, key)
+        return index
+
+    def _load_owners(self) -> Dict[str, str]:
+        owners_path = self.directory / "owners.json"
+        meta_paths = list(self.directory.glob("*/meta.json"))
+        if owners_path.exists() and all(
+            path.stat().st_mtime <= owners_path.stat().st_mtime for path in meta_paths
+        ):
+            return json.loads(owners_path.read_text())
+
+        # Missing or older than a user index (e.g. a crash mid-flush): rebuild from the sidecars
+        owners: Dict[str, str] = {}
+        for meta_path in meta_paths:
+            meta = json.loads(meta_path.read_text())
+            for point_id, payload in zip(meta["ids"], meta["payloads"]):
+                owners[payload.get("note_id", point_id)] = meta_path.parent.name
+        return owners
+
+    def _set_owner(self, note_id: str, key: Optional[str]):
+        if key is None:
+            self._owners_dirty |= self._note_owners.pop(note_id, None) is not None
+        elif self._note_owners.get(note_id) != key:
+            self._note_owners[note_id] = key
+            self._owners_dirty = True
+
+    def _load_user(self, key: str) -> _UserIndex:
+        vectors_path = self.directory / key / "vectors.npy"
+        meta_path = self.directory / key / "meta.json"
+        if not meta_path.exists():
+            return _UserIndex()
+        meta = json.loads(meta_path.read_text())
+        matrix = np.load(vectors_path, mmap_mode="r") if meta["ids"] else None
+        return _UserIndex(matrix, meta["ids"], meta["payloads"])
+
+    def _save_user(self, key: str, index: _UserIndex):
+        user_dir = self.directory / key
+        user_dir.mkdir(parents=True, exist_ok=True)
+        vectors = index.matrix[:index.count] if index.matrix is not None else np.zeros((0, 0), dtype=np.float32)
+        # np.save appends .npy, so name the temp file accordingly
+        np.save(user_dir / "vectors.tmp.npy", np.ascontiguousarray(vectors))
+        os.replace(user_dir / "vectors.tmp.npy", user_dir / "vectors.npy")
+        (user_dir / "meta.tmp.json").write_text(json.dumps({"ids": index.ids, "payloads": index.payloads}))
+        os.replace(user_dir / "meta.tmp.json", user_dir / "meta.json")
+        index.dirty = False
+
+    def flush(self):
+        """Write every modified user index to disk"""
+        with self._lock:
+            saved = False
+            for key, index in self._users.items():
+                if index.dirty:
+                    self._save_user(key, index)
+                    saved = True
+            # Written after the user indexes, so it is never older than them after a clean flush
+            if self._owners_dirty or saved:
+                (self.directory / "owners.tmp.json").write_text(json.dumps(self._note_owners))
+                os.replace(self.directory / "owners.tmp.json", self.directory / "owners.json")
+                self._owners_dirty = False
+
+    def close(self):
+        """Stop the background flusher and persist pending changes"""
+        self._stop.set()
+        self.flush()
+
+    def _flush_loop(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Failed to persist in-memory vector index: {e}")
+
+    # VectorDB interface
+
+    async def initialize_collection(self, vector_size: int = 384):
+        return None
+
+    def ensure_collection(self, vector_size: int = 384):
+        return None
+
+    def upsert_note_vector(
+        self,
+        vector: List[float],
+        note_id: str,
+        user_id: int,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Upsert a note vector with metadata"""
+        self.upsert_note_vectors([(note_id, user_id, vector, metadata)])
+        return note_id
+
+    def upsert_note_vectors(
+        self,
+        items: List[Tuple[str, int, List[float], Optional[Dict[str, Any]]]]
+    ) -> List[str]:
+        """Bulk upsert (note_id, user_id, vector, metadata) tuples"""
+        with self._lock:
+            for note_id, user_id, vector, metadata in items:
+                payload = {"user_id": int(user_id), "note_id": note_id, **(metadata or {})}
+                self._user(user_id).upsert(note_id, vector, payload)
+                self._set_owner(note_id, str(user_id))
+        return [note_id for note_id, _, _, _ in items]
+
+    def upsert_note_chunks(
+        self,
+        note_id: str,
+        user_id: int,
+        chunks: List[Tuple[int, str, List[float]]],
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> List[str]:
+        """Upsert one point per (chunk_index, chunk_text, vector), linked to the note"""
+        points = build_chunk_points(note_id, user_id, chunks, metadata)
+        self.upsert_points(points)
+        return [point.id for point in points]
+
+    def upsert_points(self, points: list, wait: bool = True):
+        """Upsert prebuilt PointStructs"""
+        with self._lock:
+            for point in points:
+                user_id = point.payload["user_id"]
+                self._user(user_id).upsert(str(point.id), point.vector, dict(point.payload))
+                self._set_owner(point.payload.get("note_id", str(point.id)), str(user_id))
+
+    def delete_stale_chunks(self, note_id: str, chunk_count: int) -> bool:
+        """Delete chunks at index >= chunk_count, left over from a longer version of the note"""
+        with self._lock:
+            owner = self._note_owners.get(note_id)
+            if owner is None:
+                return True
+            index = self._user(owner)
+            for point_id in list(index.notes.get(note_id, ())):
+                if index.payloads[index.rows[point_id]].get("chunk_index", 0) >= chunk_count:
+                    index.delete(point_id)
+        return True
+
+    def delete_stale_attachment_chunks(self, note_id: str, chunk_count: int) -> bool:
+        """Delete attachment chunks (negative indexes) below -chunk_count, left over from a longer previous attachment"""
+        with self._lock:
+            owner = self._note_owners.get(note_id)
+            if owner is None:
+                return True
+            index = self._user(owner)
+            for point_id in list(index.notes.get(note_id, ())):
+                if index.payloads[index.rows[point_id]].get("chunk_index", 0) < -chunk_count:
+                    index.delete(point_id)
+        return True
+
+    def semantic_search(
+        self,
+        query_vector: List[float],
+        user_id: int,
+        limit: int = 5,
+        score_threshold: float = 0.5,
+        additional_filters: Optional[Dict[str, Any]] = None,
+        exclude_note_ids: Optional[List[str]] = None,
+        **search_options
+    ) -> List[Dict[str, Any]]:
+        """Exact top-k search over one user's vectors; Qdrant tuning options are ignored"""
+        with self._lock:
+            hits = self._user(user_id).search(
+                query_vector,
+                limit * settings.CHUNK_SEARCH_OVERSAMPLE,
+                score_threshold,
+                filters=additional_filters,
+                exclude_note_ids=exclude_note_ids
+            )
+        return collapse_chunk_hits(hits, limit)
+
+    def get_note_vector(self, note_id: str) -> Optional[List[float]]:
+        with self._lock:
+            owner = self._note_owners.get(note_id)
+            if owner is None:
+                return None
+            index = self._user(owner)
+            row = index.rows.get(note_id)
+            return index.matrix[row].tolist() if row is not None else None
+
+    def get_user_vectors(self, user_id: int, batch_size: int = 1024) -> Tuple[List[str], np.ndarray]:
+        """All of a user's notes as (note_ids, matrix of note-level vectors)"""
+        with self._lock:
+            index = self._user(user_id)
+            note_ids = [payload.get("note_id", point_id) for point_id, payload in zip(index.ids, index.payloads)]
+            vectors = index.matrix[:index.count] if index.count else None
+            return mean_vectors_by_note([(note_ids, vectors)] if vectors is not None else [])
+
+    def delete_note_vector(self, note_id: str) -> bool:
+        """Delete all of a note's chunk vectors"""
+        with self._lock:
+            owner = self._note_owners.get(note_id)
+            self._set_owner(note_id, None)
+            if owner is not None:
+                index = self._user(owner)
+                for point_id in list(index.notes.get(note_id, ())):
+                    index.delete(point_id)
+        return True
+
+    def delete_user_vectors(self, user_id: int) -> bool:
+        """Delete all vectors for a specific user"""
+        key = str(user_id)
+        with self._lock:
+            index = self._user(user_id)
+            for note_id in list(index.notes):
+                self._set_owner(note_id, None)
+            self._users[key] = _UserIndex()
+            self._users[key].dirty = True
+        return True
+
+    def get_collection_info(self) -> Dict[str, Any]:
+        with self._lock:
+            points = sum(index.count for index in self._users.values())
+        return {
+            "status": "green",
+            "points_count": points,
+            "loaded_users": len(self._users),
+            "config": {"backend": "memory", "directory": str(self.directory)}
+        }
+
+    def health_check(self) -> bool:
+        return True
+
+class AsyncInMemoryVectorStore:
+    """Async adapter so InMemoryVectorDB can stand in for AsyncVectorStore"""
+
+    def __init__(self, vector_db: InMemoryVectorDB):
+        self.vector_db = vector_db
+
+    async def semantic_search(self, query_vector, user_id, limit: int = 5, score_threshold: float = 0.5,
+                              additional_filters=None, exclude_note_ids=None, timeout=None, **search_options):
+        return await asyncio.to_thread(
+            self.vector_db.semantic_search, query_vector, user_id, limit,
+            score_threshold, additional_filters, exclude_note_ids
+        )
+
+    async def get_note_vector(self, note_id: str, timeout=None):
+        return self.vector_db.get_note_vector(note_id)
+
+    async def upsert_note_chunks(self, note_id, user_id, chunks, metadata=None):
+        return await asyncio.to_thread(self.vector_db.upsert_note_chunks, note_id, user_id, chunks, metadata)
+
+    async def delete_stale_chunks(self, note_id: str, chunk_count: int, timeout=None):
+        return self.vector_db.delete_stale_chunks(note_id, chunk_count)
+
+    async def upsert_points(self, points, timeout=None):
+        return await asyncio.to_thread(self.vector_db.upsert_points, points)
+
+    async def delete_note_vector(self, note_id: str, timeout=None):
+        return self.vector_db.delete_note_vector(note_id)
+
+    async def close(self):
+        await asyncio.to_thread(self.vector_db.close)
@@ -1,5 +1,5 @@
 # db/models.py
-from sqlalchemy import Column, Integer, String, JSON, DateTime, Text, ForeignKey, Boolean, Float
+from sqlalchemy import Column, Integer, String, JSON, DateTime, Text, ForeignKey, Boolean, Float, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -24,6 +24,9 @@ class User(Base):
     encryption_key = Column(String, nullable=True)  # Client-side encrypted
     is_active = Column(Boolean, default=True)
     
+    # Bumped whenever the user's notes or knowledge graph change
+    graph_version = Column(Integer, nullable=False, default=0, server_default="0")
+    
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -57,6 +60,7 @@ class Note(Base):
     tags = Column(JSON, nullable=True)  # Array of tags
     category = Column(String, nullable=True)
     priority = Column(Integer, default=0)  # 0=low, 1=medium, 2=high
+    cluster_id = Column(Integer, ForeignKey('note_clusters.id', ondelete='SET NULL'), nullable=True, index=True)
     
     # Status and workflow
     status = Column(String, default="active")  # 'active', 'archived', 'deleted'
@@ -97,7 +101,7 @@ class NoteConnection(Base):
     
     # Metadata
     created_by = Column(String, default="system")  # 'system', 'user'
-    metadata = Column(JSON, nullable=True)
+    connection_data = Column(JSON, nullable=True)  # Renamed from metadata
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -107,6 +111,37 @@ class NoteConnection(Base):
     source_note = relationship("Note", foreign_keys=[source_id], back_populates="source_connections")
     target_note = relationship("Note", foreign_keys=[target_id], back_populates="target_connections")
 
+    # One edge of each type per ordered pair, so graph updates can upsert
+    __table_args__ = (
+        UniqueConstraint('source_id', 'target_id', 'connection_type', name='uq_note_connection_edge'),
+    )
+
+class NoteCluster(Base):
+    """Embedding cluster of a user's notes, used as the knowledge-graph group"""
+    __tablename__ = 'note_clusters'
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
+    centroid = Column(JSON, nullable=False)  # Normalized centroid vector
+    size = Column(Integer, default=0)  # Member notes
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+class MediaObject(Base):
+    """Uploaded file stored once by content hash, shared by every note that references it"""
+    __tablename__ = 'media_objects'
+    
+    sha256 = Column(String(64), primary_key=True)
+    path = Column(String, nullable=False, unique=True)  # media/<prefix>/<sha256><ext>
+    size = Column(Integer, nullable=False)  # Bytes
+    ref_count = Column(Integer, nullable=False, default=0)  # Notes pointing at this file
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
 class UserSession(Base):
     """Track user sessions for security and analytics"""
     __tablename__ = 'user_sessions'
@@ -2,47 +2,215 @@
 from qdrant_client import QdrantClient
 from qdrant_client.models import Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue
 from qdrant_client.http import models as rest
+from qdrant_client.http.exceptions import UnexpectedResponse
 from config import settings
 import logging
 import uuid
-from typing import List, Dict, Optional, Any
+import threading
+from typing import List, Dict, Optional, Any, Tuple
 import asyncio
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+def chunk_point_id(note_id: str, chunk_index: int) -> str:
+    """Point ID for a note chunk; chunk 0 keeps the note ID for backwards compatibility"""
+    if chunk_index == 0:
+        return note_id
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{note_id}#{chunk_index}"))
+
+def collapse_chunk_hits(
+    hits: List[Tuple[Any, float, Dict[str, Any]]],
+    limit: int
+) -> List[Dict[str, Any]]:
+    """Collapse (point_id, score, payload) chunk hits to one result per note, keeping the best chunk"""
+    best: Dict[str, Dict[str, Any]] = {}
+    for point_id, score, payload in hits:
+        payload = payload or {}
+        note_id = payload.get("note_id", str(point_id))
+        if note_id not in best or score > best[note_id]["score"]:
+            best[note_id] = {
+                "note_id": note_id,
+                "score": score,
+                "chunk_index": payload.get("chunk_index", 0),
+                "payload": payload
+            }
+    return sorted(best.values(), key=lambda hit: hit["score"], reverse=True)[:limit]
+
+def build_chunk_points(
+    note_id: str,
+    user_id: int,
+    chunks: List[Tuple[int, str, List[float]]],
+    metadata: Optional[Dict[str, Any]] = None
+) -> List[PointStruct]:
+    """One point per (chunk_index, chunk_text, vector), linked back to the note"""
+    return [
+        PointStruct(
+            id=chunk_point_id(note_id, chunk_index),
+            vector=vector,
+            payload={
+                "user_id": int(user_id),
+                "note_id": note_id,
+                "chunk_index": chunk_index,
+                "snippet": text[:200],
+                **(metadata or {})
+            }
+        )
+        for chunk_index, text, vector in chunks
+    ]
+
+def mean_vectors_by_note(batches) -> Tuple[List[str], np.ndarray]:
+    """Reduce (note_ids, chunk_vectors) batches to one normalized mean vector per note.
+
+    Running sums keep memory proportional to the number of notes, not chunks
+    (normalizing the sum gives the same direction as normalizing the mean).
+    """
+    rows: Dict[str, int] = {}
+    sums: Optional[np.ndarray] = None
+    for note_ids, vectors in batches:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        owners = np.fromiter((rows.setdefault(note_id, len(rows)) for note_id in note_ids), dtype=np.int64)
+        if sums is None:
+            sums = np.zeros((max(len(rows), 1024), vectors.shape[1]), dtype=np.float32)
+        elif len(rows) > sums.shape[0]:
+            grown = np.zeros((max(len(rows), sums.shape[0] * 2), sums.shape[1]), dtype=np.float32)
+            grown[:sums.shape[0]] = sums
+            sums = grown
+        np.add.at(sums, owners, vectors)
+
+    if sums is None:
+        return [], np.zeros((0, 0), dtype=np.float32)
+    means = sums[:len(rows)]
+    norms = np.linalg.norm(means, axis=1, keepdims=True)
+    means /= np.where(norms > 0, norms, 1.0)
+    return list(rows), means
+
+SHARED_SHARD_KEY = "shared"
+
+def tenant_shard_key(user_id: int) -> Optional[str]:
+    """Shard key holding a user's points, or None when the collection isn't partitioned"""
+    if settings.VECTOR_TENANT_LAYOUT != "partitioned":
+        return None
+    # IDs arrive as int or str (payloads, JSON settings, route params); compare as int
+    if int(user_id) in {int(tenant) for tenant in settings.VECTOR_DEDICATED_TENANTS}:
+        return f"tenant_{int(user_id)}"
+    return SHARED_SHARD_KEY
+
+def layout_shard_keys() -> List[str]:
+    """Every shard key a partitioned collection needs for the configured tenants"""
+    return [SHARED_SHARD_KEY] + [tenant_shard_key(user_id) for user_id in settings.VECTOR_DEDICATED_TENANTS]
+
+def quantization_config(kind: Optional[str] = None):
+    """Qdrant quantization config for 'none', 'scalar' (int8) or 'binary'"""
+    kind = kind or settings.VECTOR_QUANTIZATION
+    if kind == "none":
+        return None
+    if kind == "scalar":
+        return rest.ScalarQuantization(
+            scalar=rest.ScalarQuantizationConfig(type=rest.ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+    if kind == "binary":
+        return rest.BinaryQuantization(binary=rest.BinaryQuantizationConfig(always_ram=True))
+    raise ValueError(f"Unknown vector quantization: {kind}")
+
+def collection_params(vector_size: int, quantization: Optional[str] = None) -> Dict[str, Any]:
+    """create_collection arguments for the configured layout and quantization"""
+    quantization_cfg = quantization_config(quantization)
+    params = {
+        "vectors_config": VectorParams(
+            size=vector_size,
+            distance=Distance.COSINE,
+            # With quantized copies in RAM the originals are only read for rescoring
+            on_disk=quantization_cfg is not None and settings.VECTOR_ORIGINALS_ON_DISK
+        ),
+        "quantization_config": quantization_cfg
+    }
+    if settings.VECTOR_TENANT_LAYOUT == "partitioned":
+        params["sharding_method"] = rest.ShardingMethod.CUSTOM
+    return params
+
+def search_params(
+    hnsw_ef: Optional[int] = None,
+    oversampling: Optional[float] = None,
+    rescore: Optional[bool] = None,
+    exact: bool = False
+) -> rest.SearchParams:
+    """Search-time HNSW and quantization parameters, defaulting to settings"""
+    return rest.SearchParams(
+        hnsw_ef=hnsw_ef or settings.VECTOR_SEARCH_HNSW_EF or None,
+        exact=exact,
+        quantization=rest.QuantizationSearchParams(
+            rescore=settings.VECTOR_SEARCH_RESCORE if rescore is None else rescore,
+            oversampling=oversampling or settings.VECTOR_SEARCH_OVERSAMPLING
+        )
+    )
+
+def payload_index_schemas() -> Dict[str, Any]:
+    """Payload indexes for every filtered field; user_id is marked as the tenant key
+    so Qdrant co-locates each user's points and builds per-tenant HNSW links"""
+    schemas = {
+        "user_id": rest.IntegerIndexParams(
+            type=rest.IntegerIndexType.INTEGER,
+            lookup=True,
+            range=False,
+            is_tenant=True
+        ),
+        "note_id": rest.PayloadSchemaType.KEYWORD,
+        "chunk_index": rest.PayloadSchemaType.INTEGER,
+    }
+    for field, schema in settings.VECTOR_PAYLOAD_INDEXES.items():
+        schemas[field] = rest.PayloadSchemaType(schema)
+    return schemas
+
+def group_by_shard_key(points: List[PointStruct]) -> Dict[Optional[str], List[PointStruct]]:
+    groups: Dict[Optional[str], List[PointStruct]] = {}
+    for point in points:
+        groups.setdefault(tenant_shard_key(point.payload["user_id"]), []).append(point)
+    return groups
+
 class VectorDB:
-    def __init__(self):
+    def __init__(self, collection_name: Optional[str] = None):
         self.client = QdrantClient(
             url=settings.QDRANT_URL,
             api_key=settings.QDRANT_API_KEY,
-            timeout=30,
+            timeout=settings.QDRANT_TIMEOUT,
             # Remove prefer_grpc=True for cloud instances
         )
-        self.collection_name = settings.VECTOR_COLLECTION
+        # May be an alias; reindexing swaps it to a new collection atomically
+        self.collection_name = collection_name or settings.VECTOR_COLLECTION
+        self._collection_ready = False
+        self._collection_lock = threading.Lock()
         
     async def initialize_collection(self, vector_size: int = 384):
         """Initialize Qdrant collection if it doesn't exist"""
-        try:
-            # Check if collection exists
-            collections = self.client.get_collections()
-            collection_names = [col.name for col in collections.collections]
-            
-            if self.collection_name not in collection_names:
-                # Create collection
-                self.client.create_collection(
-                    collection_name=self.collection_name,
-                    vectors_config=VectorParams(
-                        size=vector_size,
-                        distance=Distance.COSINE
-                    )
-                )
-                logger.info(f"Created Qdrant collection: {self.collection_name}")
-            else:
-                logger.info(f"Qdrant collection {self.collection_name} already exists")
+        self.ensure_collection(vector_size)
+
+    def ensure_collection(self, vector_size: int = 384):
+        """Create the collection if needed; the outcome is cached so writes don't re-check"""
+        if self._collection_ready:
+            return
+        with self._collection_lock:
+            if self._collection_ready:
+                return
+            try:
+                # Check if collection exists
+                collections = self.client.get_collections()
+                collection_names = [col.name for col in collections.collections]
                 
-        except Exception as e:
-            logger.error(f"Failed to initialize Qdrant collection: {e}")
-            raise
+                target = self.resolve_alias(self.collection_name)
+                is_alias = target is not None
+                if self.collection_name not in collection_names and not is_alias:
+                    self.create_collection(self.collection_name, vector_size)
+                else:
+                    logger.info(f"Qdrant collection {self.collection_name} already exists")
+                    # Indexes can be added to a live collection, so older ones catch up here
+                    self.ensure_payload_indexes(target or self.collection_name)
+                    self.ensure_shard_keys(target or self.collection_name)
+                self._collection_ready = True
+                    
+            except Exception as e:
+                logger.error(f"Failed to initialize Qdrant collection: {e}")
+                raise
     
     def upsert_note_vector(
         self, 
@@ -54,12 +222,11 @@ class VectorDB:
         """Upsert a note vector with metadata"""
         try:
             # Ensure collection exists
-            if not self._collection_exists():
-                self.initialize_collection(len(vector))
+            self.ensure_collection(len(vector))
             
             # Prepare payload
             payload = {
-                "user_id": user_id,
+                "user_id": int(user_id),
                 "note_id": note_id,
                 **(metadata or {})
             }
@@ -74,7 +241,8 @@ class VectorDB:
             # Upsert vector
             self.client.upsert(
                 collection_name=self.collection_name,
-                points=[point]
+                points=[point],
+                shard_key_selector=tenant_shard_key(user_id)
             )
             
             logger.debug(f"Upserted vector for note {note_id}")
@@ -84,21 +252,133 @@ class VectorDB:
             logger.error(f"Failed to upsert vector for note {note_id}: {e}")
             raise
     
+    def upsert_note_chunks(
+        self,
+        note_id: str,
+        user_id: int,
+        chunks: List[Tuple[int, str, List[float]]],
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> List[str]:
+        """Upsert one point per (chunk_index, chunk_text, vector), linked to the note"""
+        if not chunks:
+            return []
+        try:
+            self.ensure_collection(len(chunks[0][2]))
+
+            points = build_chunk_points(note_id, user_id, chunks, metadata)
+            self.client.upsert(
+                collection_name=self.collection_name,
+                points=points,
+                shard_key_selector=tenant_shard_key(user_id)
+            )
+
+            logger.debug(f"Upserted {len(points)} chunk vectors for note {note_id}")
+            return [point.id for point in points]
+
+        except Exception as e:
+            logger.error(f"Failed to upsert chunk vectors for note {note_id}: {e}")
+            raise
+
+    def upsert_note_vectors(
+        self,
+        items: List[Tuple[str, int, List[float], Optional[Dict[str, Any]]]]
+    ) -> List[str]:
+        """Bulk upsert (note_id, user_id, vector, metadata) tuples in one request"""
+        if not items:
+            return []
+        points = [
+            PointStruct(
+                id=note_id,
+                vector=vector,
+                payload={
+                    "user_id": int(user_id),
+                    "note_id": note_id,
+                    **(metadata or {})
+                }
+            )
+            for note_id, user_id, vector, metadata in items
+        ]
+        self.upsert_points(points)
+        logger.debug(f"Upserted {len(points)} note vectors")
+        return [point.id for point in points]
+
+    def upsert_points(self, points: List[PointStruct], wait: bool = True):
+        """Upsert prebuilt points, one request per shard key"""
+        if not points:
+            return
+        try:
+            self.ensure_collection(len(points[0].vector))
+            for shard_key, group in group_by_shard_key(points).items():
+                self.client.upsert(
+                    collection_name=self.collection_name,
+                    points=group,
+                    wait=wait,
+                    shard_key_selector=shard_key
+                )
+        except Exception as e:
+            logger.error(f"Failed to upsert {len(points)} points into {self.collection_name}: {e}")
+            raise
+
+    def delete_stale_chunks(self, note_id: str, chunk_count: int) -> bool:
+        """Delete chunks at index >= chunk_count, left over from a longer version of the note"""
+        try:
+            self.client.delete(
+                collection_name=self.collection_name,
+                points_selector=Filter(
+                    must=[
+                        FieldCondition(key="note_id", match=MatchValue(value=note_id)),
+                        FieldCondition(key="chunk_index", range=rest.Range(gte=chunk_count))
+                    ]
+                )
+            )
+            return True
+
+        except Exception as e:
+            logger.error(f"Failed to delete stale chunks for note {note_id}: {e}")
+            return False
+
+    def delete_stale_attachment_chunks(self, note_id: str, chunk_count: int) -> bool:
+        """Delete attachment chunks (negative indexes) below -chunk_count, left over from a longer previous attachment"""
+        try:
+            self.client.delete(
+                collection_name=self.collection_name,
+                points_selector=Filter(
+                    must=[
+                        FieldCondition(key="note_id", match=MatchValue(value=note_id)),
+                        FieldCondition(key="chunk_index", range=rest.Range(lt=-chunk_count))
+                    ]
+                )
+            )
+            return True
+
+        except Exception as e:
+            logger.error(f"Failed to delete stale attachment chunks for note {note_id}: {e}")
+            return False
+
     def semantic_search(
         self, 
         query_vector: List[float], 
         user_id: int, 
         limit: int = 5,
         score_threshold: float = 0.5,
-        additional_filters: Optional[Dict[str, Any]] = None
+        additional_filters: Optional[Dict[str, Any]] = None,
+        exclude_note_ids: Optional[List[str]] = None,
+        hnsw_ef: Optional[int] = None,
+        oversampling: Optional[float] = None,
+        rescore: Optional[bool] = None,
+        exact: bool = False
     ) -> List[Dict[str, Any]]:
-        """Perform semantic search for similar notes"""
+        """Perform semantic search for similar notes.
+
+        hnsw_ef, oversampling and rescore trade speed for recall on quantized
+        collections; exact=True bypasses the index entirely.
+        """
         try:
             # Build filter conditions
             filter_conditions = [
                 FieldCondition(
                     key="user_id",
-                    match=MatchValue(value=user_id)
+                    match=MatchValue(value=int(user_id))
                 )
             ]
             
@@ -111,26 +391,28 @@ class VectorDB:
                             match=MatchValue(value=value)
                         )
                     )
+            exclusions = [
+                FieldCondition(key="note_id", match=MatchValue(value=note_id))
+                for note_id in exclude_note_ids or []
+            ]
             
-            # Perform search
+            # Perform search, oversampling since several hits may be chunks of one note
             search_results = self.client.search(
                 collection_name=self.collection_name,
                 query_vector=query_vector,
-                query_filter=Filter(must=filter_conditions),
-                limit=limit,
+                query_filter=Filter(must=filter_conditions, must_not=exclusions or None),
+                limit=limit * settings.CHUNK_SEARCH_OVERSAMPLE,
                 score_threshold=score_threshold,
                 with_payload=True,
-                with_vectors=False
+                with_vectors=False,
+                search_params=search_params(hnsw_ef, oversampling, rescore, exact),
+                shard_key_selector=tenant_shard_key(user_id)
             )
             
-            # Format results
-            results = []
-            for result in search_results:
-                results.append({
-                    "note_id": result.id,
-                    "score": result.score,
-                    "payload": result.payload
-                })
+            results = collapse_chunk_hits(
+                [(result.id, result.score, result.payload) for result in search_results],
+                limit
+            )
             
             logger.debug(f"Found {len(results)} similar notes for user {user_id}")
             return results
@@ -139,13 +421,42 @@ class VectorDB:
             logger.error(f"Semantic search failed for user {user_id}: {e}")
             raise
     
+    def get_user_vectors(self, user_id: int, batch_size: int = 1024) -> Tuple[List[str], np.ndarray]:
+        """All of a user's notes as (note_ids, matrix of note-level vectors), in one scroll"""
+        def batches():
+            offset = None
+            while True:
+                records, offset = self.client.scroll(
+                    collection_name=self.collection_name,
+                    scroll_filter=Filter(must=[FieldCondition(key="user_id", match=MatchValue(value=int(user_id)))]),
+                    limit=batch_size,
+                    offset=offset,
+                    with_payload=["note_id"],
+                    with_vectors=True,
+                    shard_key_selector=tenant_shard_key(user_id)
+                )
+                if records:
+                    yield (
+                        [record.payload.get("note_id", str(record.id)) for record in records],
+                        [record.vector for record in records]
+                    )
+                if offset is None:
+                    return
+
+        return mean_vectors_by_note(batches())
+
     def delete_note_vector(self, note_id: str) -> bool:
-        """Delete a note vector from the collection"""
+        """Delete all of a note's chunk vectors from the collection"""
         try:
             self.client.delete(
                 collection_name=self.collection_name,
-                points_selector=rest.PointIdsList(
-                    points=[note_id]
+                points_selector=Filter(
+                    must=[
+                        FieldCondition(
+                            key="note_id",
+                            match=MatchValue(value=note_id)
+                        )
+                    ]
                 )
             )
             logger.debug(f"Deleted vector for note {note_id}")
@@ -164,7 +475,7 @@ class VectorDB:
                     must=[
                         FieldCondition(
                             key="user_id",
-                            match=MatchValue(value=user_id)
+                            match=MatchValue(value=int(user_id))
                         )
                     ]
                 )
@@ -194,12 +505,78 @@ class VectorDB:
             logger.error(f"Failed to get collection info: {e}")
             return {}
     
+    def create_collection(self, collection_name: str, vector_size: int, quantization: Optional[str] = None):
+        """Create a new, empty collection with the configured layout, quantization and payload indexes"""
+        self.client.create_collection(
+            collection_name=collection_name,
+            **collection_params(vector_size, quantization)
+        )
+        self.ensure_shard_keys(collection_name)
+        self.ensure_payload_indexes(collection_name)
+        logger.info(f"Created Qdrant collection: {collection_name} ({settings.VECTOR_TENANT_LAYOUT} layout)")
+
+    def ensure_payload_indexes(self, collection_name: str):
+        """Create any configured payload index the collection is missing"""
+        existing = self.client.get_collection(collection_name).payload_schema or {}
+        for field, schema in payload_index_schemas().items():
+            if field not in existing:
+                self.client.create_payload_index(
+                    collection_name=collection_name,
+                    field_name=field,
+                    field_schema=schema,
+                    wait=True
+                )
+                logger.info(f"Created payload index on {collection_name}.{field}")
+
+    def ensure_shard_keys(self, collection_name: str):
+        """Create the shared and dedicated-tenant shard keys of a partitioned collection"""
+        info = self.client.get_collection(collection_name)
+        if info.config.params.sharding_method != rest.ShardingMethod.CUSTOM:
+            if settings.VECTOR_TENANT_LAYOUT == "partitioned":
+                logger.warning(
+                    f"{collection_name} is not partitioned; run scripts.migrate_collection_layout"
+                )
+            return
+        for shard_key in layout_shard_keys():
+            try:
+                self.client.create_shard_key(collection_name, shard_key)
+                logger.info(f"Created shard key {shard_key} in {collection_name}")
+            except UnexpectedResponse as e:
+                # There's no listing API to check first, so an existing key shows up as an error
+                if "already exists" not in str(e):
+                    raise
+                logger.debug(f"Shard key {shard_key} already exists in {collection_name}")
+
+    def resolve_alias(self, alias_name: str) -> Optional[str]:
+        """Collection an alias currently points at, or None if it isn't an alias"""
+        for alias in self.client.get_aliases().aliases:
+            if alias.alias_name == alias_name:
+                return alias.collection_name
+        return None
+
+    def swap_alias(self, alias_name: str, collection_name: str):
+        """Atomically point `alias_name` at `collection_name`"""
+        operations = []
+        if self.resolve_alias(alias_name) is not None:
+            operations.append(rest.DeleteAliasOperation(
+                delete_alias=rest.DeleteAlias(alias_name=alias_name)
+            ))
+        operations.append(rest.CreateAliasOperation(
+            create_alias=rest.CreateAlias(collection_name=collection_name, alias_name=alias_name)
+        ))
+        # Both operations are applied in one request, so readers never see a missing alias
+        self.client.update_collection_aliases(change_aliases_operations=operations)
+        logger.info(f"Alias {alias_name} now points at {collection_name}")
+
     def _collection_exists(self) -> bool:
-        """Check if collection exists"""
+        """Check if collection (or an alias with this name) exists"""
         try:
             collections = self.client.get_collections()
             collection_names = [col.name for col in collections.collections]
-            return self.collection_name in collection_names
+            return (
+                self.collection_name in collection_names
+                or self.resolve_alias(self.collection_name) is not None
+            )
         except Exception as e:
             logger.error(f"Failed to check collection existence: {e}")
             return False
@@ -213,6 +590,3 @@ class VectorDB:
         except Exception as e:
             logger.error(f"Qdrant health check failed: {e}")
             return False
-
-# Singleton instance
-vector_db = VectorDB()
\ No newline at end of file
@@ -0,0 +1,41 @@
+# db/vector_store.py
+from contextlib import asynccontextmanager
+from config import settings
+
+def create_vector_stores():
+    """Build the (sync, async) vector store pair for settings.VECTOR_BACKEND.
+
+    'qdrant' talks to the Qdrant server; 'memory' keeps vectors in-process,
+    which suits small single-node deployments and running without Qdrant.
+    """
+    if settings.VECTOR_BACKEND == "memory":
+        from db.memory_vectors import InMemoryVectorDB, AsyncInMemoryVectorStore
+        sync_store = InMemoryVectorDB()
+        return sync_store, AsyncInMemoryVectorStore(sync_store)
+    if settings.VECTOR_BACKEND != "qdrant":
+        raise ValueError(f"Unknown VECTOR_BACKEND: {settings.VECTOR_BACKEND}")
+
+    from db.qdrant import VectorDB
+    from db.async_qdrant import AsyncVectorStore
+    return VectorDB(), AsyncVectorStore()
+
+# Singleton instances
+vector_db, async_vector_store = create_vector_stores()
+
+@asynccontextmanager
+async def loop_local_async_store():
+    """Async store for a short-lived event loop, e.g. one asyncio.run per Celery task.
+
+    The shared async_vector_store's Qdrant client (and its httpx pool) is bound
+    to the loop that first used it, so each such loop gets its own client,
+    closed on exit. The in-memory adapter holds no loop state and is shared.
+    """
+    if settings.VECTOR_BACKEND != "qdrant":
+        yield async_vector_store
+        return
+    from db.async_qdrant import AsyncVectorStore
+    store = AsyncVectorStore()
+    try:
+        yield store
+    finally:
+        await store.close()
@@ -0,0 +1,145 @@
+# db/vector_writer.py
+import logging
+import threading
+import time
+from typing import Any, Dict, List
+from qdrant_client.models import PointStruct
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+class BufferedVectorWriter:
+    """Buffers points and writes them to a VectorDB in bulk from a background thread.
+
+    A batch is flushed once `batch_size` points are buffered or `flush_interval`
+    seconds have passed since the oldest buffered point, whichever comes first.
+    Failed batches are retried with exponential backoff; batches that still fail
+    are kept in `failed_points` and counted in stats.
+    """
+
+    def __init__(
+        self,
+        vector_db,
+        batch_size: int = None,
+        flush_interval: float = None,
+        max_retries: int = None,
+        max_buffered: int = None
+    ):
+        self.vector_db = vector_db
+        self.batch_size = batch_size or settings.VECTOR_WRITE_BATCH_SIZE
+        self.flush_interval = flush_interval or settings.VECTOR_WRITE_FLUSH_INTERVAL
+        self.max_retries = max_retries if max_retries is not None else settings.VECTOR_WRITE_MAX_RETRIES
+        self.max_buffered = max_buffered or settings.VECTOR_WRITE_MAX_BUFFERED
+
+        self._buffer: List[PointStruct] = []
+        self._oldest: float = 0.0
+        self._in_flight = 0
+        self._closed = False
+        # Points are numbered as they're added and completed in that order, so a
+        # flush() waits for exactly the points added before it, however many
+        # other callers are flushing or adding at the same time
+        self._added = 0
+        self._done = 0
+        self._flush_upto = 0
+        self._cond = threading.Condition()
+
+        self.failed_points: List[PointStruct] = []
+        self._written = 0
+        self._batches = 0
+        self._retries = 0
+
+        self._thread = threading.Thread(target=self._run, name="vector-writer", daemon=True)
+        self._thread.start()
+
+    def add(self, point: PointStruct):
+        self.add_many([point])
+
+    def add_many(self, points: List[PointStruct]):
+        """Buffer points; blocks while the buffer is full so producers can't outrun Qdrant"""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("BufferedVectorWriter is closed")
+            while len(self._buffer) >= self.max_buffered:
+                self._cond.wait()
+            was_empty = not self._buffer
+            if was_empty:
+                self._oldest = time.monotonic()
+            self._buffer.extend(points)
+            self._added += len(points)
+            # Wake the writer to start the flush timer, or to write a full batch
+            if was_empty or len(self._buffer) >= self.batch_size:
+                self._cond.notify_all()
+
+    def flush(self):
+        """Block until every point added so far has been written (or given up on)"""
+        with self._cond:
+            target = self._added
+            self._flush_upto = max(self._flush_upto, target)
+            self._cond.notify_all()
+            while self._done < target:
+                self._cond.wait()
+
+    def close(self):
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _take_batch(self) -> List[PointStruct]:
+        with self._cond:
+            while True:
+                if self._buffer:
+                    due = self._oldest + self.flush_interval - time.monotonic()
+                    if len(self._buffer) >= self.batch_size or due <= 0 or self._flush_upto > self._done or self._closed:
+                        break
+                    self._cond.wait(timeout=due)
+                elif self._closed:
+                    return []
+                else:
+                    self._cond.wait()
+
+            batch = self._buffer[:self.batch_size]
+            del self._buffer[:self.batch_size]
+            self._oldest = time.monotonic()
+            self._in_flight = len(batch)
+            self._cond.notify_all()  # Wake producers blocked on a full buffer
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return
+            self._write(batch)
+            with self._cond:
+                self._done += len(batch)
+                self._in_flight = 0
+                self._cond.notify_all()
+
+    def _write(self, batch: List[PointStruct]):
+        delay = settings.VECTOR_WRITE_RETRY_BACKOFF
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.vector_db.upsert_points(batch)
+                self._written += len(batch)
+                self._batches += 1
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    logger.error(f"Giving up on batch of {len(batch)} points after {attempt + 1} attempts: {e}")
+                    self.failed_points.extend(batch)
+                    return
+                self._retries += 1
+                logger.warning(f"Vector write failed (attempt {attempt + 1}), retrying in {delay:.1f}s: {e}")
+                time.sleep(delay)
+                delay *= 2
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "written": self._written,
+            "batches": self._batches,
+            "retries": self._retries,
+            "failed": len(self.failed_points),
+            "buffered": len(self._buffer)
+        }
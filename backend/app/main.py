@@ -1,5 +1,8 @@
 import sys
 import asyncio
+import logging
+import time
+import psutil
 from fastapi import FastAPI, HTTPException, status, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
@@ -12,8 +15,15 @@ from db.session import engine, get_db
 from routers import auth, notes, ai, exports, sync
 from utils import security
 from config import settings
+from ai.model_registry import model_registry
+from ai.lazy_models import lazy_models
+from db.vector_store import async_vector_store
+from utils.web_fetch import web_fetcher
+from services.extraction_service import extraction_service
 from datetime import timedelta
 
+logger = logging.getLogger(__name__)
+
 # Fix for Windows event loop policy
 #f sys.platform == "win32":
   #  asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
@@ -51,6 +61,29 @@ app.include_router(ai.router, prefix="/api/v1/ai")
 app.include_router(exports.router, prefix="/api/v1/exports")
 app.include_router(sync.router, prefix="/api/v1/sync")
 
+@app.on_event("startup")
+async def warmup_models():
+    # Load shared models once per process, off the event loop
+    if settings.WARMUP_MODELS:
+        await asyncio.to_thread(model_registry.warmup)
+    lazy_names = [name.strip() for name in settings.WARMUP_LAZY_MODELS.split(",") if name.strip()]
+    if lazy_names:
+        await asyncio.to_thread(lazy_models.warmup, lazy_names)
+
+    # Time since the process started, imports included
+    app.state.startup_report = {
+        "startup_seconds": round(time.time() - psutil.Process().create_time(), 2),
+        "embedding_models": model_registry.loaded_models(),
+        "lazy_models": lazy_models.report()
+    }
+    logger.info(f"Startup report: {app.state.startup_report}")
+
+@app.on_event("shutdown")
+async def close_clients():
+    await async_vector_store.close()
+    await web_fetcher.close()
+    extraction_service.close()
+
 # Root endpoint
 @app.get("/", response_class=HTMLResponse, include_in_schema=False)
 async def read_root():
@@ -1,10 +1,23 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from db.session import get_db
-from services.ai_service import AIService
+from typing import Optional
+import json
+from config import settings
+from db.session import SessionLocal, get_db
+from services.ai_service import AIService, get_ai_service
+from services.graph_service import GraphService
+from services.graph_cache import graph_cache, graph_etag, etag_matches
+from ai.model_registry import model_registry
+from ai.lazy_models import lazy_models
+from ai.title_engine import title_engine
+from ai.captioning import image_captioner
+from utils.web_fetch import web_fetcher
+from services.extraction_service import extraction_service
 from schemas.ai import (
     NoteLinksResponse, 
     KnowledgeGraphResponse,
+    EgoGraphResponse,
     ContentProcessingRequest,
     ProcessedContent,
     NoteLinkRequest
@@ -14,42 +27,113 @@ from utils import security
 router = APIRouter(tags=["AI"])
 
 @router.post("/link-notes", response_model=NoteLinksResponse)
-def find_related_notes(
+async def find_related_notes(
     request: NoteLinkRequest, 
     db: Session = Depends(get_db),
-    current_user: dict = Depends(security.get_current_user)
+    current_user: dict = Depends(security.get_current_user),
+    ai_service: AIService = Depends(get_ai_service)
 ):
-    # Initialize service inside endpoint
-    ai_service = AIService()
-    return ai_service.find_related_notes_for_user(
+    return await ai_service.find_related_notes_for_user(
         current_user["id"], request.note_id, request.threshold
     )
 
 @router.get("/knowledge-graph", response_model=KnowledgeGraphResponse)
 def get_knowledge_graph(
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(security.get_current_user),
+    ai_service: AIService = Depends(get_ai_service)
+):
+    # The version is read first, so a cached body is never older than its ETag
+    user_id = current_user["id"]
+    version = GraphService(db).graph_version(user_id)
+    etag = graph_etag(user_id, version)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    body = graph_cache.get(user_id, version)
+    if body is None:
+        graph = ai_service.generate_knowledge_graph(user_id, db)
+        body = KnowledgeGraphResponse.model_validate(graph).model_dump_json().encode()
+        graph_cache.put(user_id, version, body)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@router.get("/knowledge-graph/stream")
+def stream_knowledge_graph(
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: dict = Depends(security.get_current_user)
 ):
-    # Initialize service inside endpoint
-    ai_service = AIService()
-    return ai_service.generate_knowledge_graph(current_user["id"])
+    """The knowledge graph as NDJSON: one {"type": "node"|"link", ...} object per line,
+    all nodes first, written as rows are read"""
+    user_id = current_user["id"]
+    etag = graph_etag(user_id, GraphService(db).graph_version(user_id))
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    def lines():
+        # Own session: the request's is closed before the body is streamed
+        stream_db = SessionLocal()
+        try:
+            for kind, item in GraphService(stream_db).iter_graph(user_id):
+                yield json.dumps({"type": kind, **item}) + "\n"
+        finally:
+            stream_db.close()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers=headers)
+
+@router.get("/knowledge-graph/ego/{note_id}", response_model=EgoGraphResponse)
+def get_ego_graph(
+    note_id: str,
+    hops: int = Query(2, ge=1, le=settings.EGO_GRAPH_MAX_HOPS),
+    max_nodes: int = Query(settings.EGO_GRAPH_DEFAULT_NODES, ge=1, le=settings.EGO_GRAPH_MAX_NODES),
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(security.get_current_user)
+):
+    graph = GraphService(db).get_ego_graph(current_user["id"], note_id, hops, max_nodes)
+    if graph is None:
+        raise HTTPException(status_code=404, detail="Note not found")
+    return graph
 
 @router.post("/process-content", response_model=ProcessedContent)
 def process_content(
     request: ContentProcessingRequest, 
     db: Session = Depends(get_db),
-    current_user: dict = Depends(security.get_current_user)
+    current_user: dict = Depends(security.get_current_user),
+    ai_service: AIService = Depends(get_ai_service)
 ):
-    # Initialize service inside endpoint
-    ai_service = AIService()
     return ai_service.process_content(request.content, request.operation)
 
 @router.post("/auto-title")
 def generate_title(
     content: str,
+    force_generative: bool = False,  # Skip the extractive tiers and ask the language model
     db: Session = Depends(get_db),
+    current_user: dict = Depends(security.get_current_user),
+    ai_service: AIService = Depends(get_ai_service)
+):
+    return ai_service.generate_title(content, force_generative)
+
+@router.get("/model-stats")
+def get_model_stats(
+    request: Request,
+    current_user: dict = Depends(security.get_current_user)
+):
+    """Loaded models, their load times and memory, and the startup report"""
+    return {
+        "startup": getattr(request.app.state, "startup_report", None),
+        "embedding": model_registry.stats(),
+        "lazy": lazy_models.report(),
+        "titling": title_engine.stats(),
+        "captioning": image_captioner.stats(),
+        "web_fetch": web_fetcher.stats(),
+        "extraction": extraction_service.stats()
+    }
+
+@router.get("/embedding-stats")
+def get_embedding_stats(
     current_user: dict = Depends(security.get_current_user)
 ):
-    # Initialize service inside endpoint
-    ai_service = AIService()
-    return ai_service.generate_title(content)
\ No newline at end of file
+    return model_registry.stats()
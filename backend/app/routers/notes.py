@@ -1,9 +1,14 @@
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException, UploadFile
 from sqlalchemy.orm import Session
 from db.session import get_db
 from services.note_service import NoteService
+from services.media_service import MediaService
+from services.extraction_service import is_extractable
+from tasks.ai_tasks import extract_note_media, generate_note_thumbnails
+from ai.captioning import is_image_path
 from schemas.notes import NoteOut, NoteCreate, NoteUpdate, NoteSearchResponse
-from utils import security, file_processing
+from utils import security
 from fastapi import status
 
 router = APIRouter(tags=["Notes"])
@@ -51,13 +56,13 @@ def delete_note(
     return
 
 @router.get("/", response_model=NoteSearchResponse)
-def search_notes(
+async def search_notes(
     query: str, 
     limit: int = 10, 
     db: Session = Depends(get_db),
     current_user: dict = Depends(security.get_current_user)
 ):
-    results = NoteService(db).search_notes(current_user["id"], query, limit)
+    results = await NoteService(db).search_notes_async(current_user["id"], query, limit)
     return {"results": results, "total": len(results)}
 
 @router.post("/{note_id}/media")
@@ -67,17 +72,29 @@ async def upload_media(
     db: Session = Depends(get_db),
     current_user: dict = Depends(security.get_current_user)
 ):
-    # Save uploaded file
-    file_path = await file_processing.save_upload_file(file, current_user["id"])
-    
-    # Update note with media path
+    # Sync DB work and embedding run in threads, keeping the event loop free
     note_service = NoteService(db)
-    note = note_service.get_note(note_id, current_user["id"])
+    note = await asyncio.to_thread(note_service.get_note, note_id, current_user["id"])
     if not note:
         raise HTTPException(status_code=404, detail="Note not found")
     
-    return note_service.update_note(
-        note_id, 
-        current_user["id"], 
-        NoteUpdate(media_path=file_path)
-    )
\ No newline at end of file
+    # Stream the upload into the content-addressed store (deduplicated). The
+    # reference taken here only covers the upload; the note takes its own
+    media_service = MediaService(db)
+    media_path = (await media_service.store_upload(file)).path
+    try:
+        updated = await asyncio.to_thread(
+            note_service.update_note,
+            note_id, 
+            current_user["id"], 
+            NoteUpdate(media_path=media_path)
+        )
+    finally:
+        await asyncio.to_thread(media_service.release, media_path)
+    
+    # Thumbnails and document text are produced in the background
+    if is_image_path(media_path):
+        generate_note_thumbnails.delay(note_id)
+    if is_extractable(media_path):
+        extract_note_media.delay(note_id)
+    return updated
\ No newline at end of file
@@ -23,6 +23,15 @@ class KnowledgeGraphResponse(BaseModel):
     nodes: List[KnowledgeGraphNode]
     links: List[KnowledgeGraphLink]
 
+class EgoGraphNode(KnowledgeGraphNode):
+    hop: int
+
+class EgoGraphResponse(BaseModel):
+    center: str
+    nodes: List[EgoGraphNode]
+    links: List[KnowledgeGraphLink]
+    truncated: bool  # True when the node budget cut the neighbourhood short
+
 class ImageDescription(BaseModel):
     description: str
     tags: List[str]
@@ -0,0 +1,83 @@
+"""Compare embedding backends: throughput, memory and parity with torch.
+
+Usage (from backend/app):
+    python -m scripts.benchmark_embeddings --backends torch onnx onnx-int8 --texts 2000
+"""
+import argparse
+import json
+import multiprocessing
+import random
+import time
+import psutil
+from config import settings
+
+WORDS = (
+    "note idea meeting research project deadline draft summary question answer "
+    "design system paper reading list travel budget plan review feedback model"
+).split()
+
+def sample_texts(count: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(WORDS, k=rng.randint(8, 120))) for _ in range(count)]
+
+def _run_backend(backend: str, model_name: str, texts: list, batch_size: int, results):
+    # Runs in a fresh process so RSS numbers aren't polluted by other backends
+    from ai.embeddings import LocalEmbeddingModel
+
+    process = psutil.Process()
+    rss_before = process.memory_info().rss
+    load_start = time.perf_counter()
+    model = LocalEmbeddingModel(model_name, device="cpu", backend=backend)
+    model.warmup()
+    load_seconds = time.perf_counter() - load_start
+    rss_loaded = process.memory_info().rss
+
+    start = time.perf_counter()
+    for i in range(0, len(texts), batch_size):
+        model.generate_many(texts[i:i + batch_size])
+    elapsed = time.perf_counter() - start
+
+    results.put({
+        "backend": backend,
+        "load_seconds": round(load_seconds, 2),
+        "texts_per_second": round(len(texts) / elapsed, 1),
+        "model_rss_mb": round((rss_loaded - rss_before) / 2**20, 1),
+        "peak_rss_mb": round(process.memory_info().rss / 2**20, 1)
+    })
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--model", default=settings.EMBEDDING_MODEL)
+    parser.add_argument("--texts", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    texts = sample_texts(args.texts)
+    context = multiprocessing.get_context("spawn")
+    report = []
+
+    for backend in args.backends:
+        results = context.Queue()
+        worker = context.Process(
+            target=_run_backend,
+            args=(backend, args.model, texts, args.batch_size, results)
+        )
+        worker.start()
+        report.append(results.get())
+        worker.join()
+
+    # Parity of every non-torch backend against the torch vectors
+    from ai.embeddings import LocalEmbeddingModel, check_parity
+    reference = LocalEmbeddingModel(args.model, device="cpu", backend="torch")
+    for row in report:
+        if row["backend"] != "torch":
+            candidate = LocalEmbeddingModel(args.model, backend=row["backend"])
+            parity = check_parity(reference, candidate, texts[:200])
+            row["min_cosine"] = round(parity["min_cosine"], 5)
+            row["parity_passed"] = parity["passed"]
+
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
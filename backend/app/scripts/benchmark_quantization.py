@@ -0,0 +1,132 @@
+"""Recall and memory tradeoffs of Qdrant quantization settings.
+
+Usage (from backend/app):
+    python -m scripts.benchmark_quantization --vectors 50000 --queries 200
+    python -m scripts.benchmark_quantization --texts   # embed synthetic notes instead of random vectors
+
+For each quantization mode a throwaway collection is filled with the same
+vectors and timed once indexing has finished (collection status green).
+Ground truth is the exact cosine top-k computed with numpy on the original
+vectors, since Qdrant's exact=True search still scores quantized vectors.
+Every query runs under each oversampling/rescore combination, reporting
+recall@k and latency.
+RAM per million vectors is estimated from what Qdrant keeps in memory: the
+quantized copies when quantized (originals on disk), the full float32
+vectors otherwise, plus the HNSW graph.
+"""
+import argparse
+import json
+import time
+import uuid
+import numpy as np
+from config import settings
+from db.qdrant import VectorDB
+
+USER_ID = 1
+HNSW_M = 16  # Qdrant default
+
+def estimated_ram_per_million(dim: int, quantization: str) -> float:
+    """Estimated resident MiB for one million points"""
+    vector_bytes = {"none": dim * 4, "scalar": dim, "binary": dim / 8}[quantization]
+    if quantization != "none" and not settings.VECTOR_ORIGINALS_ON_DISK:
+        vector_bytes += dim * 4
+    graph_bytes = HNSW_M * 2 * 4  # Level-0 links, 4-byte point offsets
+    return round(1_000_000 * (vector_bytes + graph_bytes) / 2**20, 1)
+
+def load_vectors(args) -> np.ndarray:
+    count = args.vectors + args.queries
+    if args.texts:
+        from ai.model_registry import get_embedding_model
+        from scripts.benchmark_embeddings import sample_texts
+        model = get_embedding_model()
+        texts = sample_texts(count)
+        return np.asarray([
+            vector for start in range(0, count, 256)
+            for vector in model.generate_many(texts[start:start + 256])
+        ], dtype=np.float32)
+    vectors = np.random.default_rng(0).standard_normal((count, args.dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, note_ids: list, k: int) -> list:
+    """Brute-force cosine top-k note IDs per query"""
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    top = np.argsort(-(queries @ vectors.T), axis=1)[:, :k]
+    return [{note_ids[row] for row in rows} for rows in top]
+
+def wait_until_indexed(db: VectorDB, collection: str, timeout: float = 600.0):
+    """Block until Qdrant has finished optimizing (HNSW and quantization built)"""
+    from qdrant_client.models import CollectionStatus
+    deadline = time.monotonic() + timeout
+    while db.client.get_collection(collection).status != CollectionStatus.GREEN:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{collection} still not indexed after {timeout}s")
+        time.sleep(0.5)
+
+def search_ids(db: VectorDB, queries: np.ndarray, k: int, **options):
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        hits = db.semantic_search(query.tolist(), USER_ID, limit=k, score_threshold=-1.0, **options)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append({hit["note_id"] for hit in hits})
+    return results, float(np.percentile(latencies, 50))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quantization", nargs="+", default=["none", "scalar", "binary"])
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--oversampling", type=float, nargs="+", default=[1.0, 2.0, 4.0])
+    parser.add_argument("--hnsw-ef", type=int, default=None)
+    parser.add_argument("--texts", action="store_true", help="Embed synthetic notes with EMBEDDING_MODEL")
+    args = parser.parse_args()
+
+    data = load_vectors(args)
+    vectors, queries = data[:args.vectors], data[args.vectors:]
+    note_ids = [str(uuid.uuid4()) for _ in range(args.vectors)]
+    truth = exact_top_k(vectors, queries, note_ids, args.k)
+    report = []
+
+    for quantization in args.quantization:
+        collection = f"bench_quant_{quantization}_{uuid.uuid4().hex[:8]}"
+        db = VectorDB(collection_name=collection)
+        db.create_collection(collection, vectors.shape[1], quantization=quantization)
+        try:
+            for start in range(0, len(vectors), 512):
+                db.upsert_note_vectors([
+                    (note_id, USER_ID, vector.tolist(), None)
+                    for note_id, vector in zip(note_ids[start:start + 512], vectors[start:start + 512])
+                ])
+
+            wait_until_indexed(db, collection)
+
+            _, exact_ms = search_ids(db, queries, args.k, exact=True)
+            combos = [(1.0, False)] if quantization == "none" else (
+                [(oversampling, True) for oversampling in args.oversampling] + [(1.0, False)]
+            )
+            for oversampling, rescore in combos:
+                found, p50 = search_ids(
+                    db, queries, args.k,
+                    hnsw_ef=args.hnsw_ef, oversampling=oversampling, rescore=rescore
+                )
+                report.append({
+                    "quantization": quantization,
+                    "oversampling": oversampling,
+                    "rescore": rescore,
+                    f"recall@{args.k}": round(float(np.mean([
+                        len(f & t) / max(len(t), 1) for f, t in zip(found, truth)
+                    ])), 4),
+                    "p50_ms": round(p50, 3),
+                    "exact_p50_ms": round(exact_ms, 3),
+                    "est_ram_mib_per_million": estimated_ram_per_million(vectors.shape[1], quantization)
+                })
+        finally:
+            db.client.delete_collection(collection)
+
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Compare the in-memory vector backend against Qdrant on one synthetic tenant.
+
+Usage (from backend/app):
+    python -m scripts.benchmark_vector_backends --vectors 20000 --queries 200
+
+Inserts the same random unit vectors into both backends (Qdrant gets a
+throwaway collection) and reports insert time, query latency percentiles and
+Qdrant's recall@k against the exact in-memory results.
+"""
+import argparse
+import json
+import tempfile
+import time
+import uuid
+import numpy as np
+from db.memory_vectors import InMemoryVectorDB
+from db.qdrant import VectorDB
+
+USER_ID = 1
+
+def random_vectors(count: int, dim: int, seed: int) -> np.ndarray:
+    vectors = np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def time_queries(backend, queries: np.ndarray, k: int):
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        hits = backend.semantic_search(query.tolist(), USER_ID, limit=k, score_threshold=-1.0)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append([hit["note_id"] for hit in hits])
+    return np.asarray(latencies), results
+
+def bench(name: str, backend, vectors: np.ndarray, note_ids: list, queries: np.ndarray, k: int, batch: int):
+    start = time.perf_counter()
+    for i in range(0, len(vectors), batch):
+        backend.upsert_note_vectors([
+            (note_id, USER_ID, vector.tolist(), None)
+            for note_id, vector in zip(note_ids[i:i + batch], vectors[i:i + batch])
+        ])
+    insert_seconds = time.perf_counter() - start
+
+    latencies, results = time_queries(backend, queries, k)
+    return {
+        "backend": name,
+        "insert_seconds": round(insert_seconds, 2),
+        "query_p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "query_p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "query_p99_ms": round(float(np.percentile(latencies, 99)), 3),
+    }, results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--skip-qdrant", action="store_true")
+    args = parser.parse_args()
+
+    vectors = random_vectors(args.vectors, args.dim, seed=0)
+    queries = random_vectors(args.queries, args.dim, seed=1)
+    note_ids = [str(uuid.uuid4()) for _ in range(args.vectors)]
+    report = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        memory = InMemoryVectorDB(directory, flush_interval=0)
+        row, exact = bench("memory", memory, vectors, note_ids, queries, args.k, args.batch_size)
+        start = time.perf_counter()
+        memory.flush()
+        row["persist_seconds"] = round(time.perf_counter() - start, 2)
+        report.append(row)
+
+    if not args.skip_qdrant:
+        collection = f"bench_{uuid.uuid4().hex[:8]}"
+        qdrant = VectorDB(collection_name=collection)
+        qdrant.create_collection(collection, args.dim)
+        try:
+            row, approximate = bench("qdrant", qdrant, vectors, note_ids, queries, args.k, args.batch_size)
+            row[f"recall@{args.k}"] = round(float(np.mean([
+                len(set(a) & set(e)) / max(len(e), 1) for a, e in zip(approximate, exact)
+            ])), 4)
+            report.append(row)
+        finally:
+            qdrant.client.delete_collection(collection)
+
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Copy the live vector collection into a new one with the configured layout.
+
+Usage (from backend/app):
+    VECTOR_TENANT_LAYOUT=partitioned VECTOR_DEDICATED_TENANTS='[12, 40]' \\
+        python -m scripts.migrate_collection_layout
+    python -m scripts.migrate_collection_layout --resume   # continue after a crash
+
+The new collection is created with the current VECTOR_TENANT_LAYOUT sharding
+and payload indexes. Points are copied as-is (vectors included, no
+re-embedding) by scrolling the old collection and bulk-upserting through the
+buffered writer, with the scroll offset checkpointed after every page. Notes
+edited while the copy ran are then re-embedded, and settings.VECTOR_COLLECTION
+is atomically pointed at the new collection.
+"""
+import argparse
+import logging
+from datetime import datetime, timezone
+from qdrant_client.models import PointStruct
+from config import settings
+from db.qdrant import VectorDB
+from db.vector_writer import BufferedVectorWriter
+from ai.model_registry import get_embedding_model
+from scripts.reindex import Checkpoint, iter_note_pages, run_pass, promote_collection
+
+logger = logging.getLogger("migrate_collection_layout")
+
+def copy_points(source: VectorDB, source_name: str, writer: BufferedVectorWriter, checkpoint: Checkpoint, page_size: int):
+    """Scroll every point out of the source collection into the writer, resuming from the checkpoint"""
+    offset = checkpoint.state.get("offset")
+    while True:
+        records, next_offset = source.client.scroll(
+            collection_name=source_name,
+            limit=page_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True
+        )
+        writer.add_many([
+            PointStruct(id=record.id, vector=record.vector, payload=record.payload)
+            for record in records
+        ])
+        writer.flush()
+        if writer.failed_points:
+            raise RuntimeError(f"{len(writer.failed_points)} points failed to write; rerun with --resume")
+
+        checkpoint.save(offset=next_offset, copied=checkpoint.state.get("copied", 0) + len(records))
+        logger.info(f"{checkpoint.state['copied']} points copied")
+        if next_offset is None:
+            return
+        offset = next_offset
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=2, help="Re-embedding workers for the catch-up pass")
+    parser.add_argument("--checkpoint", default="migrate_layout_checkpoint.json")
+    parser.add_argument("--resume", action="store_true", help="Continue from the checkpoint file")
+    parser.add_argument(
+        "--drop-legacy-collection",
+        action="store_true",
+        help=f"Allow deleting a real collection named {settings.VECTOR_COLLECTION} so the alias can take its name"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    alias = settings.VECTOR_COLLECTION
+    checkpoint = Checkpoint(args.checkpoint)
+    vector_db = VectorDB()
+
+    if args.resume and checkpoint.load():
+        logger.info(f"Resuming copy into {checkpoint.state['collection']}")
+    else:
+        source_name = vector_db.resolve_alias(alias) or alias
+        vector_size = vector_db.client.get_collection(source_name).config.params.vectors.size
+        collection = f"{alias}_{settings.VECTOR_TENANT_LAYOUT}_{datetime.now(timezone.utc):%Y%m%d%H%M%S}"
+        vector_db.create_collection(collection, vector_size)
+        checkpoint.save(
+            source=source_name,
+            collection=collection,
+            started_at=datetime.now(timezone.utc).isoformat(),
+            phase="copy",
+            offset=None,
+            copied=0
+        )
+
+    target = VectorDB(collection_name=checkpoint.state["collection"])
+    writer = BufferedVectorWriter(target)
+
+    if checkpoint.state["phase"] == "copy":
+        copy_points(vector_db, checkpoint.state["source"], writer, checkpoint, args.page_size)
+        checkpoint.save(phase="catch_up", last_id=None, processed=0)
+
+    if checkpoint.state["phase"] == "catch_up":
+        # Notes written to the old collection after the scroll passed them
+        started_at = datetime.fromisoformat(checkpoint.state["started_at"])
+        pages = iter_note_pages(args.page_size, after_id=checkpoint.state["last_id"], changed_since=started_at)
+        run_pass(pages, get_embedding_model(), writer, args.workers, checkpoint, "catch_up")
+        checkpoint.save(phase="swap", last_id=None)
+    writer.close()
+
+    if checkpoint.state["phase"] == "swap":
+        promote_collection(vector_db, alias, target.collection_name, args.drop_legacy_collection)
+        checkpoint.save(phase="done")
+        logger.info(f"Layout migration complete: {alias} -> {target.collection_name}")
+
+if __name__ == "__main__":
+    main()
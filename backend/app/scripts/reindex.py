@@ -0,0 +1,334 @@
+"""Re-embed every note into a new Qdrant collection, then swap the alias to it.
+
+Usage (from backend/app):
+    python -m scripts.reindex --model all-mpnet-base-v2 --workers 4
+    python -m scripts.reindex --resume            # continue after a crash
+
+Notes are streamed from Postgres in keyset-paginated pages (ordered by id),
+decrypted, chunked and embedded in large batches (with their stored image
+captions and linked-page text), and bulk-upserted into the new collection.
+Attached documents are re-indexed as attachment chunks. Progress is checkpointed every --checkpoint-every pages once
+they have fully landed, so a restart skips everything already written.
+
+After the main pass a catch-up pass re-embeds notes edited since the run
+started and removes vectors of notes deleted meanwhile. Then
+settings.VECTOR_COLLECTION is atomically pointed at the new collection, and
+a final catch-up repeats both for changes that reached the old collection
+between the catch-up and the swap.
+
+Deploy the new EMBEDDING_MODEL together with the swap, since queries must be
+embedded with the same model as the collection they search.
+"""
+import argparse
+import json
+import logging
+import os
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import List, Optional
+from sqlalchemy import func
+from config import settings
+from db import models
+from db.session import SessionLocal
+from db.qdrant import VectorDB, build_chunk_points
+from db.vector_writer import BufferedVectorWriter
+from ai import chunking
+from ai.model_registry import get_embedding_model
+from services.extraction_service import extraction_service, is_extractable
+from services.note_service import embedding_text
+from utils import security
+
+logger = logging.getLogger("reindex")
+
+class Checkpoint:
+    """Progress file, rewritten atomically so a crash never leaves it half written"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.state = {}
+
+    def load(self) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path) as f:
+            self.state = json.load(f)
+        return True
+
+    def save(self, **updates):
+        self.state.update(updates)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+def iter_note_pages(page_size: int, after_id: Optional[str] = None, changed_since: Optional[datetime] = None):
+    """Yield lists of notes ordered by id, using keyset pagination instead of OFFSET"""
+    db = SessionLocal()
+    try:
+        last_id = after_id
+        while True:
+            query = db.query(
+                models.Note.id,
+                models.Note.user_id,
+                models.Note.content,
+                models.Note.media_path,
+                models.Note.note_data,
+                models.Note.created_at
+            ).filter(models.Note.status != "deleted")
+            if changed_since is not None:
+                query = query.filter(
+                    func.coalesce(models.Note.updated_at, models.Note.created_at) >= changed_since
+                )
+            if last_id is not None:
+                query = query.filter(models.Note.id > last_id)
+            page = query.order_by(models.Note.id).limit(page_size).all()
+            if not page:
+                return
+            yield page
+            last_id = page[-1].id
+    finally:
+        db.close()
+
+def note_text(note) -> str:
+    """What the live pipeline embeds: content plus stored image caption and linked-page text"""
+    key = security.get_user_key(note.user_id)
+    note_data = note.note_data or {}
+    linked_text = note_data.get("linked_text")
+    return embedding_text(
+        security.decrypt_content(note.content, key) if note.content else "",
+        note_data.get("image_caption"),
+        security.decrypt_content(linked_text, key) if linked_text else None
+    )
+
+def reindex_page(page: list, model, writer: BufferedVectorWriter, replace: bool = False) -> int:
+    """Embed a page of notes in large batches and queue their chunks for bulk upsert.
+
+    Attached documents are re-extracted (from the extraction cache when
+    possible) and indexed as attachment chunks, as extract_note_media does.
+    With `replace` (catch-up passes), chunks left over from an earlier, longer
+    version of a note already in the new collection are deleted.
+    """
+    texts: List[str] = []
+    owners = []  # (note, chunk_index) per chunk text
+    for note in page:
+        text = note_text(note)
+        chunks = list(chunking.chunk_text(text, model)) if text else []
+        if replace:
+            writer.vector_db.delete_stale_chunks(note.id, len(chunks))
+        for chunk_index, chunk in enumerate(chunks):
+            texts.append(chunk)
+            owners.append((note, chunk_index))
+
+    vectors = []
+    batch_size = settings.EMBEDDING_CHUNK_BATCH_SIZE * 8
+    for start in range(0, len(texts), batch_size):
+        vectors.extend(model.generate_many(texts[start:start + batch_size]))
+
+    points = []
+    for (note, chunk_index), text, vector in zip(owners, texts, vectors):
+        points.extend(build_chunk_points(
+            note.id,
+            note.user_id,
+            [(chunk_index, text, vector)],
+            metadata={"created_at": str(note.created_at)}
+        ))
+    writer.add_many(points)
+
+    for note in page:
+        if note.media_path and is_extractable(note.media_path):
+            chunking.index_attachment_pages(
+                model,
+                writer.vector_db,
+                note.id,
+                note.user_id,
+                extraction_service.iter_pages(note.media_path),
+                metadata={"created_at": str(note.created_at)}
+            )
+        elif replace:
+            writer.vector_db.delete_stale_attachment_chunks(note.id, 0)  # Attachment removed
+
+    # Record which model produced the vectors
+    db = SessionLocal()
+    try:
+        db.query(models.Note).filter(
+            models.Note.id.in_([note.id for note in page])
+        ).update({models.Note.embedding_model: model.model_name}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+    return len(page)
+
+def run_pass(
+    pages,
+    model,
+    writer: BufferedVectorWriter,
+    workers: int,
+    checkpoint: Checkpoint,
+    phase: str,
+    checkpoint_every: int,
+    replace: bool = False
+):
+    """Process pages on a worker pool, advancing the checkpoint strictly in page order.
+
+    The writer is flushed only when a checkpoint is saved, every
+    `checkpoint_every` pages, so its batches stay full in between.
+    """
+    in_flight = deque()
+    drained = []  # (last_id, notes processed) of finished pages not yet checkpointed
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for page in pages:
+            in_flight.append((page[-1].id, executor.submit(reindex_page, page, model, writer, replace)))
+            # Bound memory: wait for the oldest page before reading too far ahead
+            while len(in_flight) >= workers * 2:
+                _drain_one(in_flight, drained, writer, checkpoint, phase, checkpoint_every)
+        while in_flight:
+            _drain_one(in_flight, drained, writer, checkpoint, phase, checkpoint_every)
+    if drained:
+        _save_progress(drained, writer, checkpoint, phase)
+
+def _drain_one(
+    in_flight: deque,
+    drained: list,
+    writer: BufferedVectorWriter,
+    checkpoint: Checkpoint,
+    phase: str,
+    checkpoint_every: int
+):
+    last_id, future = in_flight.popleft()
+    drained.append((last_id, future.result()))
+    if len(drained) >= checkpoint_every:
+        _save_progress(drained, writer, checkpoint, phase)
+
+def _save_progress(drained: list, writer: BufferedVectorWriter, checkpoint: Checkpoint, phase: str):
+    # Only checkpoint once these pages' points have actually reached Qdrant
+    writer.flush()
+    if writer.failed_points:
+        raise RuntimeError(f"{len(writer.failed_points)} points failed to write; rerun with --resume")
+    last_id = drained[-1][0]
+    checkpoint.save(
+        phase=phase,
+        last_id=last_id,
+        processed=checkpoint.state.get("processed", 0) + sum(processed for _, processed in drained)
+    )
+    drained.clear()
+    logger.info(f"[{phase}] {checkpoint.state['processed']} notes reindexed (last id {last_id})")
+
+def prune_deleted_notes(target: VectorDB, batch_size: int = 1000) -> int:
+    """Delete vectors of notes that were deleted (or soft-deleted) after they were indexed"""
+    removed = set()
+    offset = None
+    db = SessionLocal()
+    try:
+        while True:
+            records, offset = target.client.scroll(
+                collection_name=target.collection_name,
+                limit=batch_size,
+                offset=offset,
+                with_payload=["note_id"],
+                with_vectors=False
+            )
+            note_ids = {record.payload["note_id"] for record in records if record.payload.get("note_id")}
+            live = {
+                row.id for row in db.query(models.Note.id).filter(
+                    models.Note.id.in_(note_ids),
+                    models.Note.status != "deleted"
+                )
+            }
+            for note_id in note_ids - live - removed:
+                target.delete_note_vector(note_id)
+                removed.add(note_id)
+            if offset is None:
+                return len(removed)
+    finally:
+        db.close()
+
+def promote_collection(vector_db: VectorDB, alias: str, collection: str, drop_legacy: bool):
+    """Atomically point `alias` at `collection`"""
+    existing = [col.name for col in vector_db.client.get_collections().collections]
+    if alias in existing:
+        # First migration: the live data is a plain collection, not an alias yet
+        if not drop_legacy:
+            raise SystemExit(
+                f"{alias} is a collection, not an alias; rerun with --resume "
+                f"--drop-legacy-collection to replace it"
+            )
+        vector_db.client.delete_collection(alias)
+    vector_db.swap_alias(alias, collection)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=settings.EMBEDDING_MODEL)
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--checkpoint", default="reindex_checkpoint.json")
+    parser.add_argument("--checkpoint-every", type=int, default=10, help="Pages between checkpoints (and writer flushes)")
+    parser.add_argument("--resume", action="store_true", help="Continue from the checkpoint file")
+    parser.add_argument(
+        "--drop-legacy-collection",
+        action="store_true",
+        help=f"Allow deleting a real collection named {settings.VECTOR_COLLECTION} so the alias can take its name"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    alias = settings.VECTOR_COLLECTION
+    checkpoint = Checkpoint(args.checkpoint)
+    model = get_embedding_model(args.model)
+    vector_db = VectorDB()
+
+    if args.resume and checkpoint.load():
+        if checkpoint.state["model"] != args.model:
+            parser.error(f"Checkpoint is for model {checkpoint.state['model']}, not {args.model}")
+        logger.info(f"Resuming {checkpoint.state['collection']} from {checkpoint.state.get('last_id')}")
+    else:
+        slug = re.sub(r"[^a-z0-9]+", "_", args.model.lower()).strip("_")
+        collection = f"{alias}_{slug}_{datetime.now(timezone.utc):%Y%m%d%H%M%S}"
+        vector_db.create_collection(collection, len(model.generate("dimension probe")))
+        checkpoint.save(
+            collection=collection,
+            model=args.model,
+            started_at=datetime.now(timezone.utc).isoformat(),
+            phase="main",
+            last_id=None,
+            processed=0
+        )
+
+    target = VectorDB(collection_name=checkpoint.state["collection"])
+    writer = BufferedVectorWriter(target)
+    started_at = datetime.fromisoformat(checkpoint.state["started_at"])
+
+    if checkpoint.state["phase"] == "main":
+        pages = iter_note_pages(args.page_size, after_id=checkpoint.state["last_id"])
+        run_pass(pages, model, writer, args.workers, checkpoint, "main", args.checkpoint_every)
+        checkpoint.save(phase="catch_up", last_id=None, catch_up_started_at=datetime.now(timezone.utc).isoformat())
+
+    if checkpoint.state["phase"] == "catch_up":
+        # Notes written to or deleted from the old collection while the main pass ran
+        pages = iter_note_pages(args.page_size, after_id=checkpoint.state["last_id"], changed_since=started_at)
+        run_pass(pages, model, writer, args.workers, checkpoint, "catch_up", args.checkpoint_every, replace=True)
+        logger.info(f"[catch_up] removed {prune_deleted_notes(target)} deleted notes")
+        checkpoint.save(phase="swap", last_id=None)
+
+    if checkpoint.state["phase"] == "swap":
+        promote_collection(vector_db, alias, target.collection_name, args.drop_legacy_collection)
+        checkpoint.save(phase="final", last_id=None)
+        logger.info(f"Swapped {alias} -> {target.collection_name}")
+
+    if checkpoint.state["phase"] == "final":
+        # Changes that still went to the old collection between the catch-up and the swap;
+        # writes from now on land in the new collection through the alias
+        catch_up_started_at = datetime.fromisoformat(
+            checkpoint.state.get("catch_up_started_at", checkpoint.state["started_at"])
+        )
+        pages = iter_note_pages(args.page_size, after_id=checkpoint.state["last_id"], changed_since=catch_up_started_at)
+        run_pass(pages, model, writer, args.workers, checkpoint, "final", args.checkpoint_every, replace=True)
+        logger.info(f"[final] removed {prune_deleted_notes(target)} deleted notes")
+        checkpoint.save(phase="done")
+        logger.info(f"Reindex complete: {alias} -> {target.collection_name}")
+    writer.close()
+    extraction_service.close()
+
+if __name__ == "__main__":
+    main()
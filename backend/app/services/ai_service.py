@@ -1,12 +1,19 @@
-from ai import embeddings, linking, titling, multimodal
-from tasks.ai_tasks import process_note_async
-from db.qdrant import VectorDB
-
-vector_db = VectorDB()
+from ai import linking, multimodal, chunking, captioning
+from ai.model_registry import get_embedding_model
+from ai.title_engine import title_engine
+from db.vector_store import async_vector_store
+from db.session import SessionLocal
+from db import models
+from services.graph_service import GraphService
+from services.cluster_service import ClusterService
+from sqlalchemy.orm import Session
+from typing import Optional
+import asyncio
+import threading
 
 class AIService:
     def __init__(self):
-        self.embedding_model = embeddings.LocalEmbeddingModel()
+        self.embedding_model = get_embedding_model()
         self.multimodal_processor = multimodal.MultimodalProcessor()
     
     async def process_note(self, note_data: dict):
@@ -18,29 +25,33 @@ class AIService:
         # Real-time processing for small notes
         return await self._process_note_sync(note_data)
     
-    async def _process_note_sync(self, note_data: dict):
-        # Generate embedding
-        embedding = self.embedding_model.generate(
-            note_data['content'],
-            note_data.get('media_path')
-        )
-        
-        # Store in vector DB
-        vector_id = vector_db.upsert(
-            embedding, 
+    async def _process_note_sync(self, note_data: dict, vector_store=None):
+        vector_store = vector_store or async_vector_store
+        media_path = note_data.get('media_path')
+        if media_path and captioning.is_image_path(media_path) and not note_data.get('image_caption'):
+            note_data['image_caption'] = await self.multimodal_processor.describe_image_async(media_path)
+        text = note_data['content']
+        if note_data.get('image_caption'):
+            text = f"{text}\n\n{note_data['image_caption']}"
+        # Embed chunk by chunk and store each chunk in the vector DB;
+        # the note-level vector is the mean of the chunk vectors
+        embedding = await chunking.embed_and_index_note_async(
+            self.embedding_model,
+            vector_store,
             note_data['id'],
-            metadata={
-                'user_id': note_data['user_id'],
-                'created_at': note_data['created_at']
-            }
+            note_data['user_id'],
+            text,
+            metadata={'created_at': note_data['created_at']}
         )
+        vector_id = note_data['id']
+        if embedding:
+            await asyncio.to_thread(
+                self._update_graph, note_data['id'], note_data['user_id'], embedding
+            )
         
         # Generate title if missing
         if not note_data.get('title'):
-            note_data['title'] = titling.generate_title(
-                note_data['content'],
-                embedding
-            )
+            note_data['title'], _ = await title_engine.title_async(note_data['content'], embedding)
         
         # Find related notes
         related_notes = linking.find_related_notes(
@@ -52,5 +63,64 @@ class AIService:
         return {
             'vector_id': vector_id,
             'title': note_data['title'],
+            'image_caption': note_data.get('image_caption'),
             'related_notes': related_notes
-        }
\ No newline at end of file
+        }
+
+    async def find_related_notes_for_user(self, user_id: str, note_id: str, threshold: float = 0.7) -> dict:
+        """Related notes for an already-indexed note, using its stored vector"""
+        # Only the note's owner may use its vector as a query
+        owner = await asyncio.to_thread(self._note_owner, note_id)
+        if owner is None or int(owner) != int(user_id):
+            return {'links': []}
+        embedding = await async_vector_store.get_note_vector(note_id)
+        if embedding is None:
+            return {'links': []}
+        
+        links = await linking.find_related_notes_async(
+            embedding,
+            user_id,
+            threshold=threshold,
+            exclude_note_ids=[note_id]
+        )
+        return {'links': links}
+
+    def generate_title(self, content: str, force_generative: bool = False) -> dict:
+        # Without the note's embedding the key-phrase tier can't score and every request escalates
+        embedding = None if force_generative else self.embedding_model.generate(content)
+        title, tier = title_engine.title(content, embedding, force_generative=force_generative)
+        return {'title': title, 'tier': tier}
+
+    def describe_image(self, image_path: str) -> str:
+        return self.multimodal_processor.describe_image(image_path)
+
+    def _note_owner(self, note_id: str) -> Optional[int]:
+        db = SessionLocal()
+        try:
+            return db.query(models.Note.user_id).filter(models.Note.id == note_id).scalar()
+        finally:
+            db.close()
+
+    def _update_graph(self, note_id: str, user_id: int, embedding: list):
+        db = SessionLocal()
+        try:
+            GraphService(db).update_note_edges(note_id, user_id, embedding)
+            ClusterService(db).assign_note(note_id, user_id, embedding)
+        finally:
+            db.close()
+
+    def generate_knowledge_graph(self, user_id: int, db: Session) -> dict:
+        """The user's stored knowledge graph, maintained incrementally as notes change"""
+        return GraphService(db).get_graph(user_id)
+
+_ai_service: Optional[AIService] = None
+_ai_service_lock = threading.Lock()
+
+def get_ai_service() -> AIService:
+    """Shared AIService instance, so endpoints don't reload models per request"""
+    global _ai_service
+    if _ai_service is None:
+        with _ai_service_lock:
+            if _ai_service is None:
+                _ai_service = AIService()
+    return _ai_service
@@ -0,0 +1,99 @@
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from db import models
+from db.vector_store import vector_db
+from services.graph_service import bump_graph_version
+from config import settings
+from typing import List, Optional
+import logging
+import math
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def cluster_count(note_count: int) -> int:
+    """Number of clusters for a library: ~sqrt(n/2), within [2, CLUSTER_MAX]"""
+    return max(2, min(settings.CLUSTER_MAX, round(math.sqrt(note_count / 2))))
+
+class ClusterService:
+    """Groups a user's notes by embedding so graph nodes carry a precomputed group.
+
+    A background job fits mini-batch k-means over the user's note vectors and
+    stores the centroids; notes indexed in between are assigned to the nearest
+    stored centroid, so neither path does per-request work.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def recluster_user(self, user_id: int) -> int:
+        """Refit the user's clusters from scratch and reassign every note"""
+        from sklearn.cluster import MiniBatchKMeans  # Heavy import, only needed by the job
+
+        note_ids, matrix = vector_db.get_user_vectors(user_id)
+        existing = {
+            row.id for row in self.db.query(models.Note.id).filter(models.Note.user_id == user_id)
+        }
+        keep = [row for row, note_id in enumerate(note_ids) if note_id in existing]
+        note_ids, matrix = [note_ids[row] for row in keep], matrix[keep]
+
+        self.db.query(models.Note).filter(models.Note.user_id == user_id).update(
+            {models.Note.cluster_id: None}, synchronize_session=False
+        )
+        self.db.query(models.NoteCluster).filter(models.NoteCluster.user_id == user_id).delete(
+            synchronize_session=False
+        )
+
+        if len(note_ids) < settings.CLUSTER_MIN_NOTES:
+            bump_graph_version(self.db, user_id)
+            self.db.commit()
+            return 0
+
+        kmeans = MiniBatchKMeans(
+            n_clusters=cluster_count(len(note_ids)),
+            batch_size=settings.CLUSTER_BATCH_SIZE,
+            n_init=3,
+            random_state=0
+        ).fit(matrix)
+        centroids = kmeans.cluster_centers_
+        centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+        sizes = np.bincount(kmeans.labels_, minlength=len(centroids))
+
+        clusters = [
+            models.NoteCluster(user_id=user_id, centroid=centroid.tolist(), size=int(size))
+            for centroid, size in zip(centroids, sizes)
+        ]
+        self.db.add_all(clusters)
+        self.db.flush()  # Assigns cluster IDs
+
+        # Bulk UPDATE by primary key, executed as one executemany
+        self.db.execute(update(models.Note), [
+            {"id": note_id, "cluster_id": clusters[label].id}
+            for note_id, label in zip(note_ids, kmeans.labels_)
+        ])
+        bump_graph_version(self.db, user_id)
+        self.db.commit()
+        logger.info(f"Clustered {len(note_ids)} notes of user {user_id} into {len(clusters)} groups")
+        return len(clusters)
+
+    def assign_note(self, note_id: str, user_id: int, embedding: List[float]) -> Optional[int]:
+        """Put a note in its nearest stored cluster; None if the user has no clusters yet"""
+        clusters = self.db.query(models.NoteCluster).filter(models.NoteCluster.user_id == user_id).all()
+        if not clusters:
+            return None
+
+        centroids = np.asarray([cluster.centroid for cluster in clusters], dtype=np.float32)
+        nearest = clusters[int(np.argmax(centroids @ np.asarray(embedding, dtype=np.float32)))]
+
+        note = self.db.query(models.Note).filter(models.Note.id == note_id).first()
+        if note is None or note.cluster_id == nearest.id:
+            return nearest.id
+
+        for cluster in clusters:
+            if cluster.id == note.cluster_id:
+                cluster.size = max(0, (cluster.size or 0) - 1)
+        nearest.size = (nearest.size or 0) + 1
+        note.cluster_id = nearest.id
+        bump_graph_version(self.db, user_id)
+        self.db.commit()
+        return nearest.id
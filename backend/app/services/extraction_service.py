@@ -0,0 +1,243 @@
+import json
+import logging
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeout
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+EXTRACTABLE_SUFFIXES = (".pdf", ".png", ".jpg", ".jpeg", ".gif", ".bmp", ".txt", ".md")
+
+class ExtractionTimeout(Exception):
+    """A worker ran past EXTRACTION_TIMEOUT_SECONDS and was killed"""
+
+def is_extractable(path: str) -> bool:
+    return path.lower().endswith(EXTRACTABLE_SUFFIXES)
+
+# Worker-side functions: module level so the process pool can pickle them
+
+def _limit_worker_memory(limit_bytes: int):
+    if limit_bytes <= 0:
+        return
+    try:
+        import resource
+        resource.setrlimit(resource.RLIMIT_AS, (limit_bytes, limit_bytes))
+    except (ImportError, ValueError, OSError) as e:
+        logger.warning(f"Could not cap extraction worker memory: {e}")
+
+def _pdf_page_count(path: str) -> int:
+    from pypdf import PdfReader
+    return len(PdfReader(path).pages)
+
+def _extract_pdf_pages(path: str, start: int, end: int) -> List[str]:
+    from pypdf import PdfReader
+    reader = PdfReader(path)
+    return [(reader.pages[i].extract_text() or "") for i in range(start, end)]
+
+def _extract_file(path: str) -> List[str]:
+    from utils.file_processing import extract_text_from_file
+    return [extract_text_from_file(path)]
+
+class ExtractionCache:
+    """Extracted pages keyed by file sha256: an in-memory LRU, plus one JSON
+    file per document under `directory` when configured"""
+
+    def __init__(self, max_entries: int, directory: Optional[str] = None):
+        self.max_entries = max_entries
+        self.directory = Path(directory) if directory else None
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self._entries: "OrderedDict[str, List[str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Stats
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, digest: str) -> Optional[List[str]]:
+        with self._lock:
+            pages = self._entries.get(digest)
+            if pages is not None:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return pages
+        if self.directory is not None:
+            path = self.directory / f"{digest}.json"
+            if path.exists():
+                pages = json.loads(path.read_text())
+                self._remember(digest, pages)
+                self.hits += 1
+                return pages
+        self.misses += 1
+        return None
+
+    def put(self, digest: str, pages: List[str]):
+        self._remember(digest, pages)
+        if self.directory is not None:
+            # Write then rename, so readers never see a partial file
+            temp = self.directory / f"{digest}.json.tmp"
+            temp.write_text(json.dumps(pages))
+            os.replace(temp, self.directory / f"{digest}.json")
+
+    def _remember(self, digest: str, pages: List[str]):
+        with self._lock:
+            self._entries[digest] = pages
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+class ExtractionService:
+    """Text extraction in a bounded pool of worker processes.
+
+    At most `workers` jobs run at once and callers beyond that wait, so a job's
+    timeout measures its own run time. A job that overruns gets its pool killed
+    and replaced (a running process can't be cancelled any other way); jobs
+    that shared the pool are retried once. Workers run under an address-space
+    limit, and results are cached by the file's content hash. PDFs are
+    extracted a few pages per job and yielded in order as they finish.
+    """
+
+    def __init__(self, workers: int, timeout: float, memory_limit_bytes: int, cache: ExtractionCache):
+        self.workers = workers
+        self.timeout = timeout
+        self.memory_limit_bytes = memory_limit_bytes
+        self.cache = cache
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(workers)
+
+        # Stats
+        self.jobs = 0
+        self.timeouts = 0
+        self.pool_restarts = 0
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    # Fresh interpreters: forking would copy model weights and held locks
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_limit_worker_memory,
+                    initargs=(self.memory_limit_bytes,)
+                )
+            return self._pool
+
+    def _reset_pool(self, pool: ProcessPoolExecutor):
+        with self._pool_lock:
+            if self._pool is not pool:
+                return  # Another caller already replaced it
+            self._pool = None
+            self.pool_restarts += 1
+        for process in list((pool._processes or {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, fn: Callable, *args):
+        if multiprocessing.current_process().daemon:
+            # e.g. a Celery prefork child: the pool could never start its workers
+            raise RuntimeError(
+                "Extraction can't start worker processes from a daemonic process; "
+                f"consume the '{settings.EXTRACTION_QUEUE}' queue with a -P threads or -P solo worker"
+            )
+        with self._slots:
+            for attempt in range(2):
+                pool = self._get_pool()
+                try:
+                    future = pool.submit(fn, *args)
+                    self.jobs += 1
+                    return future.result(timeout=self.timeout)
+                except FuturesTimeout:
+                    self.timeouts += 1
+                    self._reset_pool(pool)
+                    raise ExtractionTimeout(f"{fn.__name__}{args} exceeded {self.timeout}s")
+                except BrokenProcessPool:
+                    # A worker died (e.g. hit the memory limit) or the pool was reset under us
+                    self._reset_pool(pool)
+                    if attempt:
+                        raise
+
+    def iter_pages(self, path: str) -> Iterator[Tuple[int, str]]:
+        """Yield (page_number, text) in order, PDFs a few pages at a time.
+
+        Pages whose job times out or fails are skipped; only a complete
+        extraction is cached.
+        """
+        from utils.file_processing import file_sha256  # Kept out of the workers' imports
+        digest = file_sha256(path)
+        cached = self.cache.get(digest)
+        if cached is not None:
+            yield from enumerate(cached, start=1)
+            return
+
+        try:
+            if not path.lower().endswith(".pdf"):
+                pages = self._run(_extract_file, path)
+            else:
+                page_count = self._run(_pdf_page_count, path)
+        except Exception as e:
+            logger.error(f"Extracting {path} failed: {e}")
+            return
+
+        if not path.lower().endswith(".pdf"):
+            self.cache.put(digest, pages)
+            yield from enumerate(pages, start=1)
+            return
+
+        pages: List[str] = []
+        complete = True
+        step = settings.EXTRACTION_PDF_PAGES_PER_JOB
+        for start in range(0, page_count, step):
+            end = min(start + step, page_count)
+            try:
+                texts = self._run(_extract_pdf_pages, path, start, end)
+            except Exception as e:
+                logger.error(f"Extracting pages {start + 1}-{end} of {path} failed: {e}")
+                complete = False
+                texts = [""] * (end - start)
+            for offset, text in enumerate(texts):
+                pages.append(text)
+                yield start + offset + 1, text
+
+        if complete:
+            self.cache.put(digest, pages)
+
+    def extract_text(self, path: str) -> str:
+        return "\n\n".join(text for _, text in self.iter_pages(path) if text)
+
+    def close(self):
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "jobs": self.jobs,
+            "timeouts": self.timeouts,
+            "pool_restarts": self.pool_restarts,
+            "cache": self.cache.stats()
+        }
+
+# Singleton instance
+extraction_service = ExtractionService(
+    workers=settings.EXTRACTION_WORKERS,
+    timeout=settings.EXTRACTION_TIMEOUT_SECONDS,
+    memory_limit_bytes=settings.EXTRACTION_MEMORY_LIMIT_MB * 2**20,
+    cache=ExtractionCache(settings.EXTRACTION_CACHE_SIZE, settings.EXTRACTION_CACHE_DIR or None)
+)
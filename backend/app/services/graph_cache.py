@@ -0,0 +1,105 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+def graph_etag(user_id: int, version: int) -> str:
+    return f'"graph-{user_id}-{version}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison against an If-None-Match header, as RFC 9110 requires for GET"""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+class GraphCache:
+    """Serialized knowledge-graph responses keyed by (user_id, graph_version).
+
+    Versions only move forward, so an entry never needs invalidating: once the
+    version is bumped the old key is simply never asked for again and ages out
+    of the LRU (or expires in Redis). The Redis tier, when configured, lets
+    several API workers share one rendered copy.
+    """
+
+    def __init__(self, max_bytes: int, redis_url: str = "", redis_ttl: int = 3600):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.redis_ttl = redis_ttl
+        self._entries: "OrderedDict[Tuple[int, int], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis = None
+        if redis_url:
+            import redis  # Optional dependency, only needed for the shared tier
+            self._redis = redis.Redis.from_url(redis_url)
+        self.memory_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int, version: int) -> Optional[bytes]:
+        key = (user_id, version)
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return body
+
+        if self._redis is not None:
+            try:
+                body = self._redis.get(self._redis_key(key))
+            except Exception as e:
+                logger.warning(f"Graph cache Redis read failed: {e}")
+                body = None
+            if body is not None:
+                self.redis_hits += 1
+                self._put_memory(key, body)
+                return body
+
+        self.misses += 1
+        return None
+
+    def put(self, user_id: int, version: int, body: bytes):
+        key = (user_id, version)
+        self._put_memory(key, body)
+        if self._redis is not None:
+            try:
+                self._redis.set(self._redis_key(key), body, ex=self.redis_ttl)
+            except Exception as e:
+                logger.warning(f"Graph cache Redis write failed: {e}")
+
+    def _put_memory(self, key: Tuple[int, int], body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= len(old)
+            self._entries[key] = body
+            self.current_bytes += len(body)
+            while self.current_bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= len(evicted)
+
+    @staticmethod
+    def _redis_key(key: Tuple[int, int]) -> str:
+        return f"graph:{key[0]}:{key[1]}"
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "memory_hits": self.memory_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses
+        }
+
+# Singleton instance
+graph_cache = GraphCache(
+    settings.GRAPH_CACHE_MAX_BYTES,
+    redis_url=settings.GRAPH_CACHE_REDIS_URL,
+    redis_ttl=settings.GRAPH_CACHE_REDIS_TTL
+)
@@ -0,0 +1,294 @@
+from sqlalchemy import func, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from db import models
+from db.vector_store import vector_db
+from ai import linking
+from config import settings
+from typing import Dict, Iterator, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+SEMANTIC = "semantic"
+
+def node_group(note) -> str:
+    """Graph group of a note row: its embedding cluster, else its category"""
+    if note.cluster_id is not None:
+        return f"cluster-{note.cluster_id}"
+    return note.category or "general"
+
+def bump_graph_version(db: Session, user_id: int):
+    """Mark the user's cached graph stale; takes effect when the caller commits"""
+    db.query(models.User).filter(models.User.id == user_id).update(
+        {models.User.graph_version: models.User.graph_version + 1},
+        synchronize_session=False
+    )
+
+class GraphService:
+    """Semantic edges between notes, stored in NoteConnection.
+
+    Each note points at its top-k most similar notes. Edits only touch the
+    edges around the edited note, so the stored graph stays current without
+    recomputing the whole library, and reads are plain indexed queries.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def update_note_edges(self, note_id: str, user_id: int, embedding: List[float]) -> int:
+        """Recompute one note's neighbourhood and upsert the affected edges"""
+        k = settings.KNOWLEDGE_GRAPH_NEIGHBORS
+        hits = vector_db.semantic_search(
+            embedding,
+            user_id,
+            limit=k * settings.KNOWLEDGE_GRAPH_CANDIDATES,
+            score_threshold=settings.KNOWLEDGE_GRAPH_MIN_SIMILARITY,
+            exclude_note_ids=[note_id]
+        )
+        # Vectors can outlive their notes; only link notes that still exist
+        existing = {
+            row.id for row in self.db.query(models.Note.id).filter(
+                models.Note.id.in_([hit["note_id"] for hit in hits]),
+                models.Note.user_id == user_id
+            )
+        }
+        similarity = {hit["note_id"]: hit["score"] for hit in hits if hit["note_id"] in existing}
+        neighbors = list(similarity)[:k]  # Hits are sorted by score
+
+        edges = [(note_id, target, similarity[target]) for target in neighbors]
+        stale_ids = []
+
+        # Outgoing edges to notes that are no longer neighbours
+        for edge in self._semantic_edges(models.NoteConnection.source_id == note_id):
+            if edge.target_id not in neighbors:
+                stale_ids.append(edge.id)
+
+        # Incoming edges: refresh their strength, or drop them if the note drifted
+        # out of the candidate set (it can't be in the source's top-k anymore)
+        for edge in self._semantic_edges(models.NoteConnection.target_id == note_id):
+            if edge.source_id in similarity:
+                edges.append((edge.source_id, note_id, similarity[edge.source_id]))
+            else:
+                stale_ids.append(edge.id)
+
+        # The note may now belong in its neighbours' top-k
+        edges.extend((target, note_id, similarity[target]) for target in neighbors)
+
+        self._delete_edges(stale_ids)
+        self._upsert_edges(edges)
+        self._trim_outgoing(neighbors, k)
+        bump_graph_version(self.db, user_id)
+        self.db.commit()
+        return len(edges)
+
+    def rebuild_user_graph(self, user_id: int, batch_size: int = 1000) -> int:
+        """Recompute every semantic edge of a user from scratch (backfills and repairs)"""
+        note_ids, matrix = vector_db.get_user_vectors(user_id)
+        existing = {
+            row.id for row in self.db.query(models.Note.id).filter(models.Note.user_id == user_id)
+        }
+        keep = [row for row, note_id in enumerate(note_ids) if note_id in existing]
+        note_ids, matrix = [note_ids[row] for row in keep], matrix[keep]
+
+        indices, scores = linking.top_k_neighbors(matrix, settings.KNOWLEDGE_GRAPH_NEIGHBORS)
+        edges = [
+            (note_ids[source], note_ids[target], float(score))
+            for source, (targets, row_scores) in enumerate(zip(indices, scores))
+            for target, score in zip(targets, row_scores)
+            if score >= settings.KNOWLEDGE_GRAPH_MIN_SIMILARITY
+        ]
+
+        self.db.query(models.NoteConnection).filter(
+            models.NoteConnection.connection_type == SEMANTIC,
+            models.NoteConnection.source_id.in_(
+                select(models.Note.id).where(models.Note.user_id == user_id)
+            )
+        ).delete(synchronize_session=False)
+        for start in range(0, len(edges), batch_size):
+            self._upsert_edges(edges[start:start + batch_size])
+        bump_graph_version(self.db, user_id)
+        self.db.commit()
+        logger.info(f"Rebuilt knowledge graph for user {user_id}: {len(note_ids)} notes, {len(edges)} edges")
+        return len(edges)
+
+    def graph_version(self, user_id: int) -> int:
+        return self.db.query(models.User.graph_version).filter(models.User.id == user_id).scalar() or 0
+
+    def get_graph(self, user_id: int) -> dict:
+        """Stored graph for a user, as nodes and undirected links"""
+        graph = {"nodes": [], "links": []}
+        for kind, item in self.iter_graph(user_id):
+            graph[f"{kind}s"].append(item)
+        return graph
+
+    def iter_graph(self, user_id: int, batch_size: int = 1000) -> Iterator[Tuple[str, dict]]:
+        """Yield ('node', node) for every note, then ('link', link) for every undirected edge.
+
+        Rows are fetched with server-side batching and never collected, so
+        memory stays flat however large the library is.
+        """
+        notes = self.db.query(
+            models.Note.id, models.Note.title, models.Note.category, models.Note.cluster_id
+        ).filter(
+            models.Note.user_id == user_id,
+            models.Note.status != "deleted"
+        ).execution_options(yield_per=batch_size)
+        for note in notes:
+            yield "node", {"id": note.id, "label": note.title or "Note", "group": node_group(note)}
+
+        # Collapse A->B and B->A into one link in SQL rather than in a Python set
+        if self.db.bind.dialect.name == "postgresql":
+            low = func.least(models.NoteConnection.source_id, models.NoteConnection.target_id)
+            high = func.greatest(models.NoteConnection.source_id, models.NoteConnection.target_id)
+        else:
+            low = func.min(models.NoteConnection.source_id, models.NoteConnection.target_id)
+            high = func.max(models.NoteConnection.source_id, models.NoteConnection.target_id)
+        links = self.db.query(
+            low.label("source"),
+            high.label("target"),
+            func.max(models.NoteConnection.strength).label("value")
+        ).join(
+            models.Note, models.Note.id == models.NoteConnection.source_id
+        ).filter(
+            models.Note.user_id == user_id,
+            models.NoteConnection.connection_type == SEMANTIC
+        ).group_by(low, high).execution_options(yield_per=batch_size)
+        for link in links:
+            yield "link", {"source": link.source, "target": link.target, "value": link.value or 0.0}
+
+    def get_ego_graph(self, user_id: int, note_id: str, hops: int = 2, max_nodes: int = 200) -> Optional[dict]:
+        """Notes within `hops` edges of `note_id`, strongest edges first, capped at `max_nodes`.
+
+        Each hop is one lookup on the source_id/target_id indexes for the whole
+        frontier, so the cost depends on the neighbourhood, not the library.
+        Returns None if the note doesn't belong to the user.
+        """
+        owner = self.db.query(models.Note.user_id).filter(models.Note.id == note_id).scalar()
+        # user_id may be the JWT subject (a str); Note.user_id is an int
+        if owner is None or int(owner) != int(user_id):
+            return None
+
+        selected = {note_id: 0}
+        frontier = [note_id]
+        truncated = False
+        for hop in range(1, hops + 1):
+            if not frontier or truncated:
+                break
+            edges = self.db.query(
+                models.NoteConnection.source_id,
+                models.NoteConnection.target_id
+            ).filter(
+                models.NoteConnection.connection_type == SEMANTIC,
+                or_(
+                    models.NoteConnection.source_id.in_(frontier),
+                    models.NoteConnection.target_id.in_(frontier)
+                )
+            ).order_by(models.NoteConnection.strength.desc())
+
+            in_frontier = set(frontier)
+            next_frontier = []
+            for source, target in edges:
+                neighbor = target if source in in_frontier else source
+                if neighbor in selected:
+                    continue
+                if len(selected) >= max_nodes:
+                    truncated = True
+                    break
+                selected[neighbor] = hop
+                next_frontier.append(neighbor)
+            frontier = next_frontier
+
+        ids = list(selected)
+        nodes = [
+            {
+                "id": note.id,
+                "label": note.title or "Note",
+                "group": node_group(note),
+                "hop": selected[note.id]
+            }
+            for note in self.db.query(
+                models.Note.id, models.Note.title, models.Note.category, models.Note.cluster_id
+            ).filter(models.Note.id.in_(ids))
+        ]
+
+        strongest: Dict[Tuple[str, str], float] = {}
+        edges = self.db.query(
+            models.NoteConnection.source_id,
+            models.NoteConnection.target_id,
+            models.NoteConnection.strength
+        ).filter(
+            models.NoteConnection.connection_type == SEMANTIC,
+            models.NoteConnection.source_id.in_(ids),
+            models.NoteConnection.target_id.in_(ids)
+        )
+        for source, target, strength in edges:
+            pair = (min(source, target), max(source, target))
+            strongest[pair] = max(strength or 0.0, strongest.get(pair, 0.0))
+
+        return {
+            "center": note_id,
+            "nodes": nodes,
+            "links": [
+                {"source": source, "target": target, "value": strength}
+                for (source, target), strength in strongest.items()
+            ],
+            "truncated": truncated
+        }
+
+    def _semantic_edges(self, condition) -> List[models.NoteConnection]:
+        return self.db.query(models.NoteConnection).filter(
+            condition,
+            models.NoteConnection.connection_type == SEMANTIC
+        ).all()
+
+    def _delete_edges(self, edge_ids: List[int]):
+        if edge_ids:
+            self.db.query(models.NoteConnection).filter(
+                models.NoteConnection.id.in_(edge_ids)
+            ).delete(synchronize_session=False)
+
+    def _upsert_edges(self, edges: List[Tuple[str, str, float]]):
+        """Insert or update (source, target, strength) edges in one statement"""
+        # Postgres rejects a statement that hits the same row twice
+        rows = {
+            (source, target): {
+                "source_id": source,
+                "target_id": target,
+                "connection_type": SEMANTIC,
+                "strength": float(strength),
+                "created_by": "system"
+            }
+            for source, target, strength in edges
+        }
+        if not rows:
+            return
+        dialect = postgresql if self.db.bind.dialect.name == "postgresql" else sqlite
+        statement = dialect.insert(models.NoteConnection).values(list(rows.values()))
+        self.db.execute(statement.on_conflict_do_update(
+            index_elements=["source_id", "target_id", "connection_type"],
+            set_={"strength": statement.excluded.strength, "updated_at": func.now()}
+        ))
+
+    def _trim_outgoing(self, source_ids: List[str], k: int):
+        """Keep only the k strongest outgoing semantic edges of each source"""
+        if not source_ids:
+            return
+        self.db.flush()
+        edges = self.db.query(
+            models.NoteConnection.id,
+            models.NoteConnection.source_id
+        ).filter(
+            models.NoteConnection.source_id.in_(source_ids),
+            models.NoteConnection.connection_type == SEMANTIC
+        ).order_by(
+            models.NoteConnection.source_id,
+            models.NoteConnection.strength.desc()
+        )
+        kept: Dict[str, int] = {}
+        excess = []
+        for edge_id, source_id in edges:
+            kept[source_id] = kept.get(source_id, 0) + 1
+            if kept[source_id] > k:
+                excess.append(edge_id)
+        self._delete_edges(excess)
@@ -0,0 +1,121 @@
+from fastapi import UploadFile
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from db import models
+from utils import file_processing
+from typing import Optional
+import asyncio
+import logging
+import os
+import shutil
+
+logger = logging.getLogger(__name__)
+
+class MediaService:
+    """Reference-counted, content-addressed media storage.
+
+    Uploads are streamed to a temp file and hashed on the way; a file whose
+    hash is already stored just gains a reference, otherwise it is moved into
+    place. Releasing the last reference deletes the row, the file and its
+    thumbnails.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    async def store_upload(self, file: UploadFile) -> models.MediaObject:
+        """Store an upload (or find its twin) and take one reference to it.
+
+        File I/O is async; the sync DB work runs in a thread.
+        """
+        staged = await file_processing.stage_upload_file(file)
+        media = await asyncio.to_thread(self._acquire, staged.sha256)
+        if media is not None:
+            await file_processing.discard_staged_file(staged.temp_path)
+            return media
+
+        path = await file_processing.promote_staged_file(staged)
+        return await asyncio.to_thread(self._insert, staged, path)
+
+    def _insert(self, staged: file_processing.StagedUpload, path: str) -> models.MediaObject:
+        self.db.add(models.MediaObject(sha256=staged.sha256, path=path, size=staged.size, ref_count=1))
+        try:
+            self.db.commit()
+        except IntegrityError:
+            # An identical upload won the race; use its row and file
+            self.db.rollback()
+            media = self._acquire(staged.sha256)
+            if media is None or media.path != path:
+                # A twin under another extension (or a row that vanished) leaves ours unowned
+                self._remove_file(path)
+            if media is not None:
+                return media
+            raise
+        return self.db.get(models.MediaObject, staged.sha256)
+
+    def acquire_path(self, path: Optional[str]) -> bool:
+        """Take a reference to an already stored file by path; False for paths outside the store"""
+        if not path:
+            return False
+        sha256 = self.db.query(models.MediaObject.sha256).filter(models.MediaObject.path == path).scalar()
+        return sha256 is not None and self._acquire(sha256) is not None
+
+    def _acquire(self, sha256: str) -> Optional[models.MediaObject]:
+        updated = self.db.query(models.MediaObject).filter(
+            models.MediaObject.sha256 == sha256
+        ).update(
+            {models.MediaObject.ref_count: models.MediaObject.ref_count + 1},
+            synchronize_session=False
+        )
+        if not updated:
+            return None
+        self.db.commit()
+        return self.db.get(models.MediaObject, sha256, populate_existing=True)
+
+    def release(self, path: Optional[str]):
+        """Drop one reference to a stored file; paths outside the store are ignored"""
+        if not path:
+            return
+        # The UPDATE keeps the row locked until commit, so a concurrent upload of
+        # the same content waits in _acquire rather than promoting a file we then remove
+        updated = self.db.query(models.MediaObject).filter(
+            models.MediaObject.path == path,
+            models.MediaObject.ref_count > 0
+        ).update(
+            {models.MediaObject.ref_count: models.MediaObject.ref_count - 1},
+            synchronize_session=False
+        )
+        if not updated:
+            return
+        media = self.db.query(models.MediaObject).filter(
+            models.MediaObject.path == path
+        ).populate_existing().first()
+        if media.ref_count > 0:
+            self.db.commit()
+            return
+
+        sha256 = media.sha256
+        self.db.delete(media)
+        # Move the file aside under the lock; put it back if the delete doesn't commit
+        trash = f"{path}.deleting"
+        try:
+            os.replace(path, trash)
+        except FileNotFoundError:
+            trash = None
+        try:
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            if trash is not None:
+                os.replace(trash, path)
+            raise
+        if trash is not None:
+            self._remove_file(trash)
+        shutil.rmtree(file_processing.thumbnail_dir(sha256), ignore_errors=True)
+        logger.info(f"Deleted unreferenced media {path}")
+
+    def _remove_file(self, path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -2,14 +2,31 @@ from sqlalchemy.orm import Session
 from db import models
 from schemas import notes as schemas
 from utils import security, file_processing
-from ai import embeddings
+from utils.web_fetch import extract_urls
+from ai import chunking, captioning
+from ai.model_registry import get_embedding_model
+from ai.title_engine import title_engine
+from services.graph_service import GraphService, bump_graph_version
+from services.cluster_service import ClusterService
+from services.media_service import MediaService
+from db.vector_store import vector_db, async_vector_store
 from config import settings
 import json
+import asyncio
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+def embedding_text(content: str, caption: Optional[str] = None, linked_text: Optional[str] = None) -> str:
+    """Text to embed: the note plus its image caption and the text of pages it
+    links to, so a note is also found by what its image shows or its links say"""
+    return "\n\n".join(part for part in (content, caption, linked_text) if part)
 
 class NoteService:
     def __init__(self, db: Session):
         self.db = db
-        self.ai_service = embeddings.LocalEmbeddingModel()
+        self.embedding_model = get_embedding_model()
 
     def create_note(self, user_id: str, note_data: schemas.NoteCreate) -> models.Note:
         # Encrypt content
@@ -28,7 +45,10 @@ class NoteService:
         )
         
         self.db.add(db_note)
+        bump_graph_version(self.db, user_id)
         self.db.commit()
+        # Notes hold a reference to stored media, released again in delete_note
+        MediaService(self.db).acquire_path(db_note.media_path)
         self.db.refresh(db_note)
         
         # Process with AI
@@ -54,6 +74,7 @@ class NoteService:
         note = self.get_note(note_id, user_id)
         if not note:
             return None
+        plaintext = note.content  # get_note already decrypted it
         
         if update_data.content:
             note.content = security.encrypt_content(
@@ -64,70 +85,179 @@ class NoteService:
         if update_data.title:
             note.title = update_data.title
             
-        if update_data.media_path:
+        replaced_media = None
+        if update_data.media_path and update_data.media_path != note.media_path:
+            MediaService(self.db).acquire_path(update_data.media_path)
+            replaced_media = note.media_path
             note.media_path = update_data.media_path
+            # The old image's caption no longer applies; a new one is queued below
+            note.note_data = {
+                key: value for key, value in (note.note_data or {}).items() if key != 'image_caption'
+            }
             
         if update_data.metadata:
             note.metadata = json.dumps(update_data.metadata)
             
         note.updated_at = update_data.updated_at
+        bump_graph_version(self.db, user_id)
         self.db.commit()
+        MediaService(self.db).release(replaced_media)
         
-        # Reprocess with AI if content changed
-        if update_data.content:
-            self.process_note_ai(note)
+        # Reprocess with AI if content or attached media changed
+        if update_data.content or update_data.media_path:
+            self.process_note_ai(note, content=update_data.content or plaintext)
             
         return note
 
-    def process_note_ai(self, note: models.Note):
+    def process_note_ai(self, note: models.Note, content: Optional[str] = None):
         """Process note content with AI services"""
         # Generate embedding
+        if content is None:
+            content = security.decrypt_content(
+                note.content,
+                security.get_user_key(note.user_id)
+            )
+        caption = self._image_caption(note)
+        linked_text = self._linked_pages_text(note, content)
+        # Embed chunk by chunk so long notes aren't truncated, storing each chunk in the vector DB
+        embedding = chunking.embed_and_index_note(
+            self.embedding_model,
+            vector_db,
+            note.id,
+            note.user_id,
+            embedding_text(content, caption, linked_text),
+            metadata={'created_at': str(note.created_at)}
+        )
+        vector_id = note.id
+        if embedding:
+            GraphService(self.db).update_note_edges(note.id, note.user_id, embedding)
+            ClusterService(self.db).assign_note(note.id, note.user_id, embedding)
+        
+        # Generate title if missing
+        if not note.title or note.title.strip() == "":
+            # Request path: extractive tiers only, never blocks on GPT-2
+            note.title, _ = title_engine.title(content, embedding, allow_generative=False)
+            bump_graph_version(self.db, note.user_id)
+            self.db.commit()
+            
+        return vector_id
+
+    async def process_note_ai_async(self, note: models.Note):
+        """Same as process_note_ai, but inference and I/O run off the event loop"""
         content = security.decrypt_content(
             note.content,
             security.get_user_key(note.user_id)
         )
-        embedding = self.ai_service.generate(content)
-        
-        # Store in vector DB
-        vector_id = embeddings.vector_db.upsert(
-            embedding, 
+        caption = await asyncio.to_thread(self._image_caption, note)
+        linked_text = await asyncio.to_thread(self._linked_pages_text, note, content)
+        embedding = await chunking.embed_and_index_note_async(
+            self.embedding_model,
+            async_vector_store,
             note.id,
-            metadata={
-                'user_id': note.user_id,
-                'created_at': str(note.created_at)
-            }
+            note.user_id,
+            embedding_text(content, caption, linked_text),
+            metadata={'created_at': str(note.created_at)}
         )
+        if embedding:
+            await asyncio.to_thread(
+                GraphService(self.db).update_note_edges, note.id, note.user_id, embedding
+            )
+            await asyncio.to_thread(
+                ClusterService(self.db).assign_note, note.id, note.user_id, embedding
+            )
         
         # Generate title if missing
         if not note.title or note.title.strip() == "":
-            note.title = embeddings.generate_title(content)
-            self.db.commit()
+            note.title, _ = await title_engine.title_async(content, embedding)
+            bump_graph_version(self.db, note.user_id)
+            await asyncio.to_thread(self.db.commit)
             
-        return vector_id
+        return note.id
+
+    def _image_caption(self, note: models.Note) -> Optional[str]:
+        """The attached image's stored caption. When there is none yet, captioning
+        is queued and the note is embedded without it for now; the task re-embeds
+        it once the caption exists, so requests never wait on BLIP."""
+        if not note.media_path or not captioning.is_image_path(note.media_path):
+            return None
+        caption = (note.note_data or {}).get('image_caption')
+        if caption is None:
+            from tasks.ai_tasks import caption_note_image  # Local import to avoid circular dependency
+            try:
+                caption_note_image.delay(note.id)
+            except Exception as e:
+                logger.error(f"Could not queue captioning for note {note.id}: {e}")
+        return caption
+
+    def _linked_pages_text(self, note: models.Note, content: str) -> Optional[str]:
+        """Stored text of the pages the note links to. When the links changed, a
+        fetch is queued and the note is embedded without them until it lands."""
+        if not settings.WEB_FETCH_ENRICH_NOTES:
+            return None
+        urls = extract_urls(content)
+        if not urls:
+            return None
+        note_data = note.note_data or {}
+        if note_data.get('linked_urls') != urls:
+            from tasks.ai_tasks import enrich_note_links  # Local import to avoid circular dependency
+            try:
+                enrich_note_links.delay(note.id)
+            except Exception as e:
+                logger.error(f"Could not queue link enrichment for note {note.id}: {e}")
+            return None
+        if not note_data.get('linked_text'):
+            return None
+        return security.decrypt_content(note_data['linked_text'], security.get_user_key(note.user_id))
 
     def delete_note(self, note_id: str, user_id: str) -> bool:
         note = self.get_note(note_id, user_id)
         if not note:
             return False
             
+        media_path = note.media_path
         self.db.delete(note)
+        bump_graph_version(self.db, user_id)
         self.db.commit()
+        MediaService(self.db).release(media_path)
         return True
 
     def search_notes(self, user_id: str, query: str, limit: int = 10) -> list:
         """Semantic search of user's notes"""
         # Generate query embedding
-        embedding = self.ai_service.generate(query)
+        embedding = self.embedding_model.generate(query)
         
-        # Search vector DB
-        results = embeddings.vector_db.semantic_search(
+        # Search vector DB (chunk hits are collapsed to one hit per note)
+        results = vector_db.semantic_search(
             embedding, 
             user_id,
             limit=limit
         )
         
-        # Get full note objects
-        note_ids = [hit.id for hit in results]
-        return self.db.query(models.Note).filter(
+        # Get full note objects, keeping search rank order
+        note_ids = [hit["note_id"] for hit in results]
+        notes = self.db.query(models.Note).filter(
             models.Note.id.in_(note_ids)
-        ).all()
\ No newline at end of file
+        ).all()
+        rank = {note_id: i for i, note_id in enumerate(note_ids)}
+        return sorted(notes, key=lambda note: rank[note.id])
+
+    async def search_notes_async(self, user_id: str, query: str, limit: int = 10) -> list:
+        """Semantic search that doesn't hold a threadpool worker while waiting on the model or Qdrant"""
+        embedding = await self.embedding_model.generate_async(query)
+        
+        results = await async_vector_store.semantic_search(
+            embedding, 
+            user_id,
+            limit=limit
+        )
+        
+        note_ids = [hit["note_id"] for hit in results]
+        if not note_ids:
+            return []
+        notes = await asyncio.to_thread(
+            lambda: self.db.query(models.Note).filter(
+                models.Note.id.in_(note_ids)
+            ).all()
+        )
+        rank = {note_id: i for i, note_id in enumerate(note_ids)}
+        return sorted(notes, key=lambda note: rank[note.id])
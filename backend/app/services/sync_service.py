@@ -1,13 +1,19 @@
 from utils import crdt
 from db.session import SessionLocal
+from db import models
 from services import note_service
 from typing import Dict, List
+import asyncio
 import json
+import logging
 from fastapi import WebSocket
 
+logger = logging.getLogger(__name__)
+
 class SyncManager:
     active_connections: Dict[str, List[WebSocket]] = {}
     note_states: Dict[str, crdt.CRDTEngine] = {}
+    ai_tasks: Dict[str, asyncio.Task] = {}
 
     @classmethod
     async def connect(cls, websocket: WebSocket, note_id: str, user_id: str):
@@ -77,9 +83,32 @@ class SyncManager:
             "state": new_state
         })
         
-        # Trigger AI processing on significant changes
+        # Trigger AI processing on significant changes, in the background so
+        # this websocket (and every other one on the loop) never waits on inference
         if operation.get('change_size', 0) > 100:
-            db = SessionLocal()
-            note_service.NoteService(db).process_note_ai(
-                note_service.NoteService(db).get_note(note_id, user_id))
-            db.close()
\ No newline at end of file
+            pending = cls.ai_tasks.get(note_id)
+            if pending and not pending.done():
+                # A newer edit supersedes reprocessing that hasn't finished
+                pending.cancel()
+            cls.ai_tasks[note_id] = asyncio.create_task(cls._process_note_ai(note_id, user_id))
+
+    @classmethod
+    async def _process_note_ai(cls, note_id: str, user_id: str):
+        db = SessionLocal()
+        try:
+            note = await asyncio.to_thread(
+                lambda: db.query(models.Note).filter(
+                    models.Note.id == note_id,
+                    models.Note.user_id == user_id
+                ).first()
+            )
+            if note:
+                await note_service.NoteService(db).process_note_ai_async(note)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"AI processing failed for note {note_id}: {e}")
+        finally:
+            db.close()
+            if cls.ai_tasks.get(note_id) is asyncio.current_task():
+                del cls.ai_tasks[note_id]
\ No newline at end of file
@@ -0,0 +1,54 @@
+from sqlalchemy import or_, update
+from sqlalchemy.orm import Session
+from db import models
+from ai import titling
+from services.graph_service import bump_graph_version
+from utils import security
+from config import settings
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+class TitleService:
+    """Bulk title generation for notes that have none"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def backfill_titles(self, batch_size: Optional[int] = None, limit: Optional[int] = None) -> int:
+        """Title untitled notes a batch at a time: one generate call and one bulk UPDATE per batch"""
+        batch_size = batch_size or settings.TITLE_BACKFILL_BATCH_SIZE
+        titled = 0
+        last_id = None
+        while limit is None or titled < limit:
+            query = self.db.query(models.Note.id, models.Note.user_id, models.Note.content).filter(
+                or_(models.Note.title.is_(None), models.Note.title == ""),
+                models.Note.content.isnot(None)
+            )
+            if last_id is not None:
+                query = query.filter(models.Note.id > last_id)
+            page = query.order_by(models.Note.id).limit(
+                batch_size if limit is None else min(batch_size, limit - titled)
+            ).all()
+            if not page:
+                break
+
+            contents = [
+                security.decrypt_content(note.content, security.get_user_key(note.user_id))
+                for note in page
+            ]
+            titles = titling.generate_titles(contents)
+
+            # Bulk UPDATE by primary key, executed as one executemany
+            self.db.execute(update(models.Note), [
+                {"id": note.id, "title": title} for note, title in zip(page, titles)
+            ])
+            for user_id in {note.user_id for note in page}:
+                bump_graph_version(self.db, user_id)
+            self.db.commit()
+
+            titled += len(page)
+            last_id = page[-1].id
+            logger.info(f"Backfilled {titled} titles")
+        return titled
@@ -1,6 +1,8 @@
 # backend/app/tasks/ai_tasks.py
 from celery import Celery
+from celery.signals import worker_init, worker_process_init
 from config import settings
+import asyncio
 
 celery = Celery(
     __name__,
@@ -8,12 +10,209 @@ celery = Celery(
     backend=settings.CELERY_RESULT_BACKEND
 )
 
+@worker_init.connect
+def refuse_in_process_vectors(**kwargs):
+    # Vectors written here would land in this worker's own copy of the index,
+    # invisible to the API and overwriting its files. SystemExit, unlike an
+    # Exception, isn't swallowed by the signal dispatcher, so the worker stops
+    if settings.VECTOR_BACKEND == "memory":
+        raise SystemExit(
+            "VECTOR_BACKEND=memory keeps the vector index inside one process; "
+            "Celery workers need VECTOR_BACKEND=qdrant"
+        )
+
+@worker_process_init.connect
+def warmup_worker_models(**kwargs):
+    # Workers load only the generative models they are configured for; the rest load on first use
+    import importlib
+    from ai.lazy_models import lazy_models
+    for module in ("ai.titling", "ai.captioning"):
+        importlib.import_module(module)  # Registers the lazy handles
+    names = [name.strip() for name in settings.WARMUP_LAZY_MODELS.split(",") if name.strip()]
+    if names:
+        lazy_models.warmup(names)
+
 @celery.task
 def process_note_async(note_data):
     # Local import to avoid circular dependency
-    from services.ai_service import AIService
-    ai_service = AIService()
-    return ai_service._process_note_sync(note_data)
+    from services.ai_service import get_ai_service
+    from db.vector_store import loop_local_async_store
+    ai_service = get_ai_service()
+
+    async def run():
+        # asyncio.run makes a new loop per task; loop-bound clients must not outlive it
+        async with loop_local_async_store() as vector_store:
+            return await ai_service._process_note_sync(note_data, vector_store=vector_store)
+
+    return asyncio.run(run())
+
+@celery.task
+def rebuild_knowledge_graph(user_id):
+    """Recompute a user's semantic edges from scratch, e.g. to backfill existing notes"""
+    from db.session import SessionLocal
+    from services.graph_service import GraphService
+    db = SessionLocal()
+    try:
+        return GraphService(db).rebuild_user_graph(user_id)
+    finally:
+        db.close()
+
+@celery.task
+def recluster_user(user_id):
+    """Refit a user's note clusters (knowledge-graph groups)"""
+    from db.session import SessionLocal
+    from services.cluster_service import ClusterService
+    db = SessionLocal()
+    try:
+        return ClusterService(db).recluster_user(user_id)
+    finally:
+        db.close()
+
+@celery.task
+def recluster_all_users():
+    """Periodic full recluster: fan out one task per user with notes"""
+    from db.session import SessionLocal
+    from db import models
+    db = SessionLocal()
+    try:
+        user_ids = [row.user_id for row in db.query(models.Note.user_id).distinct()]
+    finally:
+        db.close()
+    for user_id in user_ids:
+        recluster_user.delay(user_id)
+    return len(user_ids)
+
+# Periodic jobs live on this app, the one the workers run: `celery -A tasks.ai_tasks beat`
+celery.conf.beat_schedule = {
+    "recluster-notes": {
+        "task": recluster_all_users.name,
+        "schedule": settings.CLUSTER_RECLUSTER_INTERVAL_HOURS * 3600,
+    },
+}
+
+@celery.task
+def backfill_titles(limit=None):
+    """Generate titles for untitled notes (e.g. after an import), in batches"""
+    from db.session import SessionLocal
+    from services.title_service import TitleService
+    db = SessionLocal()
+    try:
+        return TitleService(db).backfill_titles(limit=limit)
+    finally:
+        db.close()
+
+@celery.task(queue=settings.EXTRACTION_QUEUE)
+def extract_note_media(note_id):
+    """Extract an attached document's text and index it page by page, so early
+    pages are searchable before the rest of the document is done.
+
+    Routed to its own queue: its worker must use the threads or solo pool,
+    since prefork children are daemonic and can't start the extraction pool.
+    """
+    from db.session import SessionLocal
+    from db import models
+    from db.vector_store import vector_db
+    from ai import chunking
+    from ai.model_registry import get_embedding_model
+    from services.extraction_service import extraction_service, is_extractable
+    db = SessionLocal()
+    try:
+        note = db.query(models.Note).filter(models.Note.id == note_id).first()
+        if note is None or not note.media_path or not is_extractable(note.media_path):
+            return 0
+        return chunking.index_attachment_pages(
+            get_embedding_model(),
+            vector_db,
+            note.id,
+            note.user_id,
+            extraction_service.iter_pages(note.media_path),
+            metadata={'created_at': str(note.created_at)}
+        )
+    finally:
+        db.close()
+
+@celery.task
+def caption_note_image(note_id):
+    """Caption a note's attached image into note_data, then re-embed the note
+    with the caption so the image is searchable"""
+    from db.session import SessionLocal
+    from db import models
+    from ai.captioning import image_captioner, is_image_path
+    from services.note_service import NoteService
+    db = SessionLocal()
+    try:
+        note = db.query(models.Note).filter(models.Note.id == note_id).first()
+        if note is None or not note.media_path or not is_image_path(note.media_path):
+            return None
+        caption = image_captioner.describe(note.media_path)
+        # Reassign so SQLAlchemy sees the JSON column change
+        note.note_data = {**(note.note_data or {}), 'image_caption': caption}
+        db.commit()
+        NoteService(db).process_note_ai(note)
+        return caption
+    finally:
+        db.close()
+
+@celery.task
+def enrich_note_links(note_id):
+    """Fetch the pages a note links to, store their text (encrypted, like the
+    note) in note_data, then re-embed the note with it"""
+    from db.session import SessionLocal
+    from db import models
+    from services.note_service import NoteService
+    from utils import security
+    from utils.web_fetch import web_fetcher, extract_urls, page_text
+    db = SessionLocal()
+    try:
+        note = db.query(models.Note).filter(models.Note.id == note_id).first()
+        if note is None or not note.content:
+            return 0
+        key = security.get_user_key(note.user_id)
+        urls = extract_urls(security.decrypt_content(note.content, key))
+        if not urls:
+            return 0
+
+        async def fetch():
+            # This loop ends with the task, so its client must be closed here
+            try:
+                return await web_fetcher.fetch_many(urls)
+            finally:
+                await web_fetcher.close()
+
+        pages = asyncio.run(fetch())
+        texts = (page_text(body, settings.WEB_FETCH_PAGE_CHARS) for body in pages.values() if body)
+        linked_text = "\n\n".join(text for text in texts if text)
+        # Reassign so SQLAlchemy sees the JSON column change
+        note.note_data = {
+            **(note.note_data or {}),
+            'linked_urls': urls,
+            'linked_text': security.encrypt_content(linked_text, key) if linked_text else None
+        }
+        db.commit()
+        NoteService(db).process_note_ai(note)
+        return sum(1 for body in pages.values() if body)
+    finally:
+        db.close()
+
+@celery.task
+def generate_note_thumbnails(note_id):
+    """Thumbnails for a note's attached image, recorded in note_data"""
+    from db.session import SessionLocal
+    from db import models
+    from ai.captioning import is_image_path
+    from utils.file_processing import generate_thumbnails
+    db = SessionLocal()
+    try:
+        note = db.query(models.Note).filter(models.Note.id == note_id).first()
+        if note is None or not note.media_path or not is_image_path(note.media_path):
+            return None
+        manifest = generate_thumbnails(note.media_path)
+        # Reassign so SQLAlchemy sees the JSON column change
+        note.note_data = {**(note.note_data or {}), 'thumbnails': manifest['thumbnails']}
+        db.commit()
+        return manifest
+    finally:
+        db.close()
 
 @celery.task
 def generate_export_task(user_id, format='markdown'):
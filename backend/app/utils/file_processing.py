@@ -1,23 +1,69 @@
+import asyncio
+import hashlib
 import os
+import re
+import uuid
 from pathlib import Path
+from typing import NamedTuple, Optional
+import aiofiles
+import aiofiles.os
 from fastapi import UploadFile
 import filetype  # Replacement for magic
 from unstructured.partition.pdf import partition_pdf
 from unstructured.partition.image import partition_image
-from PIL import Image
+from PIL import Image, ImageOps
 import io
+import json
+from config import settings
 
-async def save_upload_file(file: UploadFile, user_id: str) -> str:
-    """Save uploaded file to user-specific directory"""
-    user_dir = Path(f"media/{user_id}")
-    user_dir.mkdir(parents=True, exist_ok=True)
-    
-    file_location = user_dir / file.filename
-    with file_location.open("wb") as buffer:
-        content = await file.read()
-        buffer.write(content)
-    
-    return str(file_location)
+class StagedUpload(NamedTuple):
+    temp_path: str
+    sha256: str
+    size: int
+    suffix: str
+
+def content_path(sha256: str, suffix: str) -> str:
+    """Content-addressed location: media/<first two hex digits>/<sha256><suffix>"""
+    return str(Path(settings.MEDIA_ROOT) / sha256[:2] / f"{sha256}{suffix}")
+
+def upload_suffix(filename: Optional[str]) -> str:
+    # The client name only contributes a sanitized extension, never a path
+    suffix = Path(filename or "").suffix.lower()
+    return suffix if re.fullmatch(r"\.[a-z0-9]{1,10}", suffix) else ""
+
+async def stage_upload_file(file: UploadFile) -> StagedUpload:
+    """Stream an upload to a temp file in fixed-size chunks, hashing as it goes"""
+    temp_dir = Path(settings.MEDIA_ROOT) / "tmp"
+    await aiofiles.os.makedirs(temp_dir, exist_ok=True)
+    temp_path = str(temp_dir / f"{uuid.uuid4().hex}.part")
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(temp_path, "wb") as buffer:
+            while chunk := await file.read(settings.MEDIA_UPLOAD_CHUNK_BYTES):
+                digest.update(chunk)
+                size += len(chunk)
+                await buffer.write(chunk)
+            await buffer.flush()
+            await asyncio.to_thread(os.fsync, buffer.fileno())
+    except BaseException:
+        await discard_staged_file(temp_path)
+        raise
+    return StagedUpload(temp_path, digest.hexdigest(), size, upload_suffix(file.filename))
+
+async def promote_staged_file(staged: StagedUpload) -> str:
+    """Atomically move a staged upload to its content-addressed path"""
+    path = content_path(staged.sha256, staged.suffix)
+    await aiofiles.os.makedirs(os.path.dirname(path), exist_ok=True)
+    await aiofiles.os.replace(staged.temp_path, path)
+    return path
+
+async def discard_staged_file(temp_path: str):
+    try:
+        await aiofiles.os.remove(temp_path)
+    except FileNotFoundError:
+        pass
 
 def extract_text_from_file(file_path: str) -> str:
     """Extract text from various file types using filetype"""
@@ -48,20 +94,69 @@ def extract_text_from_file(file_path: str) -> str:
     
     return "\n\n".join([str(el) for el in elements])
 
+def thumbnail_dir(sha256: str) -> Path:
+    return Path(settings.MEDIA_ROOT) / "thumbs" / sha256[:2] / sha256
+
+def generate_thumbnails(image_path: str, sha256: Optional[str] = None) -> dict:
+    """Write every THUMBNAIL_SIZES thumbnail as JPEG and WebP from a single decode.
+
+    JPEGs are decoded in draft mode, letting libjpeg downscale by up to 8x while
+    decoding, and each size is resized from the previous (larger) one. Output is
+    keyed by the source's content hash, so an unchanged image is never redone.
+    """
+    sha256 = sha256 or file_sha256(image_path)
+    out_dir = thumbnail_dir(sha256)
+    manifest_path = out_dir / "manifest.json"
+    if manifest_path.exists():
+        return json.loads(manifest_path.read_text())
+
+    sizes = sorted(settings.THUMBNAIL_SIZES, reverse=True)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    with Image.open(image_path) as img:
+        width, height = img.size
+        img.draft("RGB", (sizes[0], sizes[0]))
+        current = ImageOps.exif_transpose(img).convert("RGB")
+
+    thumbnails = {}
+    for size in sizes:
+        current.thumbnail((size, size), Image.LANCZOS)  # No-op when already small enough
+        paths = {"jpeg": str(out_dir / f"{size}.jpg"), "webp": str(out_dir / f"{size}.webp")}
+        _save_atomic(current, paths["jpeg"], "JPEG", quality=settings.THUMBNAIL_JPEG_QUALITY, optimize=True, progressive=True)
+        _save_atomic(current, paths["webp"], "WEBP", quality=settings.THUMBNAIL_WEBP_QUALITY, method=4)
+        thumbnails[str(size)] = paths
+
+    manifest = {"sha256": sha256, "width": width, "height": height, "thumbnails": thumbnails}
+    # Written last: its presence means every size is complete
+    temp = manifest_path.with_suffix(".tmp")
+    temp.write_text(json.dumps(manifest))
+    os.replace(temp, manifest_path)
+    return manifest
+
+def _save_atomic(img, path: str, format: str, **options):
+    temp = f"{path}.tmp"
+    img.save(temp, format=format, **options)
+    os.replace(temp, path)
+
+def file_sha256(path: str, chunk_bytes: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_bytes):
+            digest.update(chunk)
+    return digest.hexdigest()
+
 def process_image(image_path: str) -> dict:
-    """Process image and generate thumbnail"""
-    img = Image.open(image_path)
-    
-    # Create thumbnail
-    thumb_path = f"{image_path}_thumb.jpg"
-    img.thumbnail((300, 300))
-    img.save(thumb_path)
+    """Process image and generate thumbnails"""
+    manifest = generate_thumbnails(image_path)
+    with Image.open(image_path) as img:
+        exif = dict(img.getexif())  # Header only, no pixel decode
+    smallest = min(manifest["thumbnails"], key=int)
     
     return {
-        "width": img.width,
-        "height": img.height,
-        "thumbnail": thumb_path,
-        "exif": img.getexif() if hasattr(img, 'getexif') else {}
+        "width": manifest["width"],
+        "height": manifest["height"],
+        "thumbnail": manifest["thumbnails"][smallest]["jpeg"],
+        "thumbnails": manifest["thumbnails"],
+        "exif": exif
     }
 
 def sketch_to_image(sketch_data: dict) -> str:
@@ -0,0 +1,243 @@
+import asyncio
+import ipaddress
+import logging
+import re
+import socket
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional
+from urllib.parse import urljoin, urlsplit
+import httpx
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+_URL = re.compile(r"https?://[^\s<>\"')\]]+")
+
+def extract_urls(text: str) -> List[str]:
+    """Distinct http(s) links in a note, in order of appearance"""
+    return list(dict.fromkeys(url.rstrip(".,;:!?") for url in _URL.findall(text)))
+
+def page_text(body: str, max_chars: int) -> str:
+    """Visible text of an HTML page (other bodies as is), whitespace-collapsed and capped"""
+    if "<" in body:
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(body, "html.parser")
+        for tag in soup(["script", "style", "noscript"]):
+            tag.decompose()
+        body = soup.get_text(" ")
+    return " ".join(body.split())[:max_chars]
+
+class CachedPage(NamedTuple):
+    text: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+
+class BlockedURL(Exception):
+    """URL that must not be fetched from the server, e.g. one resolving to a private address"""
+
+async def check_public_url(url: str):
+    """Raise BlockedURL unless `url` is http(s) and its host resolves only to public addresses.
+
+    Links come from users, so without this the server could be made to read
+    loopback, private-network or cloud metadata (169.254.169.254) endpoints
+    and store the response in a note.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise BlockedURL(f"Not an http(s) URL: {url}")
+    try:
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        infos = await asyncio.get_running_loop().getaddrinfo(parts.hostname, port, type=socket.SOCK_STREAM)
+    except (OSError, ValueError) as e:
+        raise BlockedURL(f"Cannot resolve {parts.hostname}: {e}")
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%")[0])
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global:
+            raise BlockedURL(f"{parts.hostname} resolves to non-public address {address}")
+
+class _LoopClient:
+    """httpx client and concurrency limits of one event loop"""
+
+    def __init__(self, client: httpx.AsyncClient, max_connections: int):
+        self.client = client
+        self.slots = asyncio.Semaphore(max_connections)
+        self.host_slots: Dict[str, asyncio.Semaphore] = {}
+
+class WebFetcher:
+    """Async page fetcher on a pooled httpx client.
+
+    Bodies are streamed and reading stops at `max_bytes`, so large pages cost
+    no more than the cap. Requests are limited overall and per host; pages
+    that send ETag or Last-Modified are cached and revalidated with
+    conditional requests, so an unchanged page comes back as a bodiless 304.
+    Every request, including each redirect hop, is refused unless its host
+    resolves to public addresses only.
+
+    The client belongs to the event loop that created it. Code that runs its
+    own short-lived loop (e.g. a Celery task's asyncio.run) must await
+    close() before the loop ends.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        timeout: float,
+        max_connections: int,
+        per_host: int,
+        cache_size: int,
+        max_redirects: int
+    ):
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.per_host = per_host
+        self.cache_size = cache_size
+        self.max_redirects = max_redirects
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopClient]" = weakref.WeakKeyDictionary()
+        self._cache: "OrderedDict[str, CachedPage]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Stats
+        self.fetches = 0
+        self.not_modified = 0
+        self.truncated = 0
+        self.blocked = 0
+        self.errors = 0
+        self.bytes_read = 0
+
+    def _loop_client(self) -> _LoopClient:
+        # Created lazily so importing this module doesn't open connections
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            state = self._clients.get(loop)
+            if state is None:
+                state = self._clients[loop] = _LoopClient(
+                    httpx.AsyncClient(
+                        timeout=self.timeout,
+                        limits=httpx.Limits(
+                            max_connections=self.max_connections,
+                            max_keepalive_connections=self.max_connections
+                        ),
+                        # Redirects are followed in fetch(), so every hop is checked
+                        follow_redirects=False,
+                        headers={"User-Agent": settings.WEB_FETCH_USER_AGENT}
+                    ),
+                    self.max_connections
+                )
+            return state
+
+    def _host_slot(self, state: _LoopClient, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc.lower()
+        slot = state.host_slots.get(host)
+        if slot is None:
+            slot = state.host_slots[host] = asyncio.Semaphore(self.per_host)
+        return slot
+
+    def _cached(self, url: str) -> Optional[CachedPage]:
+        with self._lock:
+            page = self._cache.get(url)
+            if page is not None:
+                self._cache.move_to_end(url)
+            return page
+
+    def _store(self, url: str, page: CachedPage):
+        with self._lock:
+            self._cache[url] = page
+            self._cache.move_to_end(url)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    async def fetch(self, url: str) -> str:
+        """Page body up to max_bytes, decoded; empty string on any failure or blocked URL"""
+        state = self._loop_client()
+        cached = self._cached(url)
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+        target = url
+        try:
+            for _ in range(self.max_redirects + 1):
+                await check_public_url(target)
+                # Host slot first: waiting on a busy host mustn't hold a global slot
+                async with self._host_slot(state, target), state.slots:
+                    async with state.client.stream("GET", target, headers=headers) as response:
+                        self.fetches += 1
+                        if response.is_redirect:
+                            target = urljoin(target, response.headers["location"])
+                            headers = {}  # Validators belong to the original URL
+                            continue
+                        if response.status_code == 304 and cached is not None:
+                            self.not_modified += 1
+                            return cached.text
+                        if response.status_code != 200:
+                            return ""
+                        text = await self._read_text(response)
+
+                        etag = response.headers.get("etag")
+                        last_modified = response.headers.get("last-modified")
+                        if etag or last_modified:
+                            self._store(url, CachedPage(text, etag, last_modified))
+                        return text
+            logger.warning(f"Fetching {url} failed: more than {self.max_redirects} redirects")
+            return ""
+        except BlockedURL as e:
+            self.blocked += 1
+            logger.warning(f"Not fetching {url}: {e}")
+            return ""
+        except (httpx.HTTPError, httpx.InvalidURL) as e:
+            self.errors += 1
+            logger.warning(f"Fetching {url} failed: {e}")
+            return ""
+
+    async def _read_text(self, response: httpx.Response) -> str:
+        """Decoded body, reading no more than max_bytes (after decompression)"""
+        body = bytearray()
+        async for chunk in response.aiter_bytes():
+            body.extend(chunk)
+            if len(body) >= self.max_bytes:
+                self.truncated += 1
+                break  # Leaving the block closes the stream unread
+        self.bytes_read += len(body)
+        return bytes(body[:self.max_bytes]).decode(response.encoding or "utf-8", errors="ignore")
+
+    async def fetch_many(self, urls: List[str]) -> Dict[str, str]:
+        """Fetch pages concurrently within the global and per-host limits"""
+        urls = list(dict.fromkeys(urls))
+        pages = await asyncio.gather(*(self.fetch(url) for url in urls))
+        return dict(zip(urls, pages))
+
+    async def close(self):
+        """Close the running loop's client"""
+        with self._lock:
+            state = self._clients.pop(asyncio.get_running_loop(), None)
+        if state is not None:
+            await state.client.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "fetches": self.fetches,
+            "not_modified": self.not_modified,
+            "truncated": self.truncated,
+            "blocked": self.blocked,
+            "errors": self.errors,
+            "bytes_read": self.bytes_read,
+            "cached_pages": len(self._cache)
+        }
+
+# Singleton instance
+web_fetcher = WebFetcher(
+    max_bytes=settings.WEB_FETCH_MAX_BYTES,
+    timeout=settings.WEB_FETCH_TIMEOUT,
+    max_connections=settings.WEB_FETCH_MAX_CONNECTIONS,
+    per_host=settings.WEB_FETCH_PER_HOST,
+    cache_size=settings.WEB_FETCH_CACHE_SIZE,
+    max_redirects=settings.WEB_FETCH_MAX_REDIRECTS
+)
@@ -0,0 +1,29 @@
+import os
+import sys
+import tempfile
+
+# Modules import each other from backend/app, as when the app is run from there
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+# Use the in-process vector store, so the suite needs no Qdrant server
+os.environ.setdefault("VECTOR_BACKEND", "memory")
+os.environ.setdefault("MEMORY_VECTOR_DIR", tempfile.mkdtemp(prefix="vector_index_"))
+
+import pytest
+
+@pytest.fixture
+def db():
+    """Session on a fresh in-memory SQLite database with every table created"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from db.session import Base
+    from db import models  # noqa: F401  (registers the tables)
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
@@ -0,0 +1,37 @@
+from db import models
+from services.graph_service import GraphService, SEMANTIC
+
+def add_notes(db):
+    db.add_all([
+        models.User(id=1, email="owner@example.com"),
+        models.User(id=2, email="other@example.com"),
+        models.Note(id="a", user_id=1, title="A"),
+        models.Note(id="b", user_id=1, title="B"),
+        models.Note(id="c", user_id=1, title="C"),
+        models.NoteConnection(source_id="a", target_id="b", connection_type=SEMANTIC, strength=0.9),
+        models.NoteConnection(source_id="b", target_id="c", connection_type=SEMANTIC, strength=0.8)
+    ])
+    db.commit()
+
+def test_owner_gets_their_ego_graph_with_a_str_user_id(db):
+    add_notes(db)
+
+    # Routes pass the JWT subject, a str
+    graph = GraphService(db).get_ego_graph("1", "a", hops=2)
+
+    assert graph["center"] == "a"
+    assert {node["id"]: node["hop"] for node in graph["nodes"]} == {"a": 0, "b": 1, "c": 2}
+    assert {(link["source"], link["target"]) for link in graph["links"]} == {("a", "b"), ("b", "c")}
+    assert graph["truncated"] is False
+
+def test_ego_graph_respects_hops_and_max_nodes(db):
+    add_notes(db)
+
+    assert {node["id"] for node in GraphService(db).get_ego_graph(1, "a", hops=1)["nodes"]} == {"a", "b"}
+    assert GraphService(db).get_ego_graph(1, "a", hops=2, max_nodes=2)["truncated"] is True
+
+def test_ego_graph_of_another_users_note_is_none(db):
+    add_notes(db)
+
+    assert GraphService(db).get_ego_graph("2", "a") is None
+    assert GraphService(db).get_ego_graph("1", "missing") is None
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from ai import linking
+from db.memory_vectors import InMemoryVectorDB
+
+def normalized(rows):
+    matrix = np.asarray(rows, dtype=np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+def test_top_k_neighbors_excludes_self_and_sorts():
+    matrix = normalized([[1, 0], [0.9, 0.1], [0, 1], [0.1, 0.9]])
+
+    indices, scores = linking.top_k_neighbors(matrix, 2)
+
+    assert indices.shape == scores.shape == (4, 2)
+    assert indices[0, 0] == 1 and indices[2, 0] == 3
+    assert all(row not in indices[row] for row in range(4))
+    assert np.all(scores[:, 0] >= scores[:, 1])
+
+def test_top_k_neighbors_is_independent_of_block_size():
+    matrix = normalized(np.random.default_rng(0).normal(size=(50, 8)))
+
+    whole = linking.top_k_neighbors(matrix, 5)
+    blocked = linking.top_k_neighbors(matrix, 5, block_bytes=50 * 4 * 3)  # 3 rows per block
+
+    np.testing.assert_array_equal(whole[0], blocked[0])
+    np.testing.assert_allclose(whole[1], blocked[1])
+
+def test_top_k_neighbors_single_note():
+    indices, scores = linking.top_k_neighbors(normalized([[1, 0]]), 3)
+    assert indices.shape == scores.shape == (1, 0)
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    db = InMemoryVectorDB(str(tmp_path), flush_interval=0)
+    monkeypatch.setattr(linking, "vector_db", db)
+    yield db
+    db.close()
+
+def test_generate_knowledge_graph_links_similar_notes(store):
+    store.upsert_note_vector([1, 0], "a", 1)
+    store.upsert_note_vector([0.95, 0.05], "b", 1)
+    store.upsert_note_vector([0, 1], "c", 1)
+
+    graph = linking.generate_knowledge_graph(1, k=2, threshold=0.9)
+
+    assert {node["id"] for node in graph["nodes"]} == {"a", "b", "c"}
+    assert [(link["source"], link["target"]) for link in graph["links"]] in ([("a", "b")], [("b", "a")])
+
+def test_generate_knowledge_graph_drops_unknown_notes(store):
+    store.upsert_note_vector([1, 0], "a", 1)
+    store.upsert_note_vector([1, 0], "deleted", 1)
+
+    graph = linking.generate_knowledge_graph(1, note_info={"a": ("Title", "work")}, threshold=0)
+
+    assert graph["nodes"] == [{"id": "a", "label": "Title", "group": "work"}]
+    assert graph["links"] == []
+
+def test_find_related_notes(store):
+    store.upsert_note_chunks("a", 1, [(0, "about cats", [1, 0])])
+
+    related = linking.find_related_notes([1, 0], 1)
+
+    assert related == [{"note_id": "a", "similarity": pytest.approx(1.0), "snippet": "about cats"}]
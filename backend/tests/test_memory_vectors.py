@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+from db.memory_vectors import InMemoryVectorDB
+
+def unit(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+@pytest.fixture
+def store(tmp_path):
+    db = InMemoryVectorDB(str(tmp_path), flush_interval=0)
+    yield db
+    db.close()
+
+def test_semantic_search_ranks_by_cosine_similarity(store):
+    store.upsert_note_vector(unit(1, 0, 0), "a", 1)
+    store.upsert_note_vector(unit(1, 1, 0), "b", 1)
+    store.upsert_note_vector(unit(0, 0, 1), "c", 1)
+
+    hits = store.semantic_search(unit(1, 0, 0), 1, limit=5, score_threshold=0.5)
+
+    assert [hit["note_id"] for hit in hits] == ["a", "b"]
+    assert hits[0]["score"] == pytest.approx(1.0)
+
+def test_semantic_search_is_scoped_to_the_user(store):
+    store.upsert_note_vector(unit(1, 0), "mine", 1)
+    store.upsert_note_vector(unit(1, 0), "theirs", 2)
+
+    assert [hit["note_id"] for hit in store.semantic_search(unit(1, 0), 1)] == ["mine"]
+
+def test_semantic_search_collapses_chunks_to_notes(store):
+    store.upsert_note_chunks("long", 1, [(0, "intro", unit(1, 0)), (1, "body", unit(1, 0.1))])
+
+    hits = store.semantic_search(unit(1, 0), 1)
+
+    assert len(hits) == 1
+    assert hits[0]["note_id"] == "long"
+    assert hits[0]["chunk_index"] == 0
+
+def test_delete_stale_chunks_keeps_leading_chunks(store):
+    store.upsert_note_chunks("n", 1, [(i, f"chunk {i}", unit(1, i)) for i in range(3)])
+
+    store.delete_stale_chunks("n", 1)
+
+    hits = store.semantic_search(unit(1, 2), 1, score_threshold=-1)
+    assert [(hit["note_id"], hit["chunk_index"]) for hit in hits] == [("n", 0)]
+
+def test_delete_user_vectors(store):
+    store.upsert_note_vector(unit(1, 0), "a", 1)
+    store.upsert_note_vector(unit(1, 0), "b", 2)
+
+    store.delete_user_vectors(1)
+
+    assert store.semantic_search(unit(1, 0), 1) == []
+    assert store.get_note_vector("a") is None
+    assert [hit["note_id"] for hit in store.semantic_search(unit(1, 0), 2)] == ["b"]
+
+def test_index_survives_a_restart(tmp_path):
+    store = InMemoryVectorDB(str(tmp_path), flush_interval=0)
+    store.upsert_note_vector(unit(1, 0), "a", 1)
+    store.close()
+
+    reopened = InMemoryVectorDB(str(tmp_path), flush_interval=0)
+    assert [hit["note_id"] for hit in reopened.semantic_search(unit(1, 0), 1)] == ["a"]
+
+def test_note_lookups_work_before_the_owner_is_loaded(tmp_path):
+    store = InMemoryVectorDB(str(tmp_path), flush_interval=0)
+    store.upsert_note_vector(unit(1, 0), "a", 1)
+    store.upsert_note_chunks("b", 1, [(0, "first", unit(0, 1)), (1, "second", unit(1, 1))])
+    store.close()
+
+    # A fresh instance has no user loaded yet; note IDs alone must find them
+    reopened = InMemoryVectorDB(str(tmp_path), flush_interval=0)
+    assert reopened.get_note_vector("a") == pytest.approx(unit(1, 0))
+    reopened.delete_stale_chunks("b", 1)
+    reopened.delete_note_vector("a")
+    hits = reopened.semantic_search(unit(1, 1), 1, score_threshold=-1)
+    assert [(hit["note_id"], hit["chunk_index"]) for hit in hits] == [("b", 0)]
+
+def test_owners_are_rebuilt_without_the_owner_map(tmp_path):
+    store = InMemoryVectorDB(str(tmp_path), flush_interval=0)
+    store.upsert_note_vector(unit(1, 0), "a", 7)
+    store.close()
+    (tmp_path / "owners.json").unlink()
+
+    reopened = InMemoryVectorDB(str(tmp_path), flush_interval=0)
+    reopened.delete_note_vector("a")
+    assert reopened.semantic_search(unit(1, 0), 7) == []
+
+def test_get_user_vectors_averages_chunks_per_note(store):
+    store.upsert_note_chunks("n", 1, [(0, "x", unit(1, 0)), (1, "y", unit(0, 1))])
+
+    note_ids, matrix = store.get_user_vectors(1)
+
+    assert note_ids == ["n"]
+    assert matrix[0] == pytest.approx(unit(1, 1))